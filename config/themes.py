@@ -176,6 +176,17 @@ THEMES: dict[str, Theme] = {
 }
 
 
+
+def map_theme_colors(theme: Theme) -> dict[str, str]:
+    """Map-specific colors under the keys ui/map.html reads from its THEME JSON."""
+    return {
+        "route_start": theme.route_start_color,
+        "route_end": theme.route_end_color,
+        "route_alt": theme.route_alt_color,
+        "marker": theme.marker_color,
+    }
+
+
 def get_theme(name: str) -> Theme:
     """Return a Theme by name. Defaults to psychedelic if name is invalid."""
     return THEMES.get(name.lower(), PSYCHEDELIC)
@@ -0,0 +1,291 @@
+"""
+core/bridge_metrics.py — Latency and payload instrumentation for the map bridge.
+
+Every public method of the pywebview API class is wrapped so each call
+records:
+
+- handler time (the Python method itself),
+- errors,
+- while the debug overlay is open: serialization time and size of the
+  result (a timed json.dumps) and the argument payload size. That
+  encodes every result a second time, so it is skipped otherwise.
+
+Methods that hand their work to BridgeTasks return {"request_id"} at
+once; those returns are not recorded here. BridgeTasks (given this
+collector) records the method when its work finishes, so the figures
+cover the real routing or geocoding time.
+
+The CTk-to-map hand-off is timed from the click on a trip card until
+the page reports that initMap() has drawn the trip (map_ready()).
+
+Samples feed per-method latency histograms and percentiles. Each call
+is also appended to the app log (LOG_DIR/app.log) as one structured
+`bridge_call {...}` JSON line. The map page polls snapshot() for its
+debug overlay, and export() writes a JSON report next to the log.
+
+Usage:
+    metrics = get_bridge_metrics()
+    MapApi = instrument_api(MapApi, metrics)     # before creating the window
+    metrics.begin_handoff(clicked_at)            # perf_counter() of the click
+    ...                                          # page calls map_ready() after initMap()
+    metrics.handoff_ms                           # also recorded as ctk_to_webview_handoff
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+from config.settings import LOG_DIR
+
+logger = logging.getLogger(__name__)
+
+# Structured per-call lines; INFO is below the app's WARNING default, so
+# this logger opts in explicitly. It writes only to the app log file (not
+# the root handlers, which include stderr); see _attach_call_log().
+call_logger = logging.getLogger("bridge.calls")
+call_logger.setLevel(logging.INFO)
+call_logger.propagate = False
+CALL_LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+HISTOGRAM_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+SAMPLE_WINDOW = 500
+WATCH_WINDOW = 5.0                 # Seconds payloads stay measured after the overlay polls
+METRICS_METHODS = ("get_bridge_metrics", "export_bridge_metrics", "map_ready")  # Not instrumented
+
+
+def _attach_call_log(directory: str = LOG_DIR) -> None:
+    """Send bridge_call lines to LOG_DIR/app.log (once per process)."""
+    if call_logger.handlers:
+        return
+    os.makedirs(directory, exist_ok=True)
+    handler = logging.FileHandler(os.path.join(directory, "app.log"))
+    handler.setFormatter(logging.Formatter(CALL_LOG_FORMAT))
+    call_logger.addHandler(handler)
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class _MethodStats:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.total_ms: deque[float] = deque(maxlen=SAMPLE_WINDOW)
+        self.handler_ms: deque[float] = deque(maxlen=SAMPLE_WINDOW)
+        self.serialize_ms: deque[float] = deque(maxlen=SAMPLE_WINDOW)
+        self.sized_calls = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.max_bytes_out = 0
+
+    def add(
+        self, handler_ms: float, serialize_ms: float, bytes_in: int | None, bytes_out: int | None, error: bool
+    ) -> None:
+        total = handler_ms + serialize_ms
+        self.calls += 1
+        self.errors += error
+        index = next((i for i, bound in enumerate(HISTOGRAM_BOUNDS_MS) if total <= bound), len(HISTOGRAM_BOUNDS_MS))
+        self.buckets[index] += 1
+        self.total_ms.append(total)
+        self.handler_ms.append(handler_ms)
+        if bytes_out is None:
+            return  # Payload not measured for this call
+        self.sized_calls += 1
+        self.serialize_ms.append(serialize_ms)
+        self.bytes_in += bytes_in or 0
+        self.bytes_out += bytes_out
+        self.max_bytes_out = max(self.max_bytes_out, bytes_out)
+
+    def summary(self) -> dict:
+        total = sorted(self.total_ms)
+        handler = sorted(self.handler_ms)
+        serialize = sorted(self.serialize_ms)
+        result = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "histogram": dict(zip([f"<={b}ms" for b in HISTOGRAM_BOUNDS_MS] + ["more"], self.buckets)),
+            "sized_calls": self.sized_calls,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "max_bytes_out": self.max_bytes_out,
+        }
+        if total:
+            result.update({
+                "p50_ms": round(_percentile(total, 0.5), 2),
+                "p95_ms": round(_percentile(total, 0.95), 2),
+                "max_ms": round(total[-1], 2),
+                "handler_p50_ms": round(_percentile(handler, 0.5), 2),
+            })
+        if serialize:
+            result["serialize_p50_ms"] = round(_percentile(serialize, 0.5), 2)
+        return result
+
+
+class BridgeMetrics:
+    """Thread-safe per-method call statistics."""
+
+    def __init__(self, log_calls: bool = True) -> None:
+        self.log_calls = log_calls
+        if log_calls:
+            _attach_call_log()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._methods: dict[str, _MethodStats] = {}
+        self._watched_until = 0.0
+        self._handoff_started: float | None = None
+        self.handoff_ms: float | None = None  # Last completed CTk-to-map hand-off
+
+    @property
+    def watched(self) -> bool:
+        """True while the overlay is polling, so payloads are worth measuring."""
+        return time.monotonic() < self._watched_until
+
+    def watch(self) -> None:
+        """Measure payloads for the next WATCH_WINDOW seconds."""
+        self._watched_until = time.monotonic() + WATCH_WINDOW
+
+    def begin_handoff(self, started: float) -> None:
+        """Start timing a hand-off from a perf_counter() taken at the click."""
+        self._handoff_started = started
+        self.handoff_ms = None
+
+    def handoff_done(self) -> float | None:
+        """End the pending hand-off (first call only) and record it."""
+        started, self._handoff_started = self._handoff_started, None
+        if started is None:
+            return None
+        self.handoff_ms = (time.perf_counter() - started) * 1000
+        self.record("ctk_to_webview_handoff", self.handoff_ms)
+        return self.handoff_ms
+
+    def record(
+        self,
+        method: str,
+        handler_ms: float,
+        serialize_ms: float = 0.0,
+        bytes_in: int | None = None,
+        bytes_out: int | None = None,
+        error: bool = False,
+    ) -> None:
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = _MethodStats()
+            stats.add(handler_ms, serialize_ms, bytes_in, bytes_out, error)
+        if self.log_calls:
+            call_logger.info("bridge_call %s", json.dumps({
+                "method": method,
+                "handler_ms": round(handler_ms, 2),
+                "serialize_ms": round(serialize_ms, 2),
+                "bytes_in": bytes_in,
+                "bytes_out": bytes_out,
+                "error": error,
+            }, separators=(",", ":")))
+
+    def snapshot(self) -> dict:
+        """Per-method summaries, slowest p95 first."""
+        with self._lock:
+            methods = {name: stats.summary() for name, stats in self._methods.items()}
+        return {
+            "since": self.started_at,
+            "methods": dict(sorted(methods.items(), key=lambda kv: -kv[1].get("p95_ms", 0))),
+        }
+
+    def export(self, extra: dict | None = None, directory: str = LOG_DIR) -> str:
+        """Write a JSON report (plus any client-side figures) and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        report = {"generated_at": time.time(), "python": self.snapshot(), **(extra or {})}
+        path = os.path.join(directory, time.strftime("bridge-metrics-%Y%m%d-%H%M%S.json"))
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        logger.warning("Bridge metrics exported to %s", path)
+        return path
+
+
+def _payload_size(value: Any) -> tuple[int, float]:
+    """(bytes, ms) to JSON-encode value the way the bridge will."""
+    started = time.perf_counter()
+    try:
+        size = len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        size = 0
+    return size, (time.perf_counter() - started) * 1000
+
+
+def _is_request_handle(value: Any) -> bool:
+    return isinstance(value, dict) and value.keys() == {"request_id"}
+
+
+def _wrap(method: Callable, name: str, metrics: BridgeMetrics) -> Callable:
+    @functools.wraps(method)
+    def instrumented(self, *args, **kwargs):
+        sized = metrics.watched
+        bytes_in = _payload_size(args)[0] if sized else None
+        started = time.perf_counter()
+        error = False
+        result = None
+        try:
+            result = method(self, *args, **kwargs)
+            return result
+        except Exception:
+            error = True
+            raise
+        finally:
+            handler_ms = (time.perf_counter() - started) * 1000
+            # Background methods answer {"request_id"} at once; BridgeTasks
+            # records them under this name when the work finishes
+            if error or not _is_request_handle(result):
+                bytes_out, serialize_ms = _payload_size(result) if sized else (None, 0.0)
+                metrics.record(name, handler_ms, serialize_ms, bytes_in, bytes_out, error)
+    return instrumented
+
+
+def instrument_api(api_cls: type, metrics: BridgeMetrics) -> type:
+    """Subclass of api_cls whose public methods are timed.
+
+    Also adds get_bridge_metrics() and export_bridge_metrics(client) for
+    the overlay, and map_ready() for the page to end the hand-off
+    timing. Methods stay real methods, so pywebview still exposes them
+    with their original signatures.
+    """
+    namespace: dict[str, Any] = {}
+    for name, member in inspect.getmembers(api_cls, inspect.isfunction):
+        if not name.startswith("_") and name not in METRICS_METHODS:
+            namespace[name] = _wrap(member, name, metrics)
+
+    def get_bridge_metrics(self) -> dict:
+        metrics.watch()  # Only the overlay polls this
+        return metrics.snapshot()
+
+    def export_bridge_metrics(self, client: dict | None = None) -> str:
+        return metrics.export({"client": client} if client else None)
+
+    def map_ready(self) -> float | None:
+        return metrics.handoff_done()
+
+    namespace["get_bridge_metrics"] = get_bridge_metrics
+    namespace["export_bridge_metrics"] = export_bridge_metrics
+    namespace["map_ready"] = map_ready
+    namespace["bridge_metrics"] = metrics
+    return type(api_cls.__name__, (api_cls,), namespace)
+
+
+_metrics: BridgeMetrics | None = None
+
+
+def get_bridge_metrics() -> BridgeMetrics:
+    """The app-wide metrics collector (shared by main() and the map view)."""
+    global _metrics
+    if _metrics is None:
+        _metrics = BridgeMetrics()
+    return _metrics
@@ -0,0 +1,228 @@
+"""
+core/bridge_tasks.py — Run slow bridge calls off the bridge workers.
+
+pywebview answers each JS call on a bridge thread, so a routing or
+geocoding call that waits on the network holds that thread and delays
+cheap calls (a map click, removing a stop) queued behind it. Network-
+bound API methods instead hand their work to BridgeTasks and return
+{"request_id": ...} at once; the result arrives later through
+evaluate_js as onBridgeResult(request_id, result, error).
+
+- Plain functions run on a bounded thread pool.
+- Coroutine functions run on the shared HTTP client's loop
+  (core/http_client.py), so they can await get_http_client().get() and
+  cancelling them really aborts the request and frees its connection.
+- A submit on a channel (e.g. "search:startInput") cancels the request
+  still running on that channel; JS can also cancel by id.
+
+With a BridgeMetrics, each completed or failed request is recorded
+under its bridge method name, timed from submit to finish (the bridge
+call itself only returns the request id).
+
+Cancelled requests are delivered with error "cancelled" so the page
+can settle its promise; a thread already running a plain function is
+left to finish, but its result is dropped. Functions that accept a
+`cancelled` keyword get a threading.Event to stop early.
+
+Usage (from the map bridge):
+    pusher = JsResultPusher(window.evaluate_js)
+    tasks = BridgeTasks(pusher.deliver, metrics=get_bridge_metrics())
+
+    def search_location(self, query, seq, input_id):
+        return tasks.submit(search.search, query, channel=f"search:{input_id}", method="search_location")
+
+    def cancel_request(self, request_id):
+        return tasks.cancel(request_id)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import inspect
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+from core.bridge_metrics import BridgeMetrics
+
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = 4          # Threads for blocking network calls
+LATENCY_WINDOW = 200
+CANCELLED = "cancelled"
+
+# deliver(request_id, result, error)
+Deliver = Callable[[str, Any, "str | None"], None]
+
+
+class _Task:
+    __slots__ = ("request_id", "name", "channel", "future", "cancelled", "started")
+
+    def __init__(self, request_id: str, name: str, channel: str | None) -> None:
+        self.request_id = request_id
+        self.name = name
+        self.channel = channel
+        self.future: concurrent.futures.Future | None = None
+        self.cancelled = threading.Event()
+        self.started = time.perf_counter()
+
+
+class BridgeTasks:
+    """Background execution with request ids, supersession and cancellation."""
+
+    def __init__(
+        self, deliver: Deliver, max_workers: int = MAX_WORKERS, metrics: BridgeMetrics | None = None
+    ) -> None:
+        self._deliver_fn = deliver
+        self._metrics = metrics
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bridge-task"
+        )
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._tasks: dict[str, _Task] = {}
+        self._channels: dict[str, str] = {}
+        self._latency: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "cancelled": 0}
+
+    # --- Public API ---
+
+    def submit(
+        self, fn: Callable, *args, channel: str | None = None, method: str | None = None, **kwargs
+    ) -> dict:
+        """Start fn(*args, **kwargs) in the background; returns {"request_id"}.
+
+        `method` names the bridge method for metrics (default: fn's name).
+        """
+        task = _Task(f"b{next(self._ids)}", method or getattr(fn, "__name__", "task"), channel)
+        with self._lock:
+            previous = self._channels.get(channel) if channel else None
+            if channel:
+                self._channels[channel] = task.request_id
+            self._tasks[task.request_id] = task
+            self._counts["submitted"] += 1
+        if previous is not None:
+            self.cancel(previous)
+
+        if asyncio.iscoroutinefunction(fn):
+            from core.http_client import get_http_client
+            task.future = asyncio.run_coroutine_threadsafe(fn(*args, **kwargs), get_http_client().loop)
+        else:
+            if _accepts_cancelled(fn):
+                kwargs["cancelled"] = task.cancelled
+            task.future = self._pool.submit(fn, *args, **kwargs)
+        task.future.add_done_callback(lambda future: self._finish(task, future))
+        return {"request_id": task.request_id}
+
+    def cancel(self, request_id: str) -> bool:
+        """Cancel a request; False if it already finished."""
+        with self._lock:
+            task = self._tasks.get(request_id)
+        if task is None:
+            return False
+        task.cancelled.set()
+        if task.future is not None and not task.future.cancel():
+            # Already running in a thread: let it finish and drop the result
+            self._finish(task, None)
+        return True
+
+    def cancel_all(self) -> int:
+        with self._lock:
+            pending = list(self._tasks)
+        return sum(self.cancel(request_id) for request_id in pending)
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self._latency)
+            result: dict[str, Any] = {**self._counts, "in_flight": len(self._tasks)}
+        if samples:
+            result["p50_ms"] = samples[len(samples) // 2] * 1000
+            result["p95_ms"] = samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000
+        return result
+
+    def close(self) -> None:
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- Internals ---
+
+    def _finish(self, task: _Task, future: concurrent.futures.Future | None) -> None:
+        # Runs once per task: whichever of cancel() and completion comes first
+        with self._lock:
+            if self._tasks.pop(task.request_id, None) is None:
+                return
+            if task.channel and self._channels.get(task.channel) == task.request_id:
+                del self._channels[task.channel]
+
+        result, error = None, None
+        if future is None or future.cancelled() or task.cancelled.is_set():
+            error, outcome = CANCELLED, "cancelled"
+        elif future.exception() is not None:
+            error, outcome = str(future.exception()) or type(future.exception()).__name__, "failed"
+            logger.warning("Bridge task %s (%s) failed: %s", task.request_id, task.name, error)
+        else:
+            result, outcome = future.result(), "completed"
+
+        elapsed = time.perf_counter() - task.started
+        with self._lock:
+            self._counts[outcome] += 1
+            if outcome == "completed":
+                self._latency.append(elapsed)
+        if self._metrics is not None and outcome != "cancelled":
+            self._metrics.record(task.name, elapsed * 1000, error=outcome == "failed")
+        try:
+            self._deliver_fn(task.request_id, result, error)
+        except Exception as e:
+            logger.warning("Delivering bridge result %s failed: %s", task.request_id, e)
+
+
+def _accepts_cancelled(fn: Callable) -> bool:
+    try:
+        return "cancelled" in inspect.signature(fn).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _json_default(value: Any) -> Any:
+    """Encode numpy scalars and arrays (and the like) as plain JSON values."""
+    for convert in ("tolist", "item"):
+        if callable(getattr(value, convert, None)):
+            return getattr(value, convert)()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class JsResultPusher:
+    """Forwards background results to the map page via window.evaluate_js.
+
+    evaluate_js blocks until the page has run the script, so deliveries
+    are handed to one worker thread (keeping their order) instead of
+    running on the pool or loop thread that finished the task. A result
+    that cannot be encoded is delivered as an error, so the page's
+    promise still settles.
+    """
+
+    def __init__(self, evaluate_js: Callable[[str], Any]) -> None:
+        self._evaluate_js = evaluate_js
+        self._worker = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="bridge-result")
+
+    def deliver(self, request_id: str, result: Any, error: str | None) -> None:
+        self._worker.submit(self._run, request_id, result, error)
+
+    def close(self) -> None:
+        self._worker.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, request_id: str, result: Any, error: str | None) -> None:
+        try:
+            payload = json.dumps(result, default=_json_default)
+        except (TypeError, ValueError) as e:
+            logger.warning("Bridge result %s is not serializable: %s", request_id, e)
+            payload, error = "null", error or f"unserializable result: {e}"
+        try:
+            self._evaluate_js(f"onBridgeResult({json.dumps(request_id)}, {payload}, {json.dumps(error)})")
+        except Exception as e:
+            logger.warning("Delivering bridge result %s failed: %s", request_id, e)
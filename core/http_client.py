@@ -0,0 +1,445 @@
+"""
+core/http_client.py — One shared, polite HTTP client for every outbound call.
+
+Geocoding, routing, detail providers, tiles and photo downloads all go
+through the same HttpClient, which runs one httpx.AsyncClient on a
+background asyncio loop:
+
+- keep-alive connection pooling, and HTTP/2 where the server offers it
+  (when the optional h2 package is installed);
+- a token bucket per host (Nominatim-style services get 1 req/s), so a
+  burst such as a trip-open prefetch is spread out instead of banned;
+- two priority lanes per bucket: interactive requests take the next
+  token ahead of any queued background prefetch;
+- retries of idempotent requests on connection errors, 429 and 5xx,
+  with jittered exponential backoff that honours Retry-After;
+- ETag / Last-Modified revalidation for requests made with
+  revalidate=True, from a PersistentCache, so unchanged resources cost
+  a 304.
+
+Async callers (on the client's loop) await request()/get(); threads use
+request_sync()/get_sync(). Code running on the loop can mark a whole
+task as background work with `request_priority.set(BACKGROUND)`.
+
+Hosts and limits are plain settings, so everything can be checked
+against local stand-in servers:
+
+    client = HttpClient(host_limits={"127.0.0.1": (2.0, 1)})
+    response = client.get_sync("http://127.0.0.1:9000/search", params={"q": "x"})
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import email.utils
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+
+from data.cache_store import PersistentCache, WEEK
+
+try:
+    import h2  # noqa: F401 — enables HTTP/2 in httpx
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "DayTripping/1.0"
+DEFAULT_TIMEOUT = 10.0
+MAX_CONNECTIONS = 20
+MAX_KEEPALIVE = 10
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Host (or parent domain) → (requests per second, burst)
+HOST_LIMITS: dict[str, tuple[float, int]] = {
+    "nominatim.openstreetmap.org": (1.0, 1),   # Usage policy: at most 1 req/s
+    "tile.openstreetmap.org": (8.0, 16),
+    "router.project-osrm.org": (5.0, 5),
+    "wikipedia.org": (10.0, 10),
+    "wikimedia.org": (10.0, 10),
+}
+DEFAULT_LIMIT = (10.0, 20)
+
+MAX_RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+BACKOFF_BASE = 0.5                # Seconds before the first retry (before jitter)
+BACKOFF_MAX = 30.0
+
+REVALIDATE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+REVALIDATE_CACHE_TTL = 4 * WEEK
+
+request_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "request_priority", default=INTERACTIVE
+)
+
+
+def limit_key(host: str, limits: dict[str, tuple[float, int]]) -> str:
+    """The HOST_LIMITS entry governing a host (its own name if none does)."""
+    host = host.lower()
+    for key in limits:
+        if host == key or host.endswith("." + key):
+            return key
+    return host
+
+
+def retry_after(response: httpx.Response) -> float | None:
+    """Seconds from a Retry-After header (delta or HTTP date), if any."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Per-host rate limit with an interactive and a background lane.
+
+    Loop-thread only. A request takes a token at once when one is free
+    and nobody of equal or higher priority is queued; otherwise it waits
+    in its lane and is woken as tokens refill, interactive lane first.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lanes: tuple[deque, deque] = (deque(), deque())
+        self._waker: asyncio.TimerHandle | None = None
+
+    async def acquire(self, priority: int = INTERACTIVE) -> float:
+        """Wait for a token; returns the seconds spent waiting."""
+        self._refill()
+        if self.tokens >= 1 and not any(self._lanes[:priority + 1]):
+            self.tokens -= 1
+            return 0.0
+        started = time.monotonic()
+        waiter = asyncio.get_running_loop().create_future()
+        self._lanes[priority].append(waiter)
+        self._schedule()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._lanes[priority].remove(waiter)
+                except ValueError:
+                    pass
+            else:
+                self.tokens += 1  # Granted just as we were cancelled
+            raise
+        return time.monotonic() - started
+
+    def pause(self, seconds: float) -> None:
+        """Hold every request to this host back (after a 429 / Retry-After)."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.tokens = min(self.tokens, 0.0)
+        if self._waker is not None:
+            self._waker.cancel()
+            self._waker = None
+        self._schedule()
+
+    def queued(self) -> tuple[int, int]:
+        return len(self._lanes[INTERACTIVE]), len(self._lanes[BACKGROUND])
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if now >= self._paused_until:
+            start = max(self._updated, self._paused_until)
+            self.tokens = min(self.burst, self.tokens + (now - start) * self.rate)
+        self._updated = now
+
+    def _schedule(self) -> None:
+        if self._waker is not None or not any(self._lanes):
+            return
+        now = time.monotonic()
+        delay = max(self._paused_until - now, (1 - self.tokens) / self.rate, 0.0)
+        self._waker = asyncio.get_running_loop().call_later(delay, self._wake)
+
+    def _wake(self) -> None:
+        self._waker = None
+        self._refill()
+        for lane in self._lanes:
+            while lane and self.tokens >= 1:
+                waiter = lane.popleft()
+                if not waiter.done():
+                    self.tokens -= 1
+                    waiter.set_result(None)
+        self._schedule()
+
+
+class HttpClient:
+    """Pooled, rate-limited, retrying HTTP client on a background loop."""
+
+    def __init__(
+        self,
+        host_limits: dict[str, tuple[float, int]] | None = None,
+        default_limit: tuple[float, int] = DEFAULT_LIMIT,
+        cache: PersistentCache | None = None,
+        max_retries: int = MAX_RETRIES,
+        timeout: float = DEFAULT_TIMEOUT,
+        http2: bool = HTTP2_AVAILABLE,
+        user_agent: str = USER_AGENT,
+    ) -> None:
+        self.host_limits = dict(HOST_LIMITS if host_limits is None else host_limits)
+        self.default_limit = default_limit
+        self.max_retries = max_retries
+        self._cache = cache
+        self._client_options = {
+            "headers": {"User-Agent": user_agent},
+            "timeout": timeout,
+            "follow_redirects": True,
+            "http2": http2 and HTTP2_AVAILABLE,
+            "limits": httpx.Limits(
+                max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE
+            ),
+        }
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._buckets: dict[str, TokenBucket] = {}
+        self.counts = {
+            "requests": 0, "retries": 0, "throttled": 0, "revalidated": 0, "errors": 0,
+        }
+        self._waited = 0.0
+
+    # --- Public API ---
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """The client's event loop (started on first use)."""
+        with self._lock:
+            if self._loop is None:
+                self._ready.clear()
+                threading.Thread(target=self._run_loop, name="http-client", daemon=True).start()
+                self._ready.wait()
+            return self._loop
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        priority: int | None = None,
+        revalidate: bool = False,
+        max_bytes: int | None = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a request through the host's bucket, retrying where safe.
+
+        Must run on `loop`. Responses are fully read; `max_bytes` aborts
+        downloads larger than that with ValueError.
+        """
+        priority = request_priority.get() if priority is None else priority
+        method = method.upper()
+        host = urlsplit(url).hostname or ""
+        bucket = self._bucket(host)
+
+        cache_key = cached = None
+        if revalidate and method == "GET" and self._cache is not None:
+            cache_key = str(httpx.URL(url, params=kwargs.get("params")))
+            cached = self._cached(cache_key)
+            if cached is not None:
+                headers = dict(kwargs.get("headers") or {})
+                if cached[0].get("etag"):
+                    headers["If-None-Match"] = cached[0]["etag"]
+                if cached[0].get("last_modified"):
+                    headers["If-Modified-Since"] = cached[0]["last_modified"]
+                kwargs["headers"] = headers
+
+        retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            waited = await bucket.acquire(priority)
+            self._waited += waited
+            self.counts["requests"] += 1
+            self.counts["throttled"] += waited > 0
+            try:
+                response = await self._send(method, url, max_bytes, **kwargs)
+            except httpx.TransportError as e:
+                if attempt >= retries:
+                    self.counts["errors"] += 1
+                    raise
+                delay = self._backoff(attempt)
+                logger.debug("%s %s failed (%s); retry in %.1f s", method, host, e, delay)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    break
+                delay = retry_after(response)
+                if delay is not None:
+                    bucket.pause(delay)
+                delay = max(delay or 0.0, self._backoff(attempt))
+                logger.debug("%s %s → %d; retry in %.1f s", method, host, response.status_code, delay)
+            attempt += 1
+            self.counts["retries"] += 1
+            await asyncio.sleep(delay)
+
+        if cache_key is not None:
+            if response.status_code == 304 and cached is not None:
+                self.counts["revalidated"] += 1
+                meta, body = cached
+                self._cache.put_bytes(cache_key, self._entry(meta, body))  # Refresh LRU/TTL
+                return httpx.Response(
+                    200,
+                    headers={**meta.get("headers", {}), "X-Revalidated": "1"},
+                    content=body,
+                    request=response.request,
+                )
+            if response.status_code == 200:
+                self._store(cache_key, response)
+        return response
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    def request_sync(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Blocking request() for threads other than the client's loop.
+
+        Without an explicit priority, the calling thread's request_priority
+        applies (the loop task would not see it otherwise).
+        """
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("request_sync() called on the HTTP client loop; await request()")
+        kwargs.setdefault("priority", request_priority.get())
+        return asyncio.run_coroutine_threadsafe(self.request(method, url, **kwargs), loop).result()
+
+    def get_sync(self, url: str, **kwargs: Any) -> httpx.Response:
+        return self.request_sync("GET", url, **kwargs)
+
+    def stats(self) -> dict:
+        """Request counters plus tokens and queue depth per host bucket."""
+        return {
+            **self.counts,
+            "wait_s": round(self._waited, 2),
+            "http2": self._client_options["http2"],
+            "hosts": {
+                key: {"tokens": round(bucket.tokens, 2), "queued": bucket.queued()}
+                for key, bucket in list(self._buckets.items())
+            },
+        }
+
+    def close(self) -> None:
+        if self._loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+    # --- Internals ---
+
+    def _run_loop(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._client = httpx.AsyncClient(**self._client_options)
+        self._thread = threading.current_thread()
+        self._loop = loop
+        self._ready.set()
+        loop.run_forever()
+        loop.close()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        key = limit_key(host, self.host_limits)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(*self.host_limits.get(key, self.default_limit))
+        return bucket
+
+    async def _send(self, method: str, url: str, max_bytes: int | None, **kwargs: Any) -> httpx.Response:
+        if max_bytes is None:
+            return await self._client.request(method, url, **kwargs)
+        async with self._client.stream(method, url, **kwargs) as response:
+            chunks = []
+            received = 0
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > max_bytes:
+                    raise ValueError(f"response larger than {max_bytes} bytes")
+                chunks.append(chunk)
+        # The body is already decoded, so drop the headers that describe the wire form
+        headers = [
+            (name, value) for name, value in response.headers.multi_items()
+            if name.lower() not in ("content-encoding", "content-length", "transfer-encoding")
+        ]
+        return httpx.Response(
+            response.status_code,
+            headers=headers,
+            content=b"".join(chunks),
+            request=response.request,
+        )
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    # Revalidation entries: one JSON header line, then the body bytes
+
+    @staticmethod
+    def _entry(meta: dict, body: bytes) -> bytes:
+        return json.dumps(meta).encode() + b"\n" + body
+
+    def _cached(self, key: str) -> tuple[dict, bytes] | None:
+        raw = self._cache.get_bytes(key)
+        if raw is None:
+            return None
+        header, _, body = raw.partition(b"\n")
+        try:
+            return json.loads(header), body
+        except ValueError:
+            return None
+
+    def _store(self, key: str, response: httpx.Response) -> None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if not (etag or last_modified):
+            return
+        meta = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "headers": {
+                name: response.headers[name]
+                for name in ("Content-Type", "ETag", "Last-Modified")
+                if name in response.headers
+            },
+        }
+        self._cache.put_bytes(key, self._entry(meta, response.content))
+
+
+_client: HttpClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_http_client() -> HttpClient:
+    """The app-wide client, with a revalidation cache next to the other caches."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(cache=PersistentCache(
+                "http",
+                max_bytes=REVALIDATE_CACHE_MAX_BYTES,
+                default_ttl=REVALIDATE_CACHE_TTL,
+            ))
+        return _client
@@ -0,0 +1,391 @@
+"""
+core/location_details.py — Concurrent, streaming fan-out for stop details.
+
+Every provider (photos, facts, activities, restaurants, weather) is
+queried at once on the shared HttpClient's loop (core/http_client.py),
+so providers get its pooling, per-host rate limits and retries. Each
+source has its own timeout, and each section is handed to a callback
+the moment it resolves, so the detail panel fills in progressively and
+a dead provider only blanks its own section.
+
+Results are cached per source and stop coordinates, each source with
+its own TTL (weather for minutes, places for days, facts and photos for
+weeks). Cached sections are delivered at once; expired ones are shown
+and then refreshed in place. When a trip opens, prefetch() warms the
+cache for all its stops in the background lane, yielding to panel requests.
+
+Providers are async callables `(http, name, lat, lng) -> data`, where
+`await http.get(url, ...)` returns an httpx.Response, so the layer can be
+exercised against local fakes.
+
+Usage (from the map bridge):
+    details = LocationDetails(providers)
+    push = JsDetailPusher(window.evaluate_js)
+    request_id = details.fetch(name, lat, lng, push.section, push.done)
+    details.prefetch(trip_data["stops"])
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable
+
+from core.http_client import BACKGROUND, HttpClient, get_http_client, request_priority
+from core.route_cache import quantize
+from core.thumbnails import ThumbnailService
+from data.cache_store import DAY, MINUTE, WEEK, PersistentCache
+
+logger = logging.getLogger(__name__)
+
+DETAIL_SOURCES = ("photos", "facts", "activities", "restaurants", "weather")
+SOURCE_TIMEOUTS = {
+    "photos": 8.0,
+    "facts": 6.0,
+    "activities": 8.0,
+    "restaurants": 8.0,
+    "weather": 4.0,
+}
+DEFAULT_TIMEOUT = 8.0
+LATENCY_WINDOW = 200
+
+SOURCE_TTLS = {
+    "weather": 15 * MINUTE,
+    "restaurants": 3 * DAY,
+    "activities": 3 * DAY,
+    "facts": 4 * WEEK,
+    "photos": 4 * WEEK,
+}
+DEFAULT_TTL = DAY
+DETAILS_CACHE_MAX_BYTES = 32 * 1024 * 1024
+PREFETCH_CONCURRENCY = 2   # Stops warmed at once in the background
+
+# provider(http, name, lat, lng) -> section data (list, dict, or None)
+Provider = Callable[[HttpClient, str, float, float], Awaitable[Any]]
+# on_section(request_id, source, data, error); error is "stale" for an
+# expired cached section that is being refreshed
+SectionCallback = Callable[[str, str, Any, "str | None"], None]
+# on_done(request_id, timing)
+DoneCallback = Callable[[str, dict], None]
+
+
+def _has_content(data: Any) -> bool:
+    return data is not None and data != [] and data != {}
+
+
+def details_key(source: str, lat: float, lng: float) -> str:
+    """Cache key for one source at a stop's (quantized) coordinates."""
+    qlat, qlng = quantize((lat, lng))
+    return f"{source}:{qlat:.4f},{qlng:.4f}"
+
+
+class LocationDetails:
+    """Runs detail providers concurrently and streams their sections."""
+
+    def __init__(
+        self,
+        providers: dict[str, Provider],
+        timeouts: dict[str, float] | None = None,
+        cache: PersistentCache | None = None,
+        ttls: dict[str, float] | None = None,
+        http: HttpClient | None = None,
+    ) -> None:
+        self.providers = dict(providers)
+        self.timeouts = {**SOURCE_TIMEOUTS, **(timeouts or {})}
+        self.ttls = {**SOURCE_TTLS, **(ttls or {})}
+        self._cache = cache or PersistentCache("details", max_bytes=DETAILS_CACHE_MAX_BYTES)
+        self._http = http or get_http_client()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._channels: dict[str, tuple[str, asyncio.Future]] = {}
+        self._prefetch: asyncio.Future | None = None
+        self._interactive = 0             # Panel requests in flight (loop thread only)
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._first_content: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._failures: dict[str, int] = {source: 0 for source in self.providers}
+
+    # --- Public API ---
+
+    def fetch(
+        self,
+        name: str,
+        lat: float,
+        lng: float,
+        on_section: SectionCallback,
+        on_done: DoneCallback | None = None,
+        channel: str = "panel",
+    ) -> str:
+        """Start fetching every section; returns the request id immediately.
+
+        A newer fetch on the same channel cancels the older one, whose
+        remaining sections are never delivered.
+        """
+        loop = self._http.loop
+        request_id = f"d{next(self._ids)}"
+        future = asyncio.run_coroutine_threadsafe(
+            self._gather(request_id, name, lat, lng, on_section, on_done), loop
+        )
+        with self._lock:
+            previous = self._channels.get(channel)
+            self._channels[channel] = (request_id, future)
+        if previous is not None:
+            previous[1].cancel()
+        return request_id
+
+    def fetch_all(self, name: str, lat: float, lng: float) -> dict:
+        """Blocking fetch of every section, for callers that want one dict."""
+        sections: dict[str, Any] = {}
+        done = threading.Event()
+        self.fetch(
+            name, lat, lng,
+            lambda _rid, source, data, _error: sections.__setitem__(source, data),
+            lambda _rid, _timing: done.set(),
+            channel=f"sync-{threading.get_ident()}",
+        )
+        done.wait(max(self.timeouts.get(s, DEFAULT_TIMEOUT) for s in self.providers) + 1.0)
+        return sections
+
+    def prefetch(self, stops: list[dict]) -> None:
+        """Warm the cache for trip stops ({name, latitude, longitude}) in the background.
+
+        Runs at most PREFETCH_CONCURRENCY stops at once and pauses while a
+        panel request is in flight. Replaces any prefetch still running.
+        """
+        points = [
+            (stop.get("name") or "", float(stop["latitude"]), float(stop["longitude"]))
+            for stop in stops
+            if stop.get("latitude") is not None and stop.get("longitude") is not None
+        ]
+        loop = self._http.loop
+        future = asyncio.run_coroutine_threadsafe(self._warm(points), loop)
+        with self._lock:
+            previous, self._prefetch = self._prefetch, future
+        if previous is not None:
+            previous.cancel()
+
+    def stats(self) -> dict:
+        """Time-to-first-content percentiles and per-source failure counts."""
+        with self._lock:
+            samples = sorted(self._first_content)
+            failures = dict(self._failures)
+        result: dict[str, Any] = {"requests": len(samples), "failures": failures}
+        if samples:
+            result["ttfc_p50_ms"] = samples[len(samples) // 2] * 1000
+            result["ttfc_p95_ms"] = samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000
+        return result
+
+    def close(self) -> None:
+        """Cancel background work; the shared HttpClient stays open."""
+        with self._lock:
+            pending = [future for _rid, future in self._channels.values()]
+            if self._prefetch is not None:
+                pending.append(self._prefetch)
+        for future in pending:
+            future.cancel()
+
+    # --- Internals ---
+
+    async def _gather(
+        self,
+        request_id: str,
+        name: str,
+        lat: float,
+        lng: float,
+        on_section: SectionCallback,
+        on_done: DoneCallback | None,
+    ) -> None:
+        started = time.perf_counter()
+        first_content: float | None = None
+        failed: list[str] = []
+
+        stale_shown: set[str] = set()
+        tasks: list[asyncio.Task] = []
+        self._interactive += 1
+        self._idle.clear()
+        try:
+            # Cached sections go out first; only missing or expired ones are fetched.
+            # SQLite reads run off the loop so they never hold up other requests.
+            entries = await asyncio.to_thread(self._cached_entries, lat, lng)
+            now = time.time()
+            for source, provider in self.providers.items():
+                entry = entries.get(source)
+                if entry is not None:
+                    data, expires_at = entry
+                    fresh = expires_at is None or expires_at > now
+                    if first_content is None and _has_content(data):
+                        first_content = time.perf_counter() - started
+                    self._deliver(on_section, request_id, source, data, None if fresh else "stale")
+                    if fresh:
+                        continue
+                    stale_shown.add(source)
+                tasks.append(asyncio.create_task(self._run_source(source, provider, name, lat, lng)))
+
+            for next_done in asyncio.as_completed(tasks):
+                source, data, error = await next_done
+                if error:
+                    failed.append(source)
+                    if source in stale_shown:
+                        continue  # Keep the stale copy on screen
+                elif first_content is None and _has_content(data):
+                    first_content = time.perf_counter() - started
+                self._deliver(on_section, request_id, source, data, error)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            self._interactive -= 1
+            if not self._interactive:
+                self._idle.set()
+
+        total = time.perf_counter() - started
+        with self._lock:
+            if first_content is not None:
+                self._first_content.append(first_content)
+            for source in failed:
+                self._failures[source] = self._failures.get(source, 0) + 1
+        timing = {
+            "first_content_ms": None if first_content is None else round(first_content * 1000, 1),
+            "total_ms": round(total * 1000, 1),
+            "failed": failed,
+        }
+        logger.info(
+            "Details for %r: first content %s ms, all %.0f ms, failed %s",
+            name, timing["first_content_ms"], timing["total_ms"], failed or "none",
+        )
+        if on_done is not None:
+            self._deliver(on_done, request_id, timing)
+
+    async def _run_source(
+        self, source: str, provider: Provider, name: str, lat: float, lng: float
+    ) -> tuple[str, Any, str | None]:
+        """Run one provider under its timeout and cache the result.
+
+        Never raises (except on cancellation); failures are not cached.
+        """
+        try:
+            data = await asyncio.wait_for(
+                provider(self._http, name, lat, lng),
+                self.timeouts.get(source, DEFAULT_TIMEOUT),
+            )
+            await asyncio.to_thread(
+                self._cache.put, details_key(source, lat, lng), data, ttl=self.ttls.get(source, DEFAULT_TTL)
+            )
+            return source, data, None
+        except asyncio.TimeoutError:
+            logger.warning("Detail source %s timed out for %r", source, name)
+            return source, None, "timeout"
+        except Exception as e:
+            logger.warning("Detail source %s failed for %r: %s", source, name, e)
+            return source, None, "error"
+
+    def _cached_entries(self, lat: float, lng: float) -> dict[str, tuple[Any, float | None]]:
+        """Cached (data, expires_at) per source at a stop (blocking; run off the loop)."""
+        entries = {}
+        for source in self.providers:
+            entry = self._cache.get_entry(details_key(source, lat, lng))
+            if entry is not None:
+                entries[source] = entry
+        return entries
+
+    def _is_fresh(self, source: str, lat: float, lng: float) -> bool:
+        entry = self._cache.get_entry_bytes(details_key(source, lat, lng))
+        return entry is not None and (entry[1] is None or entry[1] > time.time())
+
+    async def _warm(self, stops: list[tuple[str, float, float]]) -> None:
+        """Fill the cache for each stop, a few at a time, behind panel requests."""
+        request_priority.set(BACKGROUND)  # Inherited by every provider call below
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+        fetched = 0
+
+        async def warm_stop(name: str, lat: float, lng: float) -> None:
+            nonlocal fetched
+            async with semaphore:
+                await self._idle.wait()
+                fresh = await asyncio.to_thread(
+                    lambda: {source for source in self.providers if self._is_fresh(source, lat, lng)}
+                )
+                missing = [
+                    (source, provider) for source, provider in self.providers.items()
+                    if source not in fresh
+                ]
+                results = await asyncio.gather(
+                    *(self._run_source(source, provider, name, lat, lng) for source, provider in missing)
+                )
+                fetched += sum(1 for _source, _data, error in results if not error)
+
+        await asyncio.gather(*(warm_stop(*stop) for stop in stops))
+        logger.info(
+            "Prefetched %d detail sections for %d stops in %.1f s",
+            fetched, len(stops), time.perf_counter() - started,
+        )
+
+    @staticmethod
+    def _deliver(callback: Callable, *args) -> None:
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.warning("Detail callback failed: %s", e)
+
+
+class JsDetailPusher:
+    """Forwards sections to the map page via window.evaluate_js.
+
+    evaluate_js blocks until the page has run the script, so pushes are
+    handed to one worker thread (keeping their order) instead of running
+    on the HTTP loop that calls section() and done().
+
+    With a ThumbnailService, photos get their local thumbnail URLs at push
+    time, and the section is pushed again once pending thumbnails finish.
+    """
+
+    def __init__(
+        self, evaluate_js: Callable[[str], Any], thumbnails: ThumbnailService | None = None
+    ) -> None:
+        self._evaluate_js = evaluate_js
+        self._thumbnails = thumbnails
+        self._worker = ThreadPoolExecutor(1, thread_name_prefix="detail-push")
+
+    def section(self, request_id: str, source: str, data: Any, error: str | None) -> None:
+        if source == "photos" and self._thumbnails is not None and isinstance(data, list):
+            self._worker.submit(self._push_photos, request_id, data, error, True)
+            return
+        self._push(self._section_js(request_id, source, data, error))
+
+    def done(self, request_id: str, timing: dict) -> None:
+        self._push(f"onDetailsDone({json.dumps(request_id)}, {json.dumps(timing)})")
+
+    def close(self) -> None:
+        self._worker.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _section_js(request_id: str, source: str, data: Any, error: str | None) -> str:
+        return (
+            f"onDetailSection({json.dumps(request_id)}, {json.dumps(source)}, "
+            f"{json.dumps(data)}, {json.dumps(error)})"
+        )
+
+    def _push_photos(self, request_id: str, photos: list, error: str | None, first: bool) -> None:
+        if first:
+            # Registered before resolving, so a build finishing in between still re-pushes
+            self._thumbnails.when_ready(
+                photos, lambda: self._worker.submit(self._push_photos, request_id, photos, error, False)
+            )
+        self._run(self._section_js(request_id, "photos", self._thumbnails.with_urls(photos), error))
+
+    def _push(self, script: str) -> None:
+        self._worker.submit(self._run, script)
+
+    def _run(self, script: str) -> None:
+        try:
+            self._evaluate_js(script)
+        except Exception as e:
+            logger.warning("Pushing details to the page failed: %s", e)
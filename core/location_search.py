@@ -0,0 +1,193 @@
+"""
+core/location_search.py — Cached, coalesced, cancellable location search.
+
+Sits between the `search_location` bridge call and the geocoder:
+
+- Results are kept in a persistent LRU+TTL cache keyed by normalized query.
+- A query extending a cached one ("Sant" after "San") is answered by
+  filtering the cached results when enough of them still match.
+- Identical queries already in flight share one geocoder call.
+- Each search box sends a sequence number; a request superseded by a
+  newer one from the same box is dropped before it reaches the network,
+  and its late result is reported as stale.
+
+The geocoder is any callable `query -> list[dict]`, so the layer can be
+exercised against a local fake.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable
+
+from data.cache_store import PersistentCache, WEEK
+
+logger = logging.getLogger(__name__)
+
+MIN_QUERY_LENGTH = 3
+PREFIX_MIN_RESULTS = 3   # Fewer filtered matches than this → ask the geocoder
+LATENCY_WINDOW = 200     # Samples kept for latency percentiles
+
+Geocoder = Callable[[str], list]
+
+_WS_RE = re.compile(r"\s+")
+_WORD_RE = re.compile(r"\w+")
+
+
+def normalize_query(query: str) -> str:
+    """Casefold and collapse whitespace so equivalent queries share a key."""
+    return _WS_RE.sub(" ", query.strip()).casefold()
+
+
+def _matches(item: dict, tokens: list[str]) -> bool:
+    """True if every query token is a prefix of some word in the item's name."""
+    label = (item.get("display_name") or item.get("name") or "").casefold()
+    words = _WORD_RE.findall(label)
+    return all(any(word.startswith(tok) for word in words) for tok in tokens)
+
+
+class LocationSearch:
+    """Front end for geocoder lookups used by the map's search boxes."""
+
+    def __init__(
+        self,
+        geocoder: Geocoder,
+        cache: PersistentCache | None = None,
+        ttl: float = WEEK,
+    ) -> None:
+        self._geocoder = geocoder
+        self._cache = cache or PersistentCache("geocode", max_entries=5000, default_ttl=ttl)
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        self._latest_seq: dict[str, int] = {}
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._counts = {
+            "hits": 0,
+            "prefix_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "superseded": 0,
+            "errors": 0,
+        }
+
+    def search(
+        self, query: str, seq: int | None = None, channel: str = "default"
+    ) -> dict:
+        """Resolve a query.
+
+        Returns {"seq": seq, "results": [...], "source": ..., "stale": bool}.
+        `stale` is True when a newer request from the same channel arrived
+        first; callers should ignore those results.
+        """
+        started = time.perf_counter()
+        key = normalize_query(query)
+        if seq is not None:
+            with self._lock:
+                if seq < self._latest_seq.get(channel, -1):
+                    self._counts["superseded"] += 1
+                    return self._response(seq, [], "superseded", stale=True)
+                self._latest_seq[channel] = seq
+
+        if len(key) < MIN_QUERY_LENGTH:
+            return self._response(seq, [], "short", channel=channel)
+
+        results, source = self._lookup(key, seq, channel)
+        self._record(source, time.perf_counter() - started)
+        return self._response(seq, results, source, channel=channel)
+
+    def stats(self) -> dict:
+        """Hit rate and latency figures for logging or a debug overlay."""
+        with self._lock:
+            counts = dict(self._counts)
+            samples = sorted(self._latencies)
+        lookups = counts["hits"] + counts["prefix_hits"] + counts["misses"]
+        counts["hit_rate"] = (
+            (counts["hits"] + counts["prefix_hits"]) / lookups if lookups else 0.0
+        )
+        if samples:
+            counts["p50_ms"] = samples[len(samples) // 2] * 1000
+            counts["p95_ms"] = samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000
+        return counts
+
+    # --- Internals ---
+
+    def _lookup(self, key: str, seq: int | None, channel: str) -> tuple[list, str]:
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached, "cache"
+
+        filtered = self._from_prefix(key)
+        if filtered is not None:
+            return filtered, "prefix"
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                # Last chance to skip the network if a newer query replaced us
+                if seq is not None and seq < self._latest_seq.get(channel, -1):
+                    return [], "superseded"
+                future = Future()
+                self._in_flight[key] = future
+
+        if not owner:
+            return future.result(), "coalesced"
+
+        try:
+            results = list(self._geocoder(key) or [])
+        except Exception as e:
+            logger.warning("Geocoder failed for %r: %s", key, e)
+            results = []
+            with self._lock:
+                self._counts["errors"] += 1
+        else:
+            self._cache.put(key, results)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        future.set_result(results)
+        return results, "geocoder"
+
+    def _from_prefix(self, key: str) -> list | None:
+        """Filter cached results of the longest cached prefix of key."""
+        tokens = key.split(" ")
+        for end in range(len(key) - 1, MIN_QUERY_LENGTH - 1, -1):
+            cached = self._cache.get(key[:end])
+            if cached is None:
+                continue
+            filtered = [item for item in cached if _matches(item, tokens)]
+            return filtered if len(filtered) >= PREFIX_MIN_RESULTS else None
+        return None
+
+    def _record(self, source: str, elapsed: float) -> None:
+        counter = {
+            "cache": "hits",
+            "prefix": "prefix_hits",
+            "geocoder": "misses",
+            "coalesced": "coalesced",
+            "superseded": "superseded",
+        }.get(source)
+        with self._lock:
+            if counter:
+                self._counts[counter] += 1
+            if source in ("cache", "prefix", "geocoder", "coalesced"):
+                self._latencies.append(elapsed)
+        logger.debug("search %s in %.1f ms", source, elapsed * 1000)
+
+    def _response(
+        self,
+        seq: int | None,
+        results: list,
+        source: str,
+        stale: bool = False,
+        channel: str = "default",
+    ) -> dict:
+        if not stale and seq is not None:
+            with self._lock:
+                stale = seq < self._latest_seq.get(channel, -1)
+        return {"seq": seq, "results": results, "source": source, "stale": stale}
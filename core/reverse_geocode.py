@@ -0,0 +1,178 @@
+"""
+core/reverse_geocode.py — Deferred, batched place names for clicked stops.
+
+A map click creates its stop at once under a coordinate placeholder
+name; the real name is looked up afterwards:
+
+- lookups are keyed by coordinates rounded to ~10 m, so stops dropped
+  on the same spot (or a retried batch) share one request;
+- results, including "no name here", are cached persistently;
+- requests go through the shared HttpClient in the background lane, so
+  its per-host bucket keeps Nominatim at 1 req/s and searches the user
+  is typing are not held up behind a burst of clicks;
+- names resolved close together are handed to on_resolved as one
+  {stop_id: name} dict, so the database write and the push to the page
+  happen once per batch, not once per stop.
+
+Usage (from the map bridge):
+    namer = ReverseGeocodeQueue(on_resolved=lambda names: (
+        rename_stops(store, names), push_stop_names(window.evaluate_js, names)))
+    apply_stop_batch(store, trip_id, ops, defer_name=namer.request)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+from typing import Any, Awaitable, Callable
+
+from core.http_client import BACKGROUND, HttpClient, get_http_client, request_priority
+from data.cache_store import WEEK, PersistentCache
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_REVERSE = "https://nominatim.openstreetmap.org/reverse"
+KEY_PRECISION = 4              # Decimal places (~11 m) shared by one lookup
+CACHE_TTL = 8 * WEEK
+NO_NAME = ""                   # Cached when a spot has no usable name
+BATCH_WINDOW = 0.25            # Seconds to gather names before delivering
+MAX_CONCURRENT = 2
+
+# reverse(http, lat, lng) -> place name or None
+Reverse = Callable[[HttpClient, float, float], Awaitable["str | None"]]
+# on_resolved({stop_id: name})
+Resolved = Callable[[dict[int, str]], None]
+
+
+def placeholder_name(lat: float, lng: float) -> str:
+    """The coordinate name a stop carries until its place name arrives."""
+    return f"{lat:.4f}, {lng:.4f}"
+
+
+def coord_key(lat: float, lng: float) -> str:
+    return f"{round(lat, KEY_PRECISION):.{KEY_PRECISION}f},{round(lng, KEY_PRECISION):.{KEY_PRECISION}f}"
+
+
+async def nominatim_reverse(http: HttpClient, lat: float, lng: float) -> str | None:
+    """Short place name (POI, town, or road) for a point, from Nominatim."""
+    response = await http.get(
+        NOMINATIM_REVERSE,
+        params={"format": "jsonv2", "lat": lat, "lon": lng, "zoom": 16, "addressdetails": 1},
+    )
+    response.raise_for_status()
+    data = response.json()
+    address = data.get("address") or {}
+    if data.get("name"):
+        return data["name"]
+    for field in ("tourism", "amenity", "village", "town", "city", "suburb", "road", "county"):
+        if address.get(field):
+            return address[field]
+    return None
+
+
+class ReverseGeocodeQueue:
+    """Background reverse geocoding, deduplicated by rounded coordinates."""
+
+    def __init__(
+        self,
+        on_resolved: Resolved,
+        reverse: Reverse = nominatim_reverse,
+        cache: PersistentCache | None = None,
+        http: HttpClient | None = None,
+        batch_window: float = BATCH_WINDOW,
+    ) -> None:
+        self._on_resolved = on_resolved
+        self._reverse = reverse
+        self._cache = cache or PersistentCache("reverse_geocode", max_entries=20000, default_ttl=CACHE_TTL)
+        self._http = http or get_http_client()
+        self.batch_window = batch_window
+        self._lock = threading.Lock()
+        self._waiting: dict[str, set[int]] = {}      # coord key → stop ids
+        self._lookups: dict[str, Any] = {}          # coord key → future in flight
+        self._ready: dict[int, str] = {}
+        self._flush: asyncio.TimerHandle | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    # --- Public API ---
+
+    def request(self, stop_id: int, lat: float, lng: float) -> None:
+        """Name a stop in the background; a cached name joins the next batch."""
+        key = coord_key(lat, lng)
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached != NO_NAME:
+                with self._lock:
+                    self._ready[stop_id] = cached
+                self._http.loop.call_soon_threadsafe(self._arm_flush)
+            return
+        with self._lock:
+            self._waiting.setdefault(key, set()).add(stop_id)
+            if key in self._lookups:
+                return
+            self._lookups[key] = asyncio.run_coroutine_threadsafe(
+                self._lookup(key, lat, lng), self._http.loop
+            )
+
+    def cancel(self, stop_id: int) -> None:
+        """Forget a stop (e.g. deleted); its lookup still warms the cache."""
+        with self._lock:
+            for ids in self._waiting.values():
+                ids.discard(stop_id)
+            self._ready.pop(stop_id, None)
+
+    def pending(self) -> int:
+        with self._lock:
+            return sum(len(ids) for ids in self._waiting.values())
+
+    # --- Internals (loop thread) ---
+
+    async def _lookup(self, key: str, lat: float, lng: float) -> None:
+        request_priority.set(BACKGROUND)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+        name: str | None = None
+        ok = False
+        try:
+            async with self._semaphore:
+                name = await self._reverse(self._http, lat, lng)
+            ok = True
+        except Exception as e:
+            logger.warning("Reverse geocoding %s failed: %s", key, e)
+        if ok:
+            # Disk I/O; keep it off the loop
+            await asyncio.get_running_loop().run_in_executor(None, self._cache.put, key, name or NO_NAME)
+
+        with self._lock:
+            self._lookups.pop(key, None)
+            ids = self._waiting.pop(key, set())
+            if name:
+                for stop_id in ids:
+                    self._ready[stop_id] = name
+        self._arm_flush()
+
+    def _arm_flush(self) -> None:
+        """Deliver whatever is ready after batch_window, unless already due."""
+        with self._lock:
+            if self._ready and self._flush is None:
+                self._flush = asyncio.get_running_loop().call_later(self.batch_window, self._flush_ready)
+
+    def _flush_ready(self) -> None:
+        with self._lock:
+            ready, self._ready = self._ready, {}
+            self._flush = None
+        if ready:
+            # The callback writes to the database and the page; keep it off the loop
+            asyncio.get_running_loop().run_in_executor(None, self._deliver, ready)
+
+    def _deliver(self, names: dict[int, str]) -> None:
+        try:
+            self._on_resolved(names)
+        except Exception as e:
+            logger.warning("Delivering %d stop names failed: %s", len(names), e)
+
+
+def push_stop_names(evaluate_js: Callable[[str], Any], names: dict[int, str]) -> None:
+    """Send resolved names to the map page (onStopNames)."""
+    evaluate_js(f"onStopNames({json.dumps({str(k): v for k, v in names.items()})})")
@@ -0,0 +1,172 @@
+"""
+core/route_cache.py — Persistent route results keyed on endpoints and waypoints.
+
+Keys are canonical: every point is quantized to ~10 m (4 decimal places)
+and combined with the routing profile, so recalculating an unchanged
+route, or one whose points only jittered, never reaches the backend.
+
+Whole routes and individual legs are cached separately. Legs come from
+two-point routes and from routers that report per-leg geometry (see
+Router below).
+
+On a miss:
+- if some of the route's legs are cached (a stop was added to or
+  removed from a routed trip), only the uncached legs go to the backend,
+  one two-point call each, and the result is spliced from the legs
+  (marked "spliced": True, no alternatives) and cached like any other;
+- otherwise the route goes to the backend whole, keeping alternatives.
+
+When the backend cannot be reached and every leg is cached, the legs
+are stitched into a bare route (marked "stitched": True). That result
+is returned but never cached under the route's key.
+
+Usage:
+    cache = RouteCache(router=osrm_route)
+    result = cache.calculate((start_lat, start_lng), (end_lat, end_lng), waypoints)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Callable, Sequence
+
+from data.cache_store import PersistentCache
+
+logger = logging.getLogger(__name__)
+
+QUANTIZE_DECIMALS = 4              # 1e-4° ≈ 11 m of latitude
+DEFAULT_PROFILE = "driving"
+ROUTE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+KEY_VERSION = 2                    # v1 could hold stitched routes under full-route keys
+
+LatLng = tuple[float, float]
+# router(points as (lat, lng), profile) -> {"selected": {...}, "alternatives": [...]}
+# "selected" has coordinates, distance and duration; for more than two
+# points it may also carry "legs", one {coordinates, distance, duration}
+# per leg, which are then cached for reuse.
+Router = Callable[[list[LatLng], str], "dict | None"]
+
+
+def quantize(point: Sequence[float]) -> LatLng:
+    """Round a (lat, lng) pair to the cache's ~10 m grid."""
+    return (round(float(point[0]), QUANTIZE_DECIMALS), round(float(point[1]), QUANTIZE_DECIMALS))
+
+
+def route_key(points: Sequence[LatLng], profile: str) -> str:
+    """Canonical cache key for an ordered list of route points."""
+    parts = [f"v{KEY_VERSION}", profile] + [f"{lat:.{QUANTIZE_DECIMALS}f},{lng:.{QUANTIZE_DECIMALS}f}"
+                         for lat, lng in map(quantize, points)]
+    return hashlib.sha1("|".join(parts).encode("ascii")).hexdigest()
+
+
+def leg_key(a: LatLng, b: LatLng, profile: str) -> str:
+    """Cache key for a single leg (kept apart from two-point route keys)."""
+    return route_key([a, b], f"{profile}:leg")
+
+
+def _stitch_legs(legs: list[dict]) -> dict:
+    """Join per-leg results into one route, dropping duplicated junction points."""
+    coordinates: list = []
+    for leg in legs:
+        coords = leg.get("coordinates") or []
+        coordinates.extend(coords[1:] if coordinates else coords)
+    return {
+        "coordinates": coordinates,
+        "distance": sum(leg.get("distance") or 0 for leg in legs),
+        "duration": sum(leg.get("duration") or 0 for leg in legs),
+    }
+
+
+class RouteCache:
+    """Route lookups backed by a disk-bounded LRU cache of routes and legs."""
+
+    def __init__(
+        self,
+        router: Router,
+        cache: PersistentCache | None = None,
+        profile: str = DEFAULT_PROFILE,
+    ) -> None:
+        self._router = router
+        self._cache = cache or PersistentCache("routes", max_bytes=ROUTE_CACHE_MAX_BYTES)
+        self.profile = profile
+        self.backend_calls = 0
+
+    def calculate(
+        self,
+        start: LatLng,
+        end: LatLng,
+        waypoints: Sequence[LatLng] | None = None,
+        profile: str | None = None,
+    ) -> dict | None:
+        """Return {"selected": {...}, "alternatives": [...]} for the route."""
+        profile = profile or self.profile
+        points = [quantize(start), *map(quantize, waypoints or []), quantize(end)]
+        key = route_key(points, profile)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            logger.debug("Route cache hit (%d points)", len(points))
+            return cached
+
+        try:
+            result = self._route_changed_legs(points, profile)
+            if result is None:
+                result = self._route_whole(points, profile)
+        except Exception as e:
+            stitched = self._stitch_cached_legs(points, profile) if len(points) > 2 else None
+            if stitched is None:
+                raise
+            logger.warning("Routing backend failed (%s); using %d cached legs", e, len(points) - 1)
+            return stitched
+
+        if result is not None:
+            self._cache.put(key, result)
+        return result
+
+    # --- Internals ---
+
+    def _route_whole(self, points: list[LatLng], profile: str) -> dict | None:
+        """One backend call for the full route; cache any legs it reports."""
+        self.backend_calls += 1
+        result = self._router(points, profile)
+        if not result or not result.get("selected"):
+            return None
+
+        selected = result["selected"]
+        legs = selected.get("legs") or []
+        if len(points) == 2:
+            self._cache.put(leg_key(points[0], points[1], profile), _stitch_legs([selected]))
+        elif len(legs) == len(points) - 1:
+            for i, leg in enumerate(legs):
+                if leg.get("coordinates"):
+                    self._cache.put(leg_key(points[i], points[i + 1], profile), _stitch_legs([leg]))
+        return result
+
+    def _route_changed_legs(self, points: list[LatLng], profile: str) -> dict | None:
+        """Splice cached legs with freshly routed ones; None unless some are cached."""
+        if len(points) <= 2:
+            return None
+        keys = [leg_key(points[i], points[i + 1], profile) for i in range(len(points) - 1)]
+        legs = [self._cache.get(key) for key in keys]
+        missing = [i for i, leg in enumerate(legs) if leg is None]
+        if len(missing) == len(legs):
+            return None
+
+        for i in missing:
+            routed = self._route_whole([points[i], points[i + 1]], profile)
+            if routed is None:
+                return None
+            legs[i] = _stitch_legs([routed["selected"]])
+        logger.debug("Routed %d of %d legs; reused the rest", len(missing), len(legs))
+        return {"selected": {**_stitch_legs(legs), "legs": legs}, "alternatives": [], "spliced": True}
+
+    def _stitch_cached_legs(self, points: list[LatLng], profile: str) -> dict | None:
+        """A bare route from cached legs, or None unless every leg is cached."""
+        legs: list[dict] = []
+        for i in range(len(points) - 1):
+            leg = self._cache.get(leg_key(points[i], points[i + 1], profile))
+            if leg is None:
+                return None
+            legs.append(leg)
+        return {"selected": _stitch_legs(legs), "alternatives": [], "stitched": True}
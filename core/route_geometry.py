@@ -0,0 +1,242 @@
+"""
+core/route_geometry.py — Multi-resolution route geometry for the map bridge.
+
+Long routes carry tens of thousands of points. Instead of shipping them
+all through pywebview, each route is ranked once with a vectorized
+Douglas–Peucker pass: every vertex gets an "importance" (the tolerance
+below which it would be dropped). Any zoom level is then a threshold on
+that array, so per-band geometries and viewport detail are cheap.
+
+Geometries cross the bridge as Google encoded polylines (precision 5).
+
+Usage:
+    geom = RouteGeometry(selected["coordinates"])   # [[lng, lat], ...]
+    payload = geom.overview()                        # bbox + coarse levels
+    runs = geom.detail(zoom, west, south, east, north)
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+# Zoom bands shipped up front; deeper zooms are fetched per viewport
+OVERVIEW_ZOOMS = (4, 7, 10)
+FULL_DETAIL_ZOOM = 16        # At or beyond this zoom, every vertex is sent
+TOLERANCE_PX = 1.0           # Simplification error budget in screen pixels
+VIEWPORT_PAD = 0.25          # Fraction of the viewport added on each side
+
+
+def pixel_tolerance(zoom: float) -> float:
+    """Mercator-degree size of TOLERANCE_PX pixels at a zoom level."""
+    return TOLERANCE_PX * 360.0 / (256.0 * 2.0 ** zoom)
+
+
+def to_mercator(lnglat: np.ndarray) -> np.ndarray:
+    """Project [lng, lat] rows to Web Mercator, scaled to degrees."""
+    lat = np.clip(lnglat[:, 1], -85.05112878, 85.05112878)
+    y = np.degrees(np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)))
+    return np.column_stack((lnglat[:, 0], y))
+
+
+def dp_importance(xy: np.ndarray) -> np.ndarray:
+    """Douglas–Peucker importance per vertex, batched across all segments.
+
+    Each pass splits every open segment at its farthest interior point, so
+    the whole ranking takes O(log n) vectorized passes. Values are capped
+    by the parent split so thresholds always yield a valid DP result.
+    """
+    n = len(xy)
+    importance = np.zeros(n)
+    importance[[0, -1]] = np.inf
+    if n < 3:
+        return importance
+
+    starts = np.array([0])
+    ends = np.array([n - 1])
+    caps = np.array([np.inf])
+
+    while starts.size:
+        counts = ends - starts - 1
+        open_ = counts > 0
+        starts, ends, caps, counts = starts[open_], ends[open_], caps[open_], counts[open_]
+        if not starts.size:
+            break
+
+        seg = np.repeat(np.arange(starts.size), counts)
+        first = np.cumsum(counts) - counts
+        idx = np.repeat(starts + 1, counts) + (np.arange(counts.sum()) - first[seg])
+
+        a = xy[starts][seg]
+        ab = xy[ends][seg] - a
+        ap = xy[idx] - a
+        len2 = np.einsum("ij,ij->i", ab, ab)
+        t = np.clip(
+            np.divide(np.einsum("ij,ij->i", ap, ab), len2, out=np.zeros_like(len2), where=len2 > 0),
+            0.0, 1.0,
+        )
+        dist = np.hypot(*(ap - ab * t[:, None]).T)
+
+        seg_max = np.maximum.reduceat(dist, first)
+        hits = np.flatnonzero(dist == seg_max[seg])
+        _, first_hit = np.unique(seg[hits], return_index=True)
+        split = idx[hits[first_hit]]
+
+        value = np.minimum(seg_max, caps)
+        importance[split] = value
+
+        starts, ends = np.concatenate((starts, split)), np.concatenate((split, ends))
+        caps = np.concatenate((value, value))
+
+    return importance
+
+
+def encode_polyline(latlng: np.ndarray, precision: int = 5) -> str:
+    """Encode [lat, lng] rows as a Google polyline string (vectorized)."""
+    if len(latlng) == 0:
+        return ""
+    ints = np.round(latlng * 10 ** precision).astype(np.int64)
+    deltas = np.diff(ints, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    # Split each value into 5-bit chunks, low chunk first, up to 7 per value
+    shifts = np.arange(7) * 5
+    chunks = (values[:, None] >> shifts) & 0x1F
+    remaining = values[:, None] >> (shifts + 5)
+    used = np.concatenate((np.ones((len(values), 1), dtype=bool), (values[:, None] >> shifts[1:]) > 0), axis=1)
+    chars = chunks | np.where(remaining > 0, 0x20, 0)
+    return (chars[used] + 63).astype(np.uint8).tobytes().decode("ascii")
+
+
+def decode_polyline(encoded: str, precision: int = 5) -> list[list[float]]:
+    """Decode a Google polyline string to [[lat, lng], ...]."""
+    coords: list[list[float]] = []
+    index = lat = lng = 0
+    factor = 10 ** precision
+    while index < len(encoded):
+        for axis in range(2):
+            shift = result = 0
+            while True:
+                b = ord(encoded[index]) - 63
+                index += 1
+                result |= (b & 0x1F) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            delta = ~(result >> 1) if result & 1 else result >> 1
+            if axis == 0:
+                lat += delta
+            else:
+                lng += delta
+        coords.append([lat / factor, lng / factor])
+    return coords
+
+
+class RouteGeometry:
+    """One route's vertices with precomputed importance for any zoom."""
+
+    def __init__(self, coordinates: Sequence[Sequence[float]]) -> None:
+        self.lnglat = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.importance = dp_importance(to_mercator(self.lnglat)) if len(self.lnglat) else np.zeros(0)
+
+    @classmethod
+    def from_arrays(cls, lnglat: np.ndarray, importance: np.ndarray | None = None) -> RouteGeometry:
+        """Wrap decoded arrays without copying; importance is ranked if missing."""
+        geometry = cls.__new__(cls)
+        geometry.lnglat = lnglat.reshape(-1, 2)
+        if importance is None:
+            importance = dp_importance(to_mercator(geometry.lnglat)) if len(geometry.lnglat) else np.zeros(0)
+        geometry.importance = importance
+        return geometry
+
+    @property
+    def bbox(self) -> list[float]:
+        """[west, south, east, north] of the full route."""
+        if not len(self.lnglat):
+            return []
+        west, south = self.lnglat.min(axis=0)
+        east, north = self.lnglat.max(axis=0)
+        return [float(west), float(south), float(east), float(north)]
+
+    def indices_for_zoom(self, zoom: float) -> np.ndarray:
+        """Vertex indices kept at a zoom level."""
+        if zoom >= FULL_DETAIL_ZOOM:
+            return np.arange(len(self.lnglat))
+        return np.flatnonzero(self.importance >= pixel_tolerance(zoom))
+
+    def encode(self, indices: np.ndarray) -> str:
+        return encode_polyline(self.lnglat[indices][:, ::-1])
+
+    def overview(self) -> dict:
+        """Compact payload: bbox, point count, and coarse per-band polylines."""
+        levels = []
+        for zoom in OVERVIEW_ZOOMS:
+            indices = self.indices_for_zoom(zoom)
+            levels.append({"max_zoom": zoom, "points": int(indices.size), "polyline": self.encode(indices)})
+        return {
+            "bbox": self.bbox,
+            "points": int(len(self.lnglat)),
+            "detail_zoom": OVERVIEW_ZOOMS[-1],
+            "levels": levels,
+        }
+
+    def detail(self, zoom: float, west: float, south: float, east: float, north: float) -> list[dict]:
+        """Encoded runs of zoom-level geometry inside a padded viewport.
+
+        Each run also includes the vertex just outside the viewport on
+        either side, so lines reach the edge of the screen. Runs carry
+        their start/end position along the route (0..1) for coloring.
+        """
+        indices = self.indices_for_zoom(zoom)
+        if not indices.size:
+            return []
+        pad_x = (east - west) * VIEWPORT_PAD
+        pad_y = (north - south) * VIEWPORT_PAD
+        pts = self.lnglat[indices]
+        inside = (
+            (pts[:, 0] >= west - pad_x) & (pts[:, 0] <= east + pad_x)
+            & (pts[:, 1] >= south - pad_y) & (pts[:, 1] <= north + pad_y)
+        )
+        keep = inside.copy()
+        keep[1:] |= inside[:-1]
+        keep[:-1] |= inside[1:]
+
+        kept = np.flatnonzero(keep)
+        if not kept.size:
+            return []
+        breaks = np.flatnonzero(np.diff(kept) > 1) + 1
+        last = max(1, len(self.lnglat) - 1)
+        return [
+            {
+                "polyline": self.encode(indices[run]),
+                "start": float(indices[run[0]] / last),
+                "end": float(indices[run[-1]] / last),
+            }
+            for run in np.split(kept, breaks)
+            if run.size > 1
+        ]
+
+
+def compact_route_data(route_data: dict | None) -> dict | None:
+    """Replace raw coordinate arrays in route_data with overview payloads.
+
+    Keeps distance/duration and any other fields, so the result can be
+    passed to initMap() or returned from calculate_route() directly.
+    """
+    if not route_data:
+        return route_data
+
+    def compact(route: dict) -> dict:
+        coords = route.get("coordinates")
+        if coords is None:
+            return route
+        out = {k: v for k, v in route.items() if k not in ("coordinates", "legs")}
+        out["geometry"] = RouteGeometry(coords).overview()
+        return out
+
+    result = dict(route_data)
+    if route_data.get("selected"):
+        result["selected"] = compact(route_data["selected"])
+    result["alternatives"] = [compact(r) for r in route_data.get("alternatives") or []]
+    return result
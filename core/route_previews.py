@@ -0,0 +1,319 @@
+"""
+core/route_previews.py — Static mini-map previews of trip routes for home cards.
+
+A preview is the trip's selected route drawn over the map tiles already
+in the local tile cache, rendered with Pillow in a process pool:
+
+- the route comes from its route blob (data/route_store.py), simplified
+  to the preview's zoom, so only a few hundred points cross to a worker;
+- tiles are read from the MBTiles cache only — previews never go to the
+  network, and tiles that are not cached are left as the theme's
+  background (such partial previews are re-rendered after a while, once
+  opening the trip has had a chance to cache them);
+- files are cached on disk under a hash of the route blob's digest, the
+  theme and the size, so editing a route (a new digest) or switching
+  theme picks a new file by itself. Old files fall out of the
+  size-bounded LRU cache.
+
+Calls block while a preview renders; the home grid makes them from its
+own worker thread (ui/trip_grid.py CardPreviews).
+
+Usage:
+    previews = get_route_previews()
+    path = previews.preview(trip_id, theme)      # PNG path, or None without a route
+    previews.route_digest(trip_id)               # changes when the route is edited
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from config.settings import APP_SUPPORT_DIR
+from config.themes import Theme
+from core.route_geometry import to_mercator
+from data.route_store import RouteStore
+from data.tile_store import TileStore
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_DIR = os.path.join(APP_SUPPORT_DIR, "previews")
+PREVIEW_CSS_SIZE = (280, 72)       # Card preview box in ui/trip_grid.py
+PREVIEW_SCALE = 2                  # Device pixel ratio rendered for
+PREVIEW_CACHE_MAX_BYTES = 32 * 1024 * 1024
+PREVIEW_VERSION = 1                # Bump to re-render every cached preview
+TILE_SIZE = 256
+MAX_ZOOM = 15
+VIEW_PADDING = 0.12                # Fraction of the box kept clear around the route
+PARTIAL_RETRY = 24 * 60 * 60       # Seconds before a preview missing tiles is redone
+LINE_WIDTH = 3 * PREVIEW_SCALE
+RENDER_WORKERS = 2
+
+# Share of the theme background blended over tiles, so previews sit in the card
+TILE_TINT = {"light": 0.15, "dark": 0.45, "psychedelic": 0.55}
+
+
+def preview_key(route_digest: str, theme_name: str, size: tuple[int, int]) -> str:
+    raw = f"{PREVIEW_VERSION}:{route_digest}:{theme_name}:{size[0]}x{size[1]}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def world_pixels(lnglat: np.ndarray, zoom: int) -> np.ndarray:
+    """Project [lng, lat] rows to Web Mercator pixel coordinates at a zoom."""
+    world = TILE_SIZE * 2 ** zoom
+    merc = to_mercator(lnglat)
+    return np.column_stack(((merc[:, 0] + 180.0) / 360.0 * world, (180.0 - merc[:, 1]) / 360.0 * world))
+
+
+def fit_view(bbox: list[float], size: tuple[int, int], padding: float = VIEW_PADDING) -> tuple[int, float, float]:
+    """Deepest zoom at which bbox fits the box; returns (zoom, left, top) in pixels."""
+    corners = np.array([[bbox[0], bbox[1]], [bbox[2], bbox[3]]])
+    usable = np.array(size) * (1.0 - 2 * padding)
+    for zoom in range(MAX_ZOOM, -1, -1):
+        px = world_pixels(corners, zoom)
+        span = np.abs(px[1] - px[0])
+        if zoom == 0 or (span <= usable).all():
+            center = px.mean(axis=0)
+            return zoom, float(center[0] - size[0] / 2), float(center[1] - size[1] / 2)
+    raise AssertionError("unreachable")
+
+
+def _render_preview(
+    size: tuple[int, int],
+    tiles: list[tuple[int, int, bytes]],
+    points: np.ndarray,
+    background: str,
+    route_color: str,
+    tint: float,
+) -> bytes:
+    """Compose tiles and the route line into a PNG (runs in a worker process)."""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", size, background)
+    for left, top, data in tiles:
+        try:
+            with Image.open(io.BytesIO(data)) as tile:
+                img.paste(tile.convert("RGB"), (left, top))
+        except OSError:
+            continue  # Corrupt cache entry; leave the background showing
+    if tiles and tint > 0:
+        img = Image.blend(img, Image.new("RGB", size, background), tint)
+
+    draw = ImageDraw.Draw(img)
+    line = [tuple(p) for p in points.tolist()]
+    if len(line) >= 2:
+        draw.line(line, fill=route_color, width=LINE_WIDTH, joint="curve")
+    radius = LINE_WIDTH
+    for x, y in (line[:1] + line[-1:]):
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=route_color, outline=background)
+
+    out = io.BytesIO()
+    img.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return 0
+
+
+class RoutePreviewService:
+    """Cached, process-pool-rendered route previews keyed by route and theme."""
+
+    def __init__(
+        self,
+        directory: str = PREVIEW_DIR,
+        routes: RouteStore | None = None,
+        tiles: TileStore | None = None,
+        max_bytes: int = PREVIEW_CACHE_MAX_BYTES,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = (PREVIEW_CSS_SIZE[0] * PREVIEW_SCALE, PREVIEW_CSS_SIZE[1] * PREVIEW_SCALE)
+        self._routes = routes
+        self._tiles = tiles
+        self._renderer: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        self._total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".png")
+        )
+
+    # --- Public API ---
+
+    def preview(self, trip_id: int, theme: Theme) -> str | None:
+        """Path of the trip's preview PNG, rendering it if needed (blocking).
+
+        None when the trip has no saved route.
+        """
+        digest = self.route_digest(trip_id)
+        if digest is None:
+            return None
+        key = preview_key(digest, theme.name, self.size)
+        path = self._cached(key)
+        if path is not None:
+            return path
+
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+        if not owner:
+            return future.result()
+
+        path = None
+        try:
+            path = self._build(key, trip_id, theme)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_result(path)
+        return path
+
+    def route_digest(self, trip_id: int) -> str | None:
+        """Digest of the trip's route blob; previews are keyed on it."""
+        return self._route_store().digest(trip_id)
+
+    def usage(self) -> int:
+        return self._total_bytes
+
+    def close(self) -> None:
+        if self._renderer is not None:
+            self._renderer.shutdown(wait=False, cancel_futures=True)
+
+    # --- Internals ---
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + ".png", base + ".partial.png"
+
+    def _cached(self, key: str) -> str | None:
+        """A complete preview, or a partial one still inside its retry window."""
+        now = time.time()
+        for path in self._paths(key):
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            if path.endswith(".partial.png") and now - mtime > PARTIAL_RETRY:
+                continue
+            os.utime(path, (now, mtime))  # atime marks it recently used
+            return path
+        return None
+
+    def _build(self, key: str, trip_id: int, theme: Theme) -> str | None:
+        geometry = self._route_store().geometry(trip_id, 0)
+        if geometry is None or not len(geometry.lnglat):
+            return None
+        zoom, left, top = fit_view(geometry.bbox, self.size)
+        points = world_pixels(geometry.lnglat[geometry.indices_for_zoom(zoom)], zoom) - (left, top)
+        tiles, missing = self._collect_tiles(zoom, left, top)
+
+        png = self._render_pool().submit(
+            _render_preview,
+            self.size,
+            tiles,
+            points.astype(np.float32),
+            theme.bg_tertiary,
+            theme.action_primary,
+            TILE_TINT.get(theme.name, 0.4),
+        ).result()
+
+        complete, partial = self._paths(key)
+        path = partial if missing else complete
+        # Bytes of the file being overwritten and of a partial a complete render supersedes
+        replaced = _file_size(path) + (0 if missing else _file_size(partial))
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(png)
+        os.replace(tmp, path)
+        if not missing:
+            try:
+                os.remove(partial)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self._total_bytes += len(png) - replaced
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+        logger.debug("Rendered preview for trip %s at z%d (%d tiles missing)", trip_id, zoom, missing)
+        return path
+
+    def _collect_tiles(self, zoom: int, left: float, top: float) -> tuple[list[tuple[int, int, bytes]], int]:
+        """Cached tiles covering the box, with their paste offsets, and a missing count."""
+        store = self._tile_store()
+        count = 2 ** zoom
+        tiles = []
+        missing = 0
+        for ty in range(int(top // TILE_SIZE), int((top + self.size[1] - 1) // TILE_SIZE) + 1):
+            if not 0 <= ty < count:
+                continue
+            for tx in range(int(left // TILE_SIZE), int((left + self.size[0] - 1) // TILE_SIZE) + 1):
+                tile = store.get(zoom, tx % count, ty)
+                if tile is None:
+                    missing += 1
+                    continue
+                tiles.append((round(tx * TILE_SIZE - left), round(ty * TILE_SIZE - top), tile.data))
+        return tiles, missing
+
+    def _evict(self) -> None:
+        """Delete least recently used previews until under budget (lock held)."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".png")),
+            key=lambda entry: entry.stat().st_atime,
+        )
+        evicted = 0
+        for entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            evicted += 1
+        logger.info("Evicted %d route previews", evicted)
+
+    def _route_store(self) -> RouteStore:
+        with self._lock:
+            if self._routes is None:
+                self._routes = RouteStore()
+            return self._routes
+
+    def _tile_store(self) -> TileStore:
+        with self._lock:
+            if self._tiles is None:
+                from core.tile_server import get_tile_server
+                server = get_tile_server()
+                self._tiles = server.store if server is not None else TileStore()
+            return self._tiles
+
+    def _render_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._renderer is None:
+                self._renderer = ProcessPoolExecutor(RENDER_WORKERS)
+            return self._renderer
+
+
+_service: RoutePreviewService | None = None
+
+
+def get_route_previews() -> RoutePreviewService:
+    """The shared preview service (created on first use)."""
+    global _service
+    if _service is None:
+        _service = RoutePreviewService()
+    return _service
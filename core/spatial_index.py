@@ -0,0 +1,350 @@
+"""
+core/spatial_index.py — Grid spatial index over stops and discovery points.
+
+Points live in growable NumPy columns (lat, lng, alive) with a uniform
+lat/lng grid mapping each cell to the slots inside it. Inserts, moves
+and deletes touch one or two cells, so the index follows stop edits
+incrementally; bulk loads go through insert_many().
+
+Queries:
+- bbox(west, south, east, north): points in a viewport;
+- nearest(lat, lng, k): k nearest by great-circle distance, searched in
+  growing rings of cells;
+- corridor(coordinates, buffer_m): points within a buffer of a route,
+  ordered by how far along the route they sit.
+
+Candidate cells are gathered per query and distances are computed for
+all candidates at once, so queries over 100k points take milliseconds.
+
+Usage:
+    index = SpatialIndex()
+    index.insert("stop:41", lat, lng, {"kind": "stop"})
+    index.bbox(w, s, e, n)              # → ["stop:41", ...]
+    index.nearest(lat, lng, k=5)        # → [("stop:41", meters), ...]
+    index.corridor(route["coordinates"], buffer_m=2000)
+
+Benchmark over synthetic POIs:
+    python -m core.spatial_index
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Hashable, Sequence
+
+import numpy as np
+
+from core.route_geometry import RouteGeometry
+
+CELL_DEG = 0.05                  # ~5.5 km of latitude per grid cell
+METERS_PER_DEG = 111_195.0       # Mean meters per degree of latitude
+EARTH_RADIUS_M = 6_371_008.8
+CORRIDOR_CHUNK = 32              # Route segments tested per candidate batch
+MAX_RING_CELLS = 4096            # Wider bbox/ring searches scan all points
+INITIAL_CAPACITY = 1024
+
+
+def _haversine(lat: float, lng: float, lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    phi1, phi2 = math.radians(lat), np.radians(lats)
+    a = (
+        np.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lngs - lng) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _route_fractions(lnglat: np.ndarray) -> np.ndarray:
+    """Distance from the start to each [lng, lat] vertex, as a fraction of the route."""
+    lat, lng = np.radians(lnglat[:, 1]), np.radians(lnglat[:, 0])
+    a = (
+        np.sin(np.diff(lat) / 2) ** 2
+        + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) / 2) ** 2
+    )
+    along = np.concatenate(([0.0], np.cumsum(2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0))))))
+    if along[-1] <= 0:
+        return np.linspace(0.0, 1.0, len(along))
+    return along / along[-1]
+
+
+class SpatialIndex:
+    """Incremental point index answering bbox, kNN and corridor queries."""
+
+    def __init__(self, cell_deg: float = CELL_DEG) -> None:
+        self.cell_deg = cell_deg
+        self._lat = np.zeros(INITIAL_CAPACITY)
+        self._lng = np.zeros(INITIAL_CAPACITY)
+        self._alive = np.zeros(INITIAL_CAPACITY, dtype=bool)
+        self._ids: list[Hashable | None] = [None] * INITIAL_CAPACITY
+        self._data: list[Any] = [None] * INITIAL_CAPACITY
+        self._slot: dict[Hashable, int] = {}
+        self._free: list[int] = []
+        self._used = 0                               # Slots ever handed out
+        self._cells: dict[tuple[int, int], set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._slot)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._slot
+
+    # --- Updates ---
+
+    def insert(self, item_id: Hashable, lat: float, lng: float, data: Any = None) -> None:
+        """Add a point, or move and relabel it if the id already exists."""
+        slot = self._slot.get(item_id)
+        if slot is not None:
+            self.move(item_id, lat, lng)
+            self._data[slot] = data
+            return
+        slot = self._take_slot()
+        self._lat[slot], self._lng[slot] = lat, lng
+        self._alive[slot] = True
+        self._ids[slot], self._data[slot] = item_id, data
+        self._slot[item_id] = slot
+        self._cells.setdefault(self._cell(lat, lng), set()).add(slot)
+
+    def insert_many(
+        self,
+        ids: Sequence[Hashable],
+        lats: Sequence[float],
+        lngs: Sequence[float],
+        data: Sequence[Any] | None = None,
+    ) -> None:
+        """Bulk insert of new ids (existing ids are moved one by one)."""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        fresh = [i for i, item_id in enumerate(ids) if item_id not in self._slot]
+        for i in set(range(len(ids))) - set(fresh):
+            self.insert(ids[i], lats[i], lngs[i], data[i] if data is not None else None)
+        if not fresh:
+            return
+        start = self._used
+        self._grow(start + len(fresh))
+        slots = np.arange(start, start + len(fresh))
+        self._used += len(fresh)
+        self._lat[slots], self._lng[slots] = lats[fresh], lngs[fresh]
+        self._alive[slots] = True
+        cx = np.floor(lats[fresh] / self.cell_deg).astype(np.int64)
+        cy = np.floor(lngs[fresh] / self.cell_deg).astype(np.int64)
+        for slot, i, x, y in zip(slots.tolist(), fresh, cx.tolist(), cy.tolist()):
+            self._ids[slot] = ids[i]
+            self._data[slot] = data[i] if data is not None else None
+            self._slot[ids[i]] = slot
+            self._cells.setdefault((x, y), set()).add(slot)
+
+    def move(self, item_id: Hashable, lat: float, lng: float) -> None:
+        slot = self._slot[item_id]
+        old, new = self._cell(self._lat[slot], self._lng[slot]), self._cell(lat, lng)
+        if old != new:
+            self._discard_from_cell(old, slot)
+            self._cells.setdefault(new, set()).add(slot)
+        self._lat[slot], self._lng[slot] = lat, lng
+
+    def remove(self, item_id: Hashable) -> bool:
+        slot = self._slot.pop(item_id, None)
+        if slot is None:
+            return False
+        self._discard_from_cell(self._cell(self._lat[slot], self._lng[slot]), slot)
+        self._alive[slot] = False
+        self._ids[slot] = self._data[slot] = None
+        self._free.append(slot)
+        return True
+
+    def get(self, item_id: Hashable) -> tuple[float, float, Any] | None:
+        slot = self._slot.get(item_id)
+        if slot is None:
+            return None
+        return float(self._lat[slot]), float(self._lng[slot]), self._data[slot]
+
+    # --- Queries ---
+
+    def bbox(self, west: float, south: float, east: float, north: float) -> list[Hashable]:
+        """Ids of points inside a lat/lng box."""
+        slots = self._slots_in_box(west, south, east, north)
+        lat, lng = self._lat[slots], self._lng[slots]
+        inside = (lat >= south) & (lat <= north) & (lng >= west) & (lng <= east)
+        return [self._ids[s] for s in slots[inside].tolist()]
+
+    def nearest(self, lat: float, lng: float, k: int = 5, max_m: float | None = None) -> list[tuple[Hashable, float]]:
+        """Up to k (id, meters) pairs, closest first."""
+        if not self._slot or k <= 0:
+            return []
+        cx, cy = self._cell(lat, lng)
+        found: list[int] = []
+        ring = 0
+        while True:
+            found.extend(self._ring_slots(cx, cy, ring))
+            # Anything outside this ring is at least this far away
+            reach_deg = ring * self.cell_deg
+            cos_lat = math.cos(math.radians(min(89.9, abs(lat) + reach_deg + self.cell_deg)))
+            covered_m = reach_deg * METERS_PER_DEG * cos_lat
+            if len(found) >= min(k, len(self._slot)):
+                dist = _haversine(lat, lng, self._lat[found], self._lng[found])
+                kth = np.partition(dist, min(k, len(dist)) - 1)[min(k, len(dist)) - 1]
+                if kth <= covered_m or len(found) == len(self._slot):
+                    break
+            if max_m is not None and covered_m > max_m:
+                break
+            if (2 * ring + 1) ** 2 > MAX_RING_CELLS:
+                found = np.flatnonzero(self._alive).tolist()
+                break
+            ring += 1
+
+        slots = np.asarray(found, dtype=np.int64)
+        dist = _haversine(lat, lng, self._lat[slots], self._lng[slots])
+        order = np.argsort(dist)[:k]
+        return [
+            (self._ids[slots[i]], float(dist[i]))
+            for i in order.tolist()
+            if max_m is None or dist[i] <= max_m
+        ]
+
+    def corridor(self, coordinates: Sequence[Sequence[float]], buffer_m: float) -> list[tuple[Hashable, float, float]]:
+        """Points within buffer_m of a [lng, lat] route.
+
+        Returns (id, meters from route, fraction along route) sorted by
+        position along the route; the fraction is of the route's length,
+        so 0.5 is halfway by distance however the vertices are spread.
+        """
+        geometry = RouteGeometry(coordinates)
+        if len(geometry.lnglat) < 2 or not self._slot:
+            return []
+        # Simplify well below the buffer; extra vertices cannot change the answer much
+        zoom = math.log2(360.0 / (256.0 * max(buffer_m / 4 / METERS_PER_DEG, 1e-7)))
+        kept = geometry.indices_for_zoom(max(0.0, zoom))
+        line = geometry.lnglat[kept]
+        position = _route_fractions(geometry.lnglat)[kept]
+        pad_lat = buffer_m / METERS_PER_DEG
+
+        best_dist: dict[int, float] = {}
+        best_pos: dict[int, float] = {}
+        for start in range(0, len(line) - 1, CORRIDOR_CHUNK):
+            chunk = line[start:start + CORRIDOR_CHUNK + 1]
+            chunk_pos = position[start:start + CORRIDOR_CHUNK + 1]
+            south, north = chunk[:, 1].min() - pad_lat, chunk[:, 1].max() + pad_lat
+            cos_lat = math.cos(math.radians(min(89.9, max(abs(south), abs(north)))))
+            pad_lng = pad_lat / max(cos_lat, 1e-6)
+            slots = self._slots_in_box(chunk[:, 0].min() - pad_lng, south, chunk[:, 0].max() + pad_lng, north)
+            if not slots.size:
+                continue
+            dist, frac = self._distance_to_segments(slots, chunk)
+            seg = np.argmin(dist, axis=1)
+            rows = np.arange(len(slots))
+            d = dist[rows, seg]
+            pos = chunk_pos[seg] + (chunk_pos[seg + 1] - chunk_pos[seg]) * frac[rows, seg]
+            for slot, dd, pp in zip(slots.tolist(), d.tolist(), pos.tolist()):
+                if dd <= buffer_m and dd < best_dist.get(slot, math.inf):
+                    best_dist[slot], best_pos[slot] = dd, pp
+
+        hits = sorted(best_pos, key=best_pos.get)
+        return [(self._ids[s], best_dist[s], best_pos[s]) for s in hits]
+
+    # --- Internals ---
+
+    def _cell(self, lat: float, lng: float) -> tuple[int, int]:
+        return math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg)
+
+    def _take_slot(self) -> int:
+        if self._free:
+            return self._free.pop()
+        self._grow(self._used + 1)
+        self._used += 1
+        return self._used - 1
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._lat)
+        if needed <= capacity:
+            return
+        new = max(needed, capacity * 2)
+        self._lat = np.resize(self._lat, new)
+        self._lng = np.resize(self._lng, new)
+        alive = np.zeros(new, dtype=bool)
+        alive[:capacity] = self._alive
+        self._alive = alive
+        self._ids.extend([None] * (new - capacity))
+        self._data.extend([None] * (new - capacity))
+
+    def _discard_from_cell(self, cell: tuple[int, int], slot: int) -> None:
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(slot)
+            if not members:
+                del self._cells[cell]
+
+    def _slots_in_box(self, west: float, south: float, east: float, north: float) -> np.ndarray:
+        x0, y0 = self._cell(south, west)
+        x1, y1 = self._cell(north, east)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > max(MAX_RING_CELLS, len(self._cells)):
+            return np.flatnonzero(self._alive)
+        slots: list[int] = []
+        cells = self._cells
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                members = cells.get((x, y))
+                if members:
+                    slots.extend(members)
+        return np.asarray(slots, dtype=np.int64)
+
+    def _ring_slots(self, cx: int, cy: int, ring: int) -> list[int]:
+        cells = self._cells
+        if ring == 0:
+            return list(cells.get((cx, cy), ()))
+        slots: list[int] = []
+        for x in range(cx - ring, cx + ring + 1):
+            for y in (cy - ring, cy + ring):
+                slots.extend(cells.get((x, y), ()))
+        for y in range(cy - ring + 1, cy + ring):
+            for x in (cx - ring, cx + ring):
+                slots.extend(cells.get((x, y), ()))
+        return slots
+
+    def _distance_to_segments(self, slots: np.ndarray, line: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Meters and segment fraction from each point to each [lng, lat] segment.
+
+        Uses a local equirectangular projection, accurate at corridor scale.
+        """
+        cos_lat = math.cos(math.radians(float(line[:, 1].mean())))
+        px = self._lng[slots] * cos_lat * METERS_PER_DEG
+        py = self._lat[slots] * METERS_PER_DEG
+        ax, ay = line[:-1, 0] * cos_lat * METERS_PER_DEG, line[:-1, 1] * METERS_PER_DEG
+        bx, by = line[1:, 0] * cos_lat * METERS_PER_DEG, line[1:, 1] * METERS_PER_DEG
+        dx, dy = bx - ax, by - ay
+        len2 = dx * dx + dy * dy
+        t = ((px[:, None] - ax) * dx + (py[:, None] - ay) * dy)
+        t = np.clip(np.divide(t, len2, out=np.zeros_like(t), where=len2 > 0), 0.0, 1.0)
+        return np.hypot(px[:, None] - (ax + t * dx), py[:, None] - (ay + t * dy)), t
+
+
+def benchmark(points: int = 100_000, seed: int = 3) -> dict:
+    """Build an index over synthetic POIs and time each query type (ms)."""
+    rng = np.random.default_rng(seed)
+    lats = rng.uniform(32.0, 42.0, points)
+    lngs = rng.uniform(-124.0, -114.0, points)
+    index = SpatialIndex()
+    started = time.perf_counter()
+    index.insert_many(list(range(points)), lats, lngs)
+    timings = {"points": points, "build_ms": (time.perf_counter() - started) * 1000}
+
+    route = np.column_stack((np.linspace(-122.4, -118.2, 400), np.linspace(37.7, 34.0, 400)))
+    route[:, 1] += 0.2 * np.sin(np.linspace(0, 12, 400))
+    queries = {
+        "bbox_ms": lambda: index.bbox(-120.5, 35.0, -119.5, 36.0),
+        "nearest_ms": lambda: index.nearest(36.5, -120.0, k=10),
+        "corridor_ms": lambda: index.corridor(route, buffer_m=2000),
+        "insert_remove_ms": lambda: (index.insert("x", 36.0, -120.0), index.remove("x")),
+    }
+    for name, query in queries.items():
+        runs = 20
+        started = time.perf_counter()
+        for _ in range(runs):
+            result = query()
+        timings[name] = (time.perf_counter() - started) * 1000 / runs
+        if isinstance(result, list):
+            timings[name.replace("_ms", "_hits")] = len(result)
+    return timings
+
+
+if __name__ == "__main__":
+    for name, value in benchmark().items():
+        print(f"{name:>18}: {value:.2f}" if isinstance(value, float) else f"{name:>18}: {value}")
@@ -0,0 +1,178 @@
+"""
+core/stop_batch.py — Apply batched stop mutations from the map in one transaction.
+
+The map page queues stop edits, applies them on screen at once, and
+sends them in a single `apply_stop_batch` bridge call per frame. A batch
+is a list of operations:
+
+    {"op": "add", "id": -3, "name": "...", "latitude": .., "longitude": ..}
+    {"op": "update", "id": 41, "latitude": .., "longitude": ..}      # any of name/latitude/longitude
+    {"op": "remove", "id": 41}
+    {"op": "set_endpoints", "start": {name, lat, lng}, "end": {name, lat, lng}}
+    {"op": "reorder", "ids": [41, -3, 17, ...]}                      # full itinerary order
+
+Negative ids are temporary ids for stops created on the page; the result
+maps them to database ids. Adds without a name are saved under their
+coordinates and named later (see core/reverse_geocode.py), so a batch
+never waits on the network. Operations are coalesced before writing, so
+a burst of drags on one stop is a single UPDATE and a stop added and
+removed within one batch never touches the database.
+
+The database layer is passed in as a StopStore, so batches can be
+exercised against an in-memory fake.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Callable, ContextManager, Protocol
+
+from core.reverse_geocode import placeholder_name
+
+logger = logging.getLogger(__name__)
+
+STOP_FIELDS = ("name", "latitude", "longitude")
+
+
+class StopStore(Protocol):
+    """Database operations a batch needs; all run inside transaction()."""
+
+    def transaction(self) -> ContextManager: ...
+
+    def add_stop(self, trip_id: int, name: str, latitude: float, longitude: float) -> int: ...
+
+    def update_stop(self, stop_id: int, **fields) -> None: ...
+
+    def delete_stop(self, stop_id: int) -> None: ...
+
+    def set_endpoints(
+        self,
+        trip_id: int,
+        start_name: str, start_lat: float, start_lng: float,
+        end_name: str, end_lat: float, end_lng: float,
+    ) -> None: ...
+
+    def reorder_stops(self, trip_id: int, stop_ids: list[int]) -> None: ...
+
+
+def _fields(op: dict) -> dict:
+    return {k: op[k] for k in STOP_FIELDS if op.get(k) is not None}
+
+
+def coalesce(ops: list[dict]) -> tuple[list[dict], list[dict]]:
+    """Collapse a batch to at most one write per stop (and per trip endpoints).
+
+    Returns (ops, errors). Adds keep their relative order; malformed
+    operations are reported instead of applied.
+    """
+    merged: dict[object, dict] = {}
+    order: list[object] = []
+    errors: list[dict] = []
+
+    for index, op in enumerate(ops):
+        kind = op.get("op")
+        if kind == "set_endpoints":
+            key: object = "endpoints"
+            if not (isinstance(op.get("start"), dict) and isinstance(op.get("end"), dict)):
+                errors.append({"index": index, "error": "set_endpoints needs start and end"})
+                continue
+            new = {"op": kind, "start": op["start"], "end": op["end"]}
+        elif kind == "reorder":
+            key = "order"
+            if not (isinstance(op.get("ids"), list) and all(isinstance(i, int) for i in op["ids"])):
+                errors.append({"index": index, "error": "reorder needs a list of ids"})
+                continue
+            new = {"op": kind, "ids": op["ids"]}
+        elif kind in ("add", "update", "remove") and isinstance(op.get("id"), int):
+            key = ("stop", op["id"])
+            new = {"op": kind, "id": op["id"], **_fields(op)}
+            if kind == "add" and not {"latitude", "longitude"} <= new.keys():
+                errors.append({"index": index, "error": "add needs latitude and longitude"})
+                continue
+        else:
+            errors.append({"index": index, "error": f"invalid operation {kind!r}"})
+            continue
+
+        prev = merged.get(key)
+        if prev is None:
+            merged[key] = new
+            order.append(key)
+        elif kind == "update" and prev["op"] in ("add", "update"):
+            prev.update(_fields(new))
+        elif kind == "remove" and prev["op"] == "add":
+            merged[key] = None  # Never reached the database
+        else:
+            merged[key] = new
+
+    result = [merged[key] for key in order if merged[key] is not None]
+    # Reordering refers to every stop, so it runs after adds and removals
+    result.sort(key=lambda op: op["op"] == "reorder")
+    return result, errors
+
+
+def apply_stop_batch(
+    store: StopStore,
+    trip_id: int,
+    ops: list[dict],
+    defer_name: Callable[[int, float, float], None] | None = None,
+) -> dict:
+    """Apply one batch in a single transaction.
+
+    Returns {"ids": {temp_id: id}, "names": {id: name}, "applied": n,
+    "errors": [...]}. `names` holds the placeholder names given to adds
+    that arrived without one; after the commit each of those stops is
+    handed to `defer_name(stop_id, lat, lng)` to be named in the
+    background. A database error rolls back the whole batch and
+    propagates, so the page can retry it.
+    """
+    coalesced, errors = coalesce(ops)
+    ids: dict[int, int] = {}
+    names: dict[int, str] = {}
+
+    for op in coalesced:
+        if op["op"] == "add" and not op.get("name"):
+            op["name"] = placeholder_name(op["latitude"], op["longitude"])
+            op["named"] = True
+
+    with store.transaction():
+        for op in coalesced:
+            kind = op["op"]
+            if kind == "add":
+                new_id = store.add_stop(trip_id, op["name"], op["latitude"], op["longitude"])
+                if op["id"] < 0:
+                    ids[op["id"]] = new_id
+                if op.get("named"):
+                    names[new_id] = op["name"]
+            elif kind == "update":
+                fields = _fields(op)
+                if fields and op["id"] >= 0:
+                    store.update_stop(op["id"], **fields)
+            elif kind == "remove":
+                if op["id"] >= 0:
+                    store.delete_stop(op["id"])
+            elif kind == "reorder":
+                stop_ids = [ids.get(i, i) for i in op["ids"]]
+                store.reorder_stops(trip_id, [i for i in stop_ids if i >= 0])
+            else:
+                start, end = op["start"], op["end"]
+                store.set_endpoints(
+                    trip_id,
+                    start.get("name"), start.get("lat"), start.get("lng"),
+                    end.get("name"), end.get("lat"), end.get("lng"),
+                )
+
+    if defer_name is not None:
+        for op in coalesced:
+            if op.get("named"):
+                stop_id = ids.get(op["id"], op["id"])
+                defer_name(stop_id, op["latitude"], op["longitude"])
+
+    logger.debug("Applied %d of %d stop operations", len(coalesced), len(ops))
+    return {"ids": ids, "names": names, "applied": len(coalesced), "errors": errors}
+
+
+def rename_stops(store: StopStore, names: dict[int, str]) -> None:
+    """Write a batch of resolved stop names in one transaction."""
+    with store.transaction():
+        for stop_id, name in names.items():
+            store.update_stop(stop_id, name=name)
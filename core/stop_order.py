@@ -0,0 +1,262 @@
+"""
+core/stop_order.py — Reorder trip stops to avoid backtracking.
+
+Stops are visited between a fixed start and end (or an open end). The
+solver works on a distance matrix:
+
+- haversine_matrix() gives a vectorized straight-line first pass;
+- a road matrix from the routing backend can be used instead, cached
+  in a PersistentCache under a canonical key of the stop set.
+
+Orders are built by nearest neighbour and then improved with 2-opt and
+Or-opt moves. Every candidate move of a kind is scored at once as a
+NumPy matrix, so each improvement step is a handful of array operations
+and 200+ stops finish well inside the time budget.
+
+Usage:
+    optimizer = StopOrderOptimizer(road_matrix=osrm_table)
+    result = optimizer.optimize(start, end, [(lat, lng), ...])
+    result["order"]   # indices into the stop list, in visiting order
+
+Benchmark over synthetic stop sets:
+    python -m core.stop_order
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable, Sequence
+
+import numpy as np
+
+from core.route_cache import DEFAULT_PROFILE, LatLng, quantize, route_key
+from data.cache_store import WEEK, PersistentCache
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6_371_008.8
+TIME_BUDGET = 0.5                 # Seconds spent improving the first order
+OR_OPT_SEGMENTS = (1, 2, 3)       # Segment lengths moved by Or-opt
+MATRIX_CACHE_TTL = WEEK
+
+# road_matrix(points as (lat, lng), profile) -> n×n distances in meters
+RoadMatrix = Callable[[list[LatLng], str], "Sequence[Sequence[float]] | None"]
+
+
+def haversine_matrix(latlng: np.ndarray) -> np.ndarray:
+    """Great-circle distances (meters) between every pair of [lat, lng] rows."""
+    rad = np.radians(np.asarray(latlng, dtype=np.float64).reshape(-1, 2))
+    lat, lng = rad[:, 0], rad[:, 1]
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def path_length(dist: np.ndarray, path: np.ndarray) -> float:
+    return float(dist[path[:-1], path[1:]].sum())
+
+
+def nearest_neighbour(dist: np.ndarray) -> np.ndarray:
+    """Greedy path from node 0 through every node, ending at the last node."""
+    n = len(dist)
+    path = np.empty(n, dtype=np.int64)
+    path[0], path[-1] = 0, n - 1
+    unvisited = np.ones(n, dtype=bool)
+    unvisited[[0, n - 1]] = False
+    current = 0
+    for k in range(1, n - 1):
+        row = np.where(unvisited, dist[current], np.inf)
+        current = int(np.argmin(row))
+        path[k] = current
+        unvisited[current] = False
+    return path
+
+
+def _best_two_opt(dist: np.ndarray, path: np.ndarray) -> tuple[float, int, int]:
+    """Best reversal of path[i..j] with both path ends fixed."""
+    m = len(path)
+    i = np.arange(1, m - 2)
+    j = np.arange(2, m - 1)
+    a, b = path[i - 1], path[i]
+    c, e = path[j], path[j + 1]
+    gain = (
+        dist[np.ix_(a, c)] + dist[np.ix_(b, e)]
+        - dist[a, b][:, None] - dist[c, e][None, :]
+    )
+    gain[np.tril_indices_from(gain, -1)] = np.inf  # Only j > i is a move
+    flat = int(np.argmin(gain))
+    row, col = divmod(flat, gain.shape[1])
+    return float(gain[row, col]), int(i[row]), int(j[col])
+
+
+def _best_or_opt(dist: np.ndarray, path: np.ndarray, k: int) -> tuple[float, int, int]:
+    """Best move of a k-node segment path[i..i+k-1] to sit after path[j]."""
+    m = len(path)
+    if m - 2 < k + 1:
+        return 0.0, 0, 0
+    i = np.arange(1, m - k)                       # Segment start positions
+    prev, first = path[i - 1], path[i]
+    last, nxt = path[i + k - 1], path[i + k]
+    removal = dist[prev, first] + dist[last, nxt] - dist[prev, nxt]
+
+    j = np.arange(0, m - 1)                       # Insert between path[j], path[j+1]
+    left, right = path[j], path[j + 1]
+    insertion = (
+        dist[left[None, :], first[:, None]] + dist[last[:, None], right[None, :]]
+        - dist[left, right][None, :]
+    )
+    gain = insertion - removal[:, None]
+    # The segment cannot be reinserted inside or right next to itself
+    invalid = (j[None, :] >= i[:, None] - 1) & (j[None, :] <= i[:, None] + k - 1)
+    gain[invalid] = np.inf
+    flat = int(np.argmin(gain))
+    row, col = divmod(flat, gain.shape[1])
+    return float(gain[row, col]), int(i[row]), int(j[col])
+
+
+def improve(dist: np.ndarray, path: np.ndarray, deadline: float) -> np.ndarray:
+    """2-opt and Or-opt until no move helps or the deadline passes."""
+    path = path.copy()
+    eps = 1e-9 * max(1.0, float(dist.max(initial=0.0)))
+    while time.perf_counter() < deadline:
+        improved = False
+        if len(path) >= 4:
+            gain, i, j = _best_two_opt(dist, path)
+            if gain < -eps:
+                path[i:j + 1] = path[i:j + 1][::-1]
+                improved = True
+        for k in OR_OPT_SEGMENTS:
+            gain, i, j = _best_or_opt(dist, path, k)
+            if gain < -eps:
+                segment = path[i:i + k].copy()
+                rest = np.concatenate((path[:i], path[i + k:]))
+                at = j + 1 if j < i else j + 1 - k
+                path = np.concatenate((rest[:at], segment, rest[at:]))
+                improved = True
+        if not improved:
+            break
+    return path
+
+
+def solve_path(dist: np.ndarray, time_budget: float = TIME_BUDGET) -> np.ndarray:
+    """Visiting order over matrix nodes, from node 0 to the last node."""
+    deadline = time.perf_counter() + time_budget
+    # Moves assume symmetric costs; road matrices are averaged per pair
+    sym = (dist + dist.T) / 2.0
+    return improve(sym, nearest_neighbour(sym), deadline)
+
+
+class StopOrderOptimizer:
+    """Finds a short stop order between fixed endpoints."""
+
+    def __init__(
+        self,
+        road_matrix: RoadMatrix | None = None,
+        cache: PersistentCache | None = None,
+        profile: str = DEFAULT_PROFILE,
+        time_budget: float = TIME_BUDGET,
+    ) -> None:
+        self._road_matrix = road_matrix
+        self._cache = cache if cache is not None or road_matrix is None else PersistentCache(
+            "road_matrix", max_entries=200, default_ttl=MATRIX_CACHE_TTL
+        )
+        self.profile = profile
+        self.time_budget = time_budget
+
+    def optimize(
+        self,
+        start: LatLng,
+        end: LatLng | None,
+        stops: Sequence[LatLng],
+        use_roads: bool = False,
+    ) -> dict:
+        """Return {"order", "distance", "original_distance", "metric", "elapsed_ms"}.
+
+        `order` lists indices into `stops`. With `end` None the route may
+        finish at any stop. Distances are in meters of the metric used.
+        """
+        started = time.perf_counter()
+        n = len(stops)
+        if n < 2:
+            return {
+                "order": list(range(n)), "distance": None, "original_distance": None,
+                "metric": "none", "elapsed_ms": 0.0,
+            }
+
+        points = [quantize(start), *map(quantize, stops)]
+        if end is not None:
+            points.append(quantize(end))
+        dist, metric = None, "haversine"
+        if use_roads and self._road_matrix is not None:
+            dist = self._cached_road_matrix(points)
+            metric = "road" if dist is not None else metric
+        if dist is None:
+            dist = haversine_matrix(np.array(points))
+        if end is None:
+            # A free end is a zero-cost dummy node after every stop
+            dist = np.pad(dist, ((0, 1), (0, 1)))
+
+        path = solve_path(dist, self.time_budget)
+        original = np.arange(len(dist))
+        result = {
+            "order": [int(node) - 1 for node in path[1:-1]],
+            "distance": round(path_length(dist, path), 1),
+            "original_distance": round(path_length(dist, original), 1),
+            "metric": metric,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        logger.info(
+            "Ordered %d stops (%s): %.1f km → %.1f km in %.0f ms",
+            n, metric, result["original_distance"] / 1000, result["distance"] / 1000,
+            result["elapsed_ms"],
+        )
+        return result
+
+    def _cached_road_matrix(self, points: list[LatLng]) -> np.ndarray | None:
+        key = route_key(points, f"{self.profile}:matrix")
+        cached = self._cache.get(key)
+        if cached is not None:
+            return np.asarray(cached, dtype=np.float64)
+        try:
+            matrix = self._road_matrix(points, self.profile)
+        except Exception as e:
+            logger.warning("Road matrix failed, using straight-line distances: %s", e)
+            return None
+        if matrix is None:
+            return None
+        array = np.asarray(matrix, dtype=np.float64)
+        if array.shape != (len(points), len(points)) or not np.isfinite(array).all():
+            logger.warning("Road matrix unusable (shape %s), using straight-line distances", array.shape)
+            return None
+        self._cache.put(key, array.round(1).tolist())
+        return array
+
+
+def benchmark(sizes: Sequence[int] = (10, 50, 100, 200, 400), seed: int = 7) -> list[dict]:
+    """Time the optimizer on synthetic stop sets (clustered, like real trips)."""
+    rng = np.random.default_rng(seed)
+    optimizer = StopOrderOptimizer(time_budget=TIME_BUDGET)
+    rows = []
+    for n in sizes:
+        # Stops scattered around a few towns along a ~500 km corridor
+        towns = np.column_stack((np.linspace(34.0, 38.0, 8), np.linspace(-118.0, -122.0, 8)))
+        picks = towns[rng.integers(0, len(towns), n)] + rng.normal(0, 0.15, (n, 2))
+        stops = [tuple(p) for p in picks]
+        result = optimizer.optimize(tuple(towns[0]), tuple(towns[-1]), stops)
+        rows.append({
+            "stops": n,
+            "ms": result["elapsed_ms"],
+            "click_order_km": round(result["original_distance"] / 1000, 1),
+            "optimized_km": round(result["distance"] / 1000, 1),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    for row in benchmark():
+        print(
+            f"{row['stops']:>4} stops  {row['ms']:>7.1f} ms  "
+            f"{row['click_order_km']:>8.1f} km → {row['optimized_km']:>7.1f} km"
+        )
@@ -0,0 +1,318 @@
+"""
+core/thumbnails.py — Local photo thumbnails for the detail panel.
+
+Remote photos are downloaded once (through the shared HttpClient, in the
+caller's priority lane), cropped and resized in a process pool
+to the detail panel's photo cell (at 2x for retina), and kept in a disk
+cache bounded by total size with least-recently-used eviction. Each
+thumbnail has a JSON sidecar holding its source URL and attribution, so
+credits survive even when the remote listing changes.
+
+The webview gets local URLs (served by the app's local tile server when
+mounted, file:// otherwise) and keeps the original URL as a fallback.
+Local URLs carry the tile server's port, which changes every run, so
+they are never cached: the photos section is cached with remote URLs
+only, and with_urls() adds the thumbnails when the section is pushed.
+
+Usage:
+    thumbs = ThumbnailService(url_prefix=server.mount("thumbs", THUMB_DIR))
+    details = LocationDetails({"photos": thumbs.wrap_provider(photos_provider), ...})
+    push = JsDetailPusher(window.evaluate_js, thumbnails=thumbs)
+"""
+
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+from config.settings import APP_SUPPORT_DIR
+from core.http_client import HttpClient, get_http_client
+
+logger = logging.getLogger(__name__)
+
+THUMB_DIR = os.path.join(APP_SUPPORT_DIR, "thumbnails")
+THUMB_CSS_SIZE = (400, 160)        # .photo-grid img box in map.html
+THUMB_SCALE = 2                    # Device pixel ratio rendered for
+THUMB_QUALITY = 82
+THUMB_CACHE_MAX_BYTES = 128 * 1024 * 1024
+MAX_SOURCE_BYTES = 25 * 1024 * 1024
+DOWNLOAD_WORKERS = 4
+RESIZE_WORKERS = 2
+DOWNLOAD_TIMEOUT = 15.0
+
+
+def thumb_key(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def _render_thumbnail(data: bytes, size: tuple[int, int], quality: int) -> tuple[bytes, int, int]:
+    """Center-crop and resize image bytes to a JPEG (runs in a worker process)."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft("RGB", size)  # Lets JPEG decode at reduced scale
+        img = ImageOps.exif_transpose(img).convert("RGB")
+        img = ImageOps.fit(img, size, Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue(), img.width, img.height
+
+
+class ThumbnailService:
+    """Download-once, resize-in-a-pool, LRU-on-disk photo thumbnails."""
+
+    def __init__(
+        self,
+        directory: str = THUMB_DIR,
+        max_bytes: int = THUMB_CACHE_MAX_BYTES,
+        url_prefix: str | None = None,
+        fetch: Callable[[str], bytes] | None = None,
+        http: HttpClient | None = None,
+    ) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.url_prefix = url_prefix or None
+        self.size = (THUMB_CSS_SIZE[0] * THUMB_SCALE, THUMB_CSS_SIZE[1] * THUMB_SCALE)
+        self._fetch = fetch or self._download
+        self._http = http or get_http_client()
+        self._downloads = ThreadPoolExecutor(DOWNLOAD_WORKERS, thread_name_prefix="thumb-download")
+        self._resizer: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._in_flight: dict[str, Future] = {}
+        self._prefetching: dict[str, Future] = {}   # Key → background build
+        self._total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith(".jpg")
+        )
+
+    # --- Public API ---
+
+    def thumbnails(self, photos: list[dict]) -> list[dict]:
+        """Return photos with "thumbnail_url" (and size) added where available.
+
+        All photos are processed concurrently; a photo that cannot be
+        fetched or decoded is passed through unchanged.
+        """
+        # Carry the caller's request priority into the download threads
+        futures = [
+            self._downloads.submit(contextvars.copy_context().run, self.thumbnail, photo)
+            for photo in photos
+        ]
+        return [future.result() for future in futures]
+
+    def thumbnail(self, photo: dict) -> dict:
+        url = photo.get("url")
+        if not url:
+            return photo
+        key = thumb_key(url)
+        meta = self._cached_meta(key)
+        if meta is None:
+            meta = self._build(key, url, photo)
+        if meta is None:
+            return photo
+        return {
+            **photo,
+            "attribution": photo.get("attribution") or meta.get("attribution"),
+            "thumbnail_url": self._local_url(key),
+            "width": meta["width"],
+            "height": meta["height"],
+        }
+
+    def with_urls(self, photos: list[dict]) -> list[dict]:
+        """Add "thumbnail_url" (and size) to photos whose thumbnail is on disk.
+
+        Never downloads; call at push time so URLs use this run's prefix.
+        """
+        result = []
+        for photo in photos:
+            url = photo.get("url") if isinstance(photo, dict) else None
+            meta = self._cached_meta(thumb_key(url)) if url else None
+            if meta is None:
+                result.append(photo)
+                continue
+            result.append({
+                **photo,
+                "attribution": photo.get("attribution") or meta.get("attribution"),
+                "thumbnail_url": self._local_url(thumb_key(url)),
+                "width": meta["width"],
+                "height": meta["height"],
+            })
+        return result
+
+    def prefetch(self, photos: list[dict]) -> None:
+        """Build missing thumbnails in the background, in the caller's priority lane."""
+        for photo in photos:
+            url = photo.get("url") if isinstance(photo, dict) else None
+            if not url:
+                continue
+            key = thumb_key(url)
+            with self._lock:
+                if key in self._prefetching:
+                    continue
+                future = self._downloads.submit(contextvars.copy_context().run, self.thumbnail, photo)
+                self._prefetching[key] = future
+            future.add_done_callback(lambda _f, key=key: self._prefetch_done(key))
+
+    def when_ready(self, photos: list[dict], callback: Callable[[], None]) -> bool:
+        """Call back once the background builds for these photos finish.
+
+        Returns False (and never calls back) when none are being built.
+        """
+        with self._lock:
+            futures = [
+                self._prefetching[key]
+                for key in {thumb_key(p["url"]) for p in photos if isinstance(p, dict) and p.get("url")}
+                if key in self._prefetching
+            ]
+        if not futures:
+            return False
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def one_done(_future: Future) -> None:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.warning("Thumbnail callback failed: %s", e)
+
+        for future in futures:
+            future.add_done_callback(one_done)
+        return True
+
+    def wrap_provider(self, provider: Callable) -> Callable:
+        """Wrap an async photos provider so its photos get thumbnails built.
+
+        The provider's photos (remote URLs) are returned at once, inside
+        the source timeout; downloads and resizing continue afterwards.
+        """
+        async def photos_with_thumbnails(client: Any, name: str, lat: float, lng: float) -> list:
+            photos = await provider(client, name, lat, lng)
+            if photos:
+                self.prefetch(photos)
+            return photos
+        return photos_with_thumbnails
+
+    def usage(self) -> int:
+        return self._total_bytes
+
+    def close(self) -> None:
+        self._downloads.shutdown(wait=False, cancel_futures=True)
+        if self._resizer is not None:
+            self._resizer.shutdown(wait=False, cancel_futures=True)
+
+    # --- Internals ---
+
+    def _prefetch_done(self, key: str) -> None:
+        with self._lock:
+            self._prefetching.pop(key, None)
+
+    def _paths(self, key: str) -> tuple[str, str]:
+        base = os.path.join(self.directory, key)
+        return base + ".jpg", base + ".json"
+
+    def _local_url(self, key: str) -> str:
+        if self.url_prefix:
+            return f"{self.url_prefix}{key}.jpg"
+        return Path(self._paths(key)[0]).as_uri()
+
+    def _cached_meta(self, key: str) -> dict | None:
+        """Sidecar metadata for a cached thumbnail, marking it recently used."""
+        image_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            now = time.time()
+            os.utime(image_path, (now, now))
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def _build(self, key: str, url: str, photo: dict) -> dict | None:
+        """Download and render one thumbnail, sharing work for the same URL."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+        if not owner:
+            return future.result()
+
+        meta = None
+        try:
+            data = self._fetch(url)
+            jpeg, width, height = self._resize_pool().submit(
+                _render_thumbnail, data, self.size, THUMB_QUALITY
+            ).result()
+            meta = {
+                "source_url": url,
+                "attribution": photo.get("attribution"),
+                "width": width,
+                "height": height,
+                "created_at": time.time(),
+            }
+            self._store(key, jpeg, meta)
+        except Exception as e:
+            logger.warning("Thumbnail failed for %s: %s", url, e)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_result(meta)
+        return meta
+
+    def _store(self, key: str, jpeg: bytes, meta: dict) -> None:
+        image_path, meta_path = self._paths(key)
+        tmp = image_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(jpeg)
+        os.replace(tmp, image_path)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        with self._lock:
+            self._total_bytes += len(jpeg)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Delete least recently used thumbnails until under budget (lock held)."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".jpg")),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        evicted = 0
+        for entry in entries:
+            if self._total_bytes <= self.max_bytes:
+                break
+            size = entry.stat().st_size
+            try:
+                os.remove(entry.path)
+                os.remove(entry.path[:-4] + ".json")
+            except OSError:
+                pass
+            self._total_bytes -= size
+            evicted += 1
+        logger.info("Evicted %d thumbnails", evicted)
+
+    def _resize_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._resizer is None:
+                self._resizer = ProcessPoolExecutor(RESIZE_WORKERS)
+            return self._resizer
+
+    def _download(self, url: str) -> bytes:
+        response = self._http.get_sync(url, timeout=DOWNLOAD_TIMEOUT, max_bytes=MAX_SOURCE_BYTES)
+        response.raise_for_status()
+        return response.content
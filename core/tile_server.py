@@ -0,0 +1,402 @@
+"""
+core/tile_server.py — Local caching tile proxy and route-corridor prefetch.
+
+The map loads tiles from a small HTTP server on 127.0.0.1 instead of the
+public tile servers. Tiles come from the MBTiles store when fresh, are
+revalidated upstream with If-None-Match / If-Modified-Since once stale,
+and are served stale when the upstream is unreachable, so the map keeps
+working offline for anywhere already visited or prefetched.
+
+After a route is selected, a background prefetcher walks a corridor of
+tiles along it for a range of zoom levels. Upstream requests go through
+the shared HttpClient, and prefetch uses its background lane, so tiles
+the user is looking at are fetched first. The OpenStreetMap tile usage
+policy forbids bulk downloading, so prefetch is off while the upstream
+is openstreetmap.org; it runs only against a provider (or a self-hosted
+server) that allows it.
+
+The app picks the upstream with configured_upstream(): the TILE_UPSTREAM
+environment variable (e.g. from .env), else the "tile_upstream" app
+setting, else DEFAULT_UPSTREAM. Pointing it at a provider whose terms
+allow bulk downloads enables corridor prefetch, and with it offline use
+of routes not yet viewed.
+
+The same server also serves flat directories of generated assets (e.g.
+photo thumbnails) registered with mount().
+
+The upstream is a URL template, so everything can be pointed at a local
+stand-in tile server:
+
+    server = TileServer(upstream="http://127.0.0.1:9000/{z}/{x}/{y}.png")
+    server.start()
+    server.url_template          # → "http://127.0.0.1:<port>/tiles/{z}/{x}/{y}.png"
+    server.prefetch_route(route["coordinates"])
+"""
+
+from __future__ import annotations
+
+import logging
+import mimetypes
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Sequence
+from urllib.parse import urlsplit
+
+import httpx
+import numpy as np
+
+from core.http_client import BACKGROUND, INTERACTIVE, HttpClient, get_http_client
+from core.route_geometry import RouteGeometry
+from data.cache_store import DAY
+from data.tile_store import TileStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_UPSTREAM = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+NO_PREFETCH_DOMAINS = ("openstreetmap.org",)   # Usage policy forbids bulk downloads
+UPSTREAM_ENV = "TILE_UPSTREAM"
+UPSTREAM_SETTING = "tile_upstream"
+USER_AGENT = "DayTripping/1.0 (+local tile cache)"
+TILE_MAX_AGE = 7 * DAY            # Serve without revalidating for this long
+UPSTREAM_TIMEOUT = 10.0
+MAX_ZOOM = 19
+
+PREFETCH_ZOOMS = (8, 14)          # Inclusive zoom range fetched along a route
+CORRIDOR_RADIUS = 1               # Extra tiles on each side of the route line
+PREFETCH_WORKERS = 2              # Keep upstream load polite
+PREFETCH_MAX_TILES = 5000         # Per route, across all zooms
+
+_TILE_PATH_RE = re.compile(r"^/tiles/(\d+)/(\d+)/(\d+)\.png$")
+_ASSET_PATH_RE = re.compile(r"^/(\w+)/([\w-]+\.\w+)$")
+
+
+def corridor_tiles(coordinates: Sequence[Sequence[float]], zoom: int, radius: int = CORRIDOR_RADIUS) -> list[tuple[int, int]]:
+    """(x, y) tiles within `radius` tiles of a [lng, lat] polyline, in route order."""
+    lnglat = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if not len(lnglat):
+        return []
+    n = 1 << zoom
+    lat = np.radians(np.clip(lnglat[:, 1], -85.05112878, 85.05112878))
+    tx = (lnglat[:, 0] + 180.0) / 360.0 * n
+    ty = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n
+
+    # Densify so consecutive samples are under half a tile apart
+    if len(tx) > 1:
+        steps = np.maximum(1, np.ceil(np.maximum(np.abs(np.diff(tx)), np.abs(np.diff(ty))) * 2)).astype(int)
+        seg = np.repeat(np.arange(len(steps)), steps)
+        t = (np.arange(steps.sum()) - np.repeat(np.cumsum(steps) - steps, steps)) / steps[seg]
+        tx = np.append(tx[seg] + np.diff(tx)[seg] * t, tx[-1])
+        ty = np.append(ty[seg] + np.diff(ty)[seg] * t, ty[-1])
+
+    base = np.column_stack((np.floor(tx), np.floor(ty))).astype(np.int64)
+    offsets = np.arange(-radius, radius + 1)
+    ox, oy = np.meshgrid(offsets, offsets)
+    grown = (base[:, None, :] + np.column_stack((ox.ravel(), oy.ravel()))[None, :, :]).reshape(-1, 2)
+    grown[:, 0] %= n
+    grown = grown[(grown[:, 1] >= 0) & (grown[:, 1] < n)]
+
+    _, first = np.unique(grown, axis=0, return_index=True)
+    return [tuple(map(int, tile)) for tile in grown[np.sort(first)]]
+
+
+class _TileRequestHandler(BaseHTTPRequestHandler):
+    server_version = "DayTrippingTiles/1.0"
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        match = _TILE_PATH_RE.match(path)
+        if match:
+            z, x, y = map(int, match.groups())
+            try:
+                data = self.server.tile_server.get_tile(z, x, y)
+            except Exception as e:
+                logger.warning("Tile %d/%d/%d failed: %s", z, x, y, e)
+                self.send_error(502)
+                return
+            self._send(data, "image/png")
+            return
+        match = _ASSET_PATH_RE.match(path)
+        if match:
+            data = self.server.tile_server.get_asset(*match.groups())
+            self._send(data, mimetypes.guess_type(match.group(2))[0] or "application/octet-stream")
+            return
+        self.send_error(404)
+
+    def _send(self, data: bytes | None, content_type: str) -> None:
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "max-age=3600")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("tile %s", format % args)
+
+
+class TileServer:
+    """Localhost tile proxy over a TileStore, with corridor prefetch."""
+
+    def __init__(
+        self,
+        store: TileStore | None = None,
+        upstream: str = DEFAULT_UPSTREAM,
+        max_age: float = TILE_MAX_AGE,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        http: HttpClient | None = None,
+    ) -> None:
+        self.store = store or TileStore()
+        self.upstream = upstream
+        self.max_age = max_age
+        self._address = (host, port)
+        self._httpd: ThreadingHTTPServer | None = None
+        self._http = http or get_http_client()
+        self._lock = threading.Lock()
+        self._in_flight: dict[tuple[int, int, int], Future] = {}
+        self._prefetch_cancel: threading.Event | None = None
+        self._mounts: dict[str, str] = {}
+        self.counts = {"hits": 0, "misses": 0, "revalidated": 0, "stale": 0, "errors": 0, "prefetched": 0}
+
+    # --- Lifecycle ---
+
+    def start(self) -> None:
+        """Bind the server and serve from a daemon thread."""
+        if self._httpd is not None:
+            return
+        self._httpd = ThreadingHTTPServer(self._address, _TileRequestHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.tile_server = self
+        threading.Thread(target=self._httpd.serve_forever, name="tile-server", daemon=True).start()
+        logger.info("Tile server listening on %s", self.url_template)
+
+    def stop(self) -> None:
+        self.cancel_prefetch()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    @property
+    def url_template(self) -> str:
+        """Leaflet URL template for the running server."""
+        if self._httpd is None:
+            return self.upstream
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/tiles/{{z}}/{{x}}/{{y}}.png"
+
+    def mount(self, name: str, directory: str) -> str:
+        """Serve files in `directory` under /<name>/; returns the URL prefix."""
+        self._mounts[name] = directory
+        if self._httpd is None:
+            return ""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/{name}/"
+
+    # --- Serving ---
+
+    def get_asset(self, name: str, filename: str) -> bytes | None:
+        """Bytes of a file in a mounted directory (flat names only), or None."""
+        directory = self._mounts.get(name)
+        if directory is None:
+            return None
+        try:
+            with open(os.path.join(directory, filename), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def get_tile(self, z: int, x: int, y: int) -> bytes | None:
+        """Tile bytes from cache or upstream; stale cache if upstream fails."""
+        if not (0 <= z <= MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)):
+            return None
+        cached = self.store.get(z, x, y)
+        if cached is not None and time.time() - cached.fetched_at < self.max_age:
+            self._count("hits")
+            return cached.data
+        return self._fetch(z, x, y)
+
+    def _fetch(self, z: int, x: int, y: int, priority: int = INTERACTIVE) -> bytes | None:
+        """Fetch or revalidate one tile, sharing the call with concurrent requests."""
+        key = (z, x, y)
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+        if not owner:
+            return future.result()
+
+        try:
+            data = self._fetch_upstream(z, x, y, priority)
+        except BaseException as e:
+            # Waiters must not block forever on a failure we did not expect
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(data)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return data
+
+    def _fetch_upstream(self, z: int, x: int, y: int, priority: int) -> bytes | None:
+        cached = self.store.get(z, x, y)
+        headers = {"User-Agent": USER_AGENT}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        try:
+            response = self._http.get_sync(
+                self.upstream.format(z=z, x=x, y=y),
+                headers=headers,
+                timeout=UPSTREAM_TIMEOUT,
+                priority=priority,
+            )
+        except httpx.HTTPError as e:
+            logger.debug("Tile %d/%d/%d upstream failed: %s", z, x, y, e)
+            response = None
+
+        if response is not None and response.status_code == 304 and cached is not None:
+            self.store.touch_validated(z, x, y)
+            self._count("revalidated")
+            return cached.data
+        if response is not None and response.status_code == 200 and response.content:
+            self.store.put(
+                z, x, y, response.content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+            self._count("misses")
+            return response.content
+
+        if cached is not None:
+            self._count("stale")
+            return cached.data
+        self._count("errors")
+        return None
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    # --- Prefetch ---
+
+    def prefetch_route(
+        self,
+        coordinates: Sequence[Sequence[float]],
+        zooms: tuple[int, int] = PREFETCH_ZOOMS,
+        radius: int = CORRIDOR_RADIUS,
+        max_tiles: int = PREFETCH_MAX_TILES,
+    ) -> threading.Event:
+        """Download the corridor around a [lng, lat] route in the background.
+
+        Replaces any prefetch already running. Returns the cancel event
+        (already set when the upstream does not allow prefetching).
+        """
+        self.cancel_prefetch()
+        cancel = threading.Event()
+        if not self.prefetch_allowed:
+            logger.debug("Not prefetching tiles from %s (bulk downloads not allowed)", self.upstream)
+            cancel.set()
+            return cancel
+        self._prefetch_cancel = cancel
+        threading.Thread(
+            target=self._run_prefetch,
+            args=(coordinates, zooms, radius, max_tiles, cancel),
+            name="tile-prefetch",
+            daemon=True,
+        ).start()
+        return cancel
+
+    @property
+    def prefetch_allowed(self) -> bool:
+        """False for upstreams whose usage policy forbids bulk downloads."""
+        host = (urlsplit(self.upstream).hostname or "").lower()
+        return not any(host == domain or host.endswith("." + domain) for domain in NO_PREFETCH_DOMAINS)
+
+    def cancel_prefetch(self) -> None:
+        if self._prefetch_cancel is not None:
+            self._prefetch_cancel.set()
+            self._prefetch_cancel = None
+
+    def _run_prefetch(
+        self,
+        coordinates: Sequence[Sequence[float]],
+        zooms: tuple[int, int],
+        radius: int,
+        max_tiles: int,
+        cancel: threading.Event,
+    ) -> None:
+        started = time.perf_counter()
+        geometry = RouteGeometry(coordinates)
+        queued = fetched = 0
+        with ThreadPoolExecutor(PREFETCH_WORKERS, thread_name_prefix="tile-prefetch") as pool:
+            for zoom in range(zooms[0], zooms[1] + 1):
+                # Sub-pixel vertices cannot change which tiles are touched
+                line = geometry.lnglat[geometry.indices_for_zoom(zoom)]
+                missing = [
+                    (zoom, x, y) for x, y in corridor_tiles(line, zoom, radius)
+                    if not self.store.has(zoom, x, y)
+                ][:max_tiles - queued]
+                queued += len(missing)
+                for ok in pool.map(lambda tile: self._prefetch_one(tile, cancel), missing):
+                    fetched += ok
+                if cancel.is_set() or queued >= max_tiles:
+                    break
+        with self._lock:
+            self.counts["prefetched"] += fetched
+        logger.info(
+            "Prefetched %d/%d corridor tiles in %.1f s%s",
+            fetched, queued, time.perf_counter() - started, " (cancelled)" if cancel.is_set() else "",
+        )
+
+    def _prefetch_one(self, tile: tuple[int, int, int], cancel: threading.Event) -> bool:
+        if cancel.is_set():
+            return False
+        try:
+            return self._fetch(*tile, BACKGROUND) is not None
+        except Exception as e:
+            logger.debug("Prefetch of tile %d/%d/%d failed: %s", *tile, e)
+            return False
+
+
+_server: TileServer | None = None
+
+
+def configured_upstream() -> str:
+    """Tile URL template chosen by the user (see module docstring)."""
+    upstream = os.environ.get(UPSTREAM_ENV)
+    if not upstream:
+        from data.database import get_setting
+        upstream = get_setting(UPSTREAM_SETTING, DEFAULT_UPSTREAM)
+    if not all(f"{{{part}}}" in upstream for part in "zxy"):
+        logger.warning("Ignoring tile upstream %r: needs {z}, {x} and {y}", upstream)
+        return DEFAULT_UPSTREAM
+    return upstream
+
+
+def start_tile_server(**kwargs) -> TileServer:
+    """Start the app-wide tile server (idempotent)."""
+    global _server
+    if _server is None:
+        _server = TileServer(**kwargs)
+        _server.start()
+    return _server
+
+
+def get_tile_server() -> TileServer | None:
+    """The app-wide tile server, if started."""
+    return _server
@@ -0,0 +1,259 @@
+"""
+data/blob_store.py — Content-addressed, reference-counted blobs shared by trips.
+
+Immutable trip payloads (route geometry sidecars, detail snapshots) are
+stored once under the SHA-256 of their bytes. A trip points at them
+through small `trip_blobs` rows (trip id, slot, hash), so duplicating a
+trip copies those rows and bumps reference counts instead of copying
+the payloads; variants of one base trip share a single copy.
+
+Small blobs live inline in the `blobs` table; large ones (route sidecars,
+which are read through mmap) live as files named by hash, with the row
+tracking their reference count. A trigger on the trips table releases a
+deleted trip's references, so deletes need no extra bookkeeping.
+
+Blobs whose count drops to zero are removed by collect(), a few at a
+time after a grace period, so garbage collection never stalls the UI
+and a blob being re-attached is not lost in between.
+
+Usage:
+    blobs = get_blob_store()
+    digest = blobs.put(data, "route", external=True)
+    blobs.attach(trip_id, "route", digest)
+    blobs.copy_trip(trip_id, new_trip_id)        # O(slots), no payload copies
+    blobs.collect()                              # incremental GC step
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from config.settings import APP_SUPPORT_DIR
+from data.database import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = os.path.join(APP_SUPPORT_DIR, "blobs")
+GC_BATCH = 32                     # Blobs removed per collect() call
+GC_GRACE = 10 * 60                # Seconds an unreferenced blob is kept
+
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore:
+    """Reference-counted blob table next to the trips it belongs to."""
+
+    def __init__(self, path: str = DB_PATH, directory: str = BLOB_DIR) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                data BLOB,                      -- NULL when stored as a file
+                refcount INTEGER NOT NULL DEFAULT 0,
+                released_at REAL NOT NULL       -- Last put or drop in references
+            );
+            CREATE INDEX IF NOT EXISTS idx_blobs_unreferenced
+                ON blobs(released_at) WHERE refcount <= 0;
+            CREATE TABLE IF NOT EXISTS trip_blobs (
+                trip_id INTEGER NOT NULL,
+                slot TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (trip_id, slot)
+            );
+            CREATE INDEX IF NOT EXISTS idx_trip_blobs_hash ON trip_blobs(hash);
+            CREATE TRIGGER IF NOT EXISTS trips_release_blobs AFTER DELETE ON trips BEGIN
+                UPDATE blobs SET
+                    refcount = refcount - (
+                        SELECT COUNT(*) FROM trip_blobs
+                        WHERE trip_id = old.id AND trip_blobs.hash = blobs.hash
+                    ),
+                    released_at = CAST(strftime('%s', 'now') AS REAL)
+                WHERE hash IN (SELECT hash FROM trip_blobs WHERE trip_id = old.id);
+                DELETE FROM trip_blobs WHERE trip_id = old.id;
+            END;
+            """
+        )
+
+    # --- Blobs ---
+
+    def put(self, data: bytes, kind: str, external: bool = False) -> str:
+        """Store bytes once and return their hash (a no-op if already stored)."""
+        digest = blob_hash(data)
+        # One critical section, so collect() cannot drop the file between
+        # the existence check and the row upsert
+        with self._lock:
+            if external:
+                path = self.path(digest)
+                if not os.path.exists(path):
+                    tmp = f"{path}.{threading.get_ident()}.tmp"
+                    with open(tmp, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, path)
+            self._conn.execute(
+                "INSERT INTO blobs (hash, kind, size, data, released_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET released_at = excluded.released_at",
+                (digest, kind, len(data), None if external else data, time.time()),
+            )
+        return digest
+
+    def get(self, digest: str) -> bytes | None:
+        """Bytes of a blob, inline or from its file."""
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM blobs WHERE hash = ?", (digest,)).fetchone()
+        if row is None:
+            return None
+        if row[0] is not None:
+            return bytes(row[0])
+        try:
+            with open(self.path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def path(self, digest: str) -> str:
+        """File location of an external blob."""
+        return os.path.join(self.directory, digest)
+
+    # --- Trip references ---
+
+    def attach(self, trip_id: int, slot: str, digest: str) -> None:
+        """Point a trip's slot at a blob, releasing whatever it held before."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            old = self._conn.execute(
+                "SELECT hash FROM trip_blobs WHERE trip_id = ? AND slot = ?", (trip_id, slot)
+            ).fetchone()
+            if old is not None and old[0] == digest:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO trip_blobs (trip_id, slot, hash) VALUES (?, ?, ?)",
+                (trip_id, slot, digest),
+            )
+            self._conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?", (digest,))
+            if old is not None:
+                self._release(old[0])
+
+    def detach(self, trip_id: int, slot: str | None = None) -> None:
+        """Drop one slot (or every slot) of a trip."""
+        where, params = ("trip_id = ?", (trip_id,)) if slot is None else (
+            "trip_id = ? AND slot = ?", (trip_id, slot)
+        )
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(f"SELECT hash FROM trip_blobs WHERE {where}", params).fetchall()
+            self._conn.execute(f"DELETE FROM trip_blobs WHERE {where}", params)
+            for (digest,) in rows:
+                self._release(digest)
+
+    def copy_trip(self, source_id: int, target_id: int) -> int:
+        """Share every blob of one trip with another; returns slots copied."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            # Only slots the target does not have yet; each one gains a reference
+            rows = self._conn.execute(
+                "SELECT src.slot, src.hash FROM trip_blobs AS src WHERE src.trip_id = ? "
+                "AND NOT EXISTS (SELECT 1 FROM trip_blobs AS dst WHERE dst.trip_id = ? AND dst.slot = src.slot)",
+                (source_id, target_id),
+            ).fetchall()
+            self._conn.executemany(
+                "INSERT INTO trip_blobs (trip_id, slot, hash) VALUES (?, ?, ?)",
+                [(target_id, slot, digest) for slot, digest in rows],
+            )
+            self._conn.executemany(
+                "UPDATE blobs SET refcount = refcount + 1 WHERE hash = ?",
+                [(digest,) for _slot, digest in rows],
+            )
+        return len(rows)
+
+    def trip_slots(self, trip_id: int) -> dict[str, str]:
+        """{slot: hash} for a trip."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT slot, hash FROM trip_blobs WHERE trip_id = ?", (trip_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def slot(self, trip_id: int, slot: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash FROM trip_blobs WHERE trip_id = ? AND slot = ?", (trip_id, slot)
+            ).fetchone()
+        return row[0] if row else None
+
+    # --- Garbage collection ---
+
+    def collect(self, limit: int = GC_BATCH, grace: float = GC_GRACE) -> int:
+        """Delete up to `limit` blobs unreferenced for `grace` seconds.
+
+        Returns how many were removed; call again while it returns
+        `limit` to work through a backlog in small steps.
+        """
+        cutoff = time.time() - grace
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT hash, data IS NULL FROM blobs WHERE refcount <= 0 AND released_at < ? LIMIT ?",
+                (cutoff, limit),
+            ).fetchall()
+            removed = 0
+            for digest, external in rows:
+                if external:
+                    # File first: a row without a file is retried, never the reverse
+                    try:
+                        os.remove(self.path(digest))
+                    except FileNotFoundError:
+                        pass
+                    except OSError as e:
+                        # Still mapped somewhere (Windows); retry on a later pass
+                        logger.debug("Keeping blob %s for now: %s", digest[:12], e)
+                        continue
+                self._conn.execute(
+                    "DELETE FROM blobs WHERE hash = ? AND refcount <= 0", (digest,)
+                )
+                removed += 1
+        if removed:
+            logger.info("Collected %d unreferenced blobs", removed)
+        return removed
+
+    def usage(self) -> dict:
+        """Blob count, stored bytes, and bytes a full copy per reference would take."""
+        with self._lock:
+            count, stored, logical = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(size * MAX(refcount, 0)), 0) FROM blobs"
+            ).fetchone()
+        return {"blobs": count, "stored_bytes": stored, "referenced_bytes": logical}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- Internals ---
+
+    def _release(self, digest: str) -> None:
+        self._conn.execute(
+            "UPDATE blobs SET refcount = refcount - 1, released_at = ? WHERE hash = ?",
+            (time.time(), digest),
+        )
+
+
+_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    """The shared blob store in the trip database (created on first use)."""
+    global _store
+    if _store is None:
+        _store = BlobStore()
+    return _store
@@ -0,0 +1,204 @@
+"""
+data/cache_store.py — Persistent key/value caches with TTL and LRU eviction.
+
+Each PersistentCache is one table in a shared SQLite file next to the trip
+database. Values are JSON-encoded; entries carry an optional expiry and a
+last-access time used for LRU eviction when the table exceeds its entry
+or byte budget.
+
+Usage:
+    cache = PersistentCache("geocode", max_entries=5000, default_ttl=7 * DAY)
+    cache.put("san diego", results)
+    results = cache.get("san diego")
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from config.settings import APP_SUPPORT_DIR
+
+logger = logging.getLogger(__name__)
+
+CACHE_DB_PATH = os.path.join(APP_SUPPORT_DIR, "cache.db")
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+
+_NAMESPACE_RE = re.compile(r"^[a-z][a-z0-9_]*$")
+
+# One connection per database file, shared by every cache namespace.
+# pywebview calls API methods from worker threads, so access is serialized.
+_connections: dict[str, sqlite3.Connection] = {}
+_connections_lock = threading.Lock()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    with _connections_lock:
+        conn = _connections.get(path)
+        if conn is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            _connections[path] = conn
+        return conn
+
+
+class PersistentCache:
+    """SQLite-backed cache table with per-entry TTL and LRU eviction."""
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int | None = None,
+        max_bytes: int | None = None,
+        default_ttl: float | None = None,
+        path: str = CACHE_DB_PATH,
+    ) -> None:
+        if not _NAMESPACE_RE.match(namespace):
+            raise ValueError(f"Invalid cache namespace: {namespace!r}")
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._table = f"cache_{namespace}"
+        self._conn = _connect(path)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS {self._table} (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self._table}_accessed "
+                f"ON {self._table}(accessed_at)"
+            )
+
+    # --- Raw bytes ---
+
+    def get_bytes(self, key: str, allow_stale: bool = False) -> bytes | None:
+        """Return the stored bytes for key, or None if missing or expired."""
+        entry = self.get_entry_bytes(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if not allow_stale and expires_at is not None and expires_at < time.time():
+            return None
+        return value
+
+    def get_entry_bytes(self, key: str) -> tuple[bytes, float | None] | None:
+        """Return (value, expires_at) without applying the TTL."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires_at FROM {self._table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                f"UPDATE {self._table} SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return bytes(row[0]), row[1]
+
+    def put_bytes(self, key: str, value: bytes, ttl: float | None = None) -> None:
+        """Store bytes under key, then evict least-recently-used entries."""
+        ttl = self.default_ttl if ttl is None else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self._table} "
+                f"(key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), expires_at, now),
+            )
+            self._evict()
+
+    # --- JSON values ---
+
+    def get(self, key: str, allow_stale: bool = False) -> Any | None:
+        """Return the decoded value for key, or None if missing or expired."""
+        raw = self.get_bytes(key, allow_stale=allow_stale)
+        return None if raw is None else json.loads(raw)
+
+    def get_entry(self, key: str) -> tuple[Any, float | None] | None:
+        """Return (value, expires_at) even if expired, for stale-while-revalidate."""
+        entry = self.get_entry_bytes(key)
+        if entry is None:
+            return None
+        return json.loads(entry[0]), entry[1]
+
+    def put(self, key: str, value: Any, ttl: float | None = None) -> None:
+        """JSON-encode and store value under key."""
+        self.put_bytes(key, json.dumps(value, separators=(",", ":")).encode("utf-8"), ttl)
+
+    # --- Maintenance ---
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self._table} WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self._table}")
+
+    def purge_expired(self) -> int:
+        """Delete expired entries; returns how many were removed."""
+        with self._lock:
+            cur = self._conn.execute(
+                f"DELETE FROM {self._table} WHERE expires_at IS NOT NULL AND expires_at < ?",
+                (time.time(),),
+            )
+            return cur.rowcount
+
+    def usage(self) -> tuple[int, int]:
+        """Return (entry count, total value bytes)."""
+        with self._lock:
+            count, size = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self._table}"
+            ).fetchone()
+        return count, size
+
+    def _evict(self) -> None:
+        """Drop least-recently-used rows until within budget (lock held)."""
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        count, size = self._conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self._table}"
+        ).fetchone()
+        over_entries = self.max_entries is not None and count > self.max_entries
+        over_bytes = self.max_bytes is not None and size > self.max_bytes
+        if not (over_entries or over_bytes):
+            return
+
+        evicted = 0
+        rows = self._conn.execute(
+            f"SELECT key, size FROM {self._table} ORDER BY accessed_at ASC"
+        )
+        doomed = []
+        for key, entry_size in rows:
+            if not (
+                (self.max_entries is not None and count > self.max_entries)
+                or (self.max_bytes is not None and size > self.max_bytes)
+            ):
+                break
+            doomed.append((key,))
+            count -= 1
+            size -= entry_size
+            evicted += 1
+        self._conn.executemany(f"DELETE FROM {self._table} WHERE key = ?", doomed)
+        logger.debug("Evicted %d entries from %s", evicted, self._table)
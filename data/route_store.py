@@ -0,0 +1,263 @@
+"""
+data/route_store.py — Binary sidecar files for route geometry.
+
+A trip's route_data keeps its metadata (distance, duration, summaries)
+as JSON, but the coordinate arrays move into a binary sidecar:
+
+    header    <4sHHII   magic b"DTRG", version, flags, scale, route count
+    table     <II       first point, point count            (per route)
+    points    <i4 × 2   lng, lat in 1/scale degrees; each route's first
+                        point absolute, every later one a delta
+    ranks     <f4       Douglas–Peucker importance per point (FLAG_RANKS)
+
+Everything is little-endian and 4-byte aligned. Files are read through
+mmap: numpy views the int32 section in place and a single cumsum
+rebuilds a route, so opening a long route never creates per-point Python
+objects, and the stored ranks skip the simplification pass entirely.
+JSON is produced only at the bridge, for the zoom levels requested.
+
+Sidecars are content-addressed blobs (data/blob_store.py): a trip's
+"route" slot names the file by hash, so duplicated trips and unchanged
+re-saves share one file, and deleting a trip only drops a reference.
+
+Usage:
+    store = RouteStore()
+    slim = store.save(trip_id, route_data)      # route_data without coordinates
+    payload = store.compact(trip_id, slim)      # overview for initMap()
+    runs = store.geometry(trip_id, 0).detail(zoom, w, s, e, n)
+"""
+
+from __future__ import annotations
+
+import logging
+import mmap
+import struct
+import threading
+from collections import OrderedDict
+from typing import Sequence
+
+import numpy as np
+
+from core.route_geometry import RouteGeometry
+from data.blob_store import BlobStore, get_blob_store
+
+logger = logging.getLogger(__name__)
+
+ROUTE_SLOT = "route"
+MAGIC = b"DTRG"
+FORMAT_VERSION = 1
+FLAG_RANKS = 0x1
+SCALE = 1_000_000                 # 1e-6° ≈ 0.1 m; ±180° fits in int32
+HEADER = struct.Struct("<4sHHII")
+TABLE_ENTRY = struct.Struct("<II")
+OPEN_BLOBS = 8                    # Mapped files kept open (least recently used dropped)
+
+
+class RouteFormatError(ValueError):
+    """The file is not a route sidecar this version can read."""
+
+
+def encode_routes(geometries: Sequence[RouteGeometry], ranks: bool = True) -> bytes:
+    """Serialize route geometries to the sidecar format."""
+    table = bytearray()
+    points = []
+    offset = 0
+    for geometry in geometries:
+        fixed = np.rint(geometry.lnglat * SCALE).astype(np.int64)
+        deltas = fixed.copy()
+        deltas[1:] -= fixed[:-1]
+        points.append(deltas.astype("<i4"))
+        table += TABLE_ENTRY.pack(offset, len(fixed))
+        offset += len(fixed)
+
+    parts = [
+        HEADER.pack(MAGIC, FORMAT_VERSION, FLAG_RANKS if ranks else 0, SCALE, len(geometries)),
+        bytes(table),
+        *(block.tobytes() for block in points),
+    ]
+    if ranks:
+        parts += [np.asarray(g.importance, dtype="<f4").tobytes() for g in geometries]
+    return b"".join(parts)
+
+
+class RouteBlob:
+    """A memory-mapped sidecar file; routes are decoded on demand."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if len(view) < HEADER.size:
+            raise RouteFormatError(f"{path}: truncated header")
+        magic, version, flags, scale, count = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise RouteFormatError(f"{path}: not a route file")
+        if version > FORMAT_VERSION:
+            raise RouteFormatError(f"{path}: format v{version} is newer than v{FORMAT_VERSION}")
+
+        self.version = version
+        self.scale = scale
+        self.count = count
+        table_end = HEADER.size + count * TABLE_ENTRY.size
+        self._table = [TABLE_ENTRY.unpack_from(view, HEADER.size + i * TABLE_ENTRY.size) for i in range(count)]
+        total = sum(n for _first, n in self._table)
+        expected = table_end + total * 8 + (total * 4 if flags & FLAG_RANKS else 0)
+        if len(view) < expected:
+            raise RouteFormatError(f"{path}: truncated ({len(view)} < {expected} bytes)")
+
+        self._points = np.frombuffer(self._mmap, dtype="<i4", count=total * 2, offset=table_end).reshape(-1, 2)
+        self._ranks = (
+            np.frombuffer(self._mmap, dtype="<f4", count=total, offset=table_end + total * 8)
+            if flags & FLAG_RANKS else None
+        )
+        self._geometries: dict[int, RouteGeometry] = {}
+
+    def lnglat(self, index: int) -> np.ndarray:
+        """Route `index` as an n×2 float64 [lng, lat] array."""
+        first, n = self._table[index]
+        fixed = np.cumsum(self._points[first:first + n], axis=0, dtype=np.int64)
+        return fixed / self.scale
+
+    def geometry(self, index: int) -> RouteGeometry:
+        geometry = self._geometries.get(index)
+        if geometry is None:
+            first, n = self._table[index]
+            ranks = None if self._ranks is None else self._ranks[first:first + n]
+            geometry = self._geometries[index] = RouteGeometry.from_arrays(self.lnglat(index), ranks)
+        return geometry
+
+    def close(self) -> None:
+        self._geometries.clear()
+        self._points = self._ranks = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # A caller still holds a view; the map closes with it
+
+    def __enter__(self) -> RouteBlob:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class RouteStore:
+    """Trip route sidecars kept as shared blobs, with a few kept mapped.
+
+    Blobs dropped from the open set are not closed: callers may still
+    hold them (or arrays viewing their map), and the mmap is released
+    once the last reference goes.
+    """
+
+    def __init__(self, blobs: BlobStore | None = None) -> None:
+        self._blobs = blobs or get_blob_store()
+        self._lock = threading.Lock()
+        self._open: OrderedDict[str, RouteBlob] = OrderedDict()    # hash → mapped file, LRU order
+
+    def path(self, key: int | str) -> str | None:
+        """File holding a trip's routes, or None if it has none."""
+        digest = self.digest(key)
+        return None if digest is None else self._blobs.path(digest)
+
+    def save(self, key: int | str, route_data: dict | None) -> dict | None:
+        """Store the coordinates of route_data as a blob; return it without them.
+
+        Each route keeps its other fields plus "geometry_index", its
+        position in the file. Route data already saved (no coordinates)
+        is returned unchanged.
+        """
+        routes = _routes(route_data)
+        if not routes or all(route.get("coordinates") is None for route in routes):
+            return route_data
+
+        geometries = [RouteGeometry(route.get("coordinates") or []) for route in routes]
+        digest = self._blobs.put(encode_routes(geometries), ROUTE_SLOT, external=True)
+        self._blobs.attach(int(key), ROUTE_SLOT, digest)
+
+        slim = [
+            {**{k: v for k, v in route.items() if k != "coordinates"}, "geometry_index": i}
+            for i, route in enumerate(routes)
+        ]
+        result = dict(route_data)
+        result["selected"] = slim[0] if route_data.get("selected") else None
+        result["alternatives"] = slim[1:] if route_data.get("selected") else slim
+        logger.debug("Saved %d routes (%d points) for %s as %s", len(routes),
+                     sum(len(g.lnglat) for g in geometries), key, digest[:12])
+        return result
+
+    def blob(self, key: int | str) -> RouteBlob | None:
+        """The mapped sidecar for a trip, or None if it has none."""
+        digest = self.digest(key)
+        if digest is None:
+            return None
+        with self._lock:
+            blob = self._open.get(digest)
+            if blob is not None:
+                self._open.move_to_end(digest)
+            else:
+                try:
+                    blob = RouteBlob(self._blobs.path(digest))
+                except FileNotFoundError:
+                    return None
+                except RouteFormatError as e:
+                    logger.warning("Ignoring route file: %s", e)
+                    return None
+                if len(self._open) >= OPEN_BLOBS:
+                    self._open.popitem(last=False)
+                self._open[digest] = blob
+            return blob
+
+    def geometry(self, key: int | str, index: int) -> RouteGeometry | None:
+        blob = self.blob(key)
+        if blob is None or not 0 <= index < blob.count:
+            return None
+        return blob.geometry(index)
+
+    def compact(self, key: int | str, route_data: dict | None) -> dict | None:
+        """Bridge payload: each route's overview levels in place of coordinates.
+
+        Routes still carrying inline coordinates (older trips) are
+        simplified from those instead.
+        """
+        if not route_data:
+            return route_data
+
+        def one(route: dict | None) -> dict | None:
+            if route is None:
+                return None
+            out = {k: v for k, v in route.items() if k not in ("coordinates", "legs", "geometry_index")}
+            if route.get("coordinates") is not None:
+                geometry = RouteGeometry(route["coordinates"])
+            elif "geometry_index" in route:
+                geometry = self.geometry(key, route["geometry_index"])
+            else:
+                geometry = None
+            if geometry is not None:
+                out["geometry"] = geometry.overview()
+            return out
+
+        result = dict(route_data)
+        result["selected"] = one(route_data.get("selected"))
+        result["alternatives"] = [one(r) for r in route_data.get("alternatives") or []]
+        return result
+
+    def delete(self, key: int | str) -> None:
+        """Drop a trip's reference; the file goes once no trip shares it."""
+        self._blobs.detach(int(key), ROUTE_SLOT)
+
+    def close(self) -> None:
+        """Forget the open blobs; each unmaps when its last holder lets go."""
+        with self._lock:
+            self._open.clear()
+
+    def digest(self, key: int | str) -> str | None:
+        """Content hash of a trip's routes; it changes whenever they do."""
+        return self._blobs.slot(int(key), ROUTE_SLOT)
+
+
+def _routes(route_data: dict | None) -> list[dict]:
+    if not route_data:
+        return []
+    selected = route_data.get("selected")
+    return ([selected] if selected else []) + list(route_data.get("alternatives") or [])
@@ -0,0 +1,166 @@
+"""
+data/tile_store.py — MBTiles-compatible SQLite store for cached map tiles.
+
+Tiles live in the standard MBTiles `tiles` table (TMS row order), with
+extra columns for HTTP validators and LRU bookkeeping. The store is
+bounded by total tile bytes; the least recently served tiles are evicted
+first.
+
+Usage:
+    store = TileStore()
+    store.put(z, x, y, data, etag='"abc"', last_modified=None)
+    tile = store.get(z, x, y)   # Tile(data, etag, last_modified, fetched_at) or None
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from config.settings import APP_SUPPORT_DIR
+
+logger = logging.getLogger(__name__)
+
+TILE_DB_PATH = os.path.join(APP_SUPPORT_DIR, "tiles.mbtiles")
+TILE_STORE_MAX_BYTES = 512 * 1024 * 1024
+EVICT_TO_FRACTION = 0.9  # Evict down to this share of the budget at once
+
+
+@dataclass(frozen=True)
+class Tile:
+    """A cached tile and its HTTP validators."""
+
+    data: bytes
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+
+
+def tms_row(z: int, y: int) -> int:
+    """Convert an XYZ (slippy map) row to MBTiles' TMS row."""
+    return (1 << z) - 1 - y
+
+
+class TileStore:
+    """Size-bounded LRU tile cache in an MBTiles file."""
+
+    def __init__(self, path: str = TILE_DB_PATH, max_bytes: int = TILE_STORE_MAX_BYTES) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER NOT NULL,
+                tile_column INTEGER NOT NULL,
+                tile_row INTEGER NOT NULL,
+                tile_data BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (zoom_level, tile_column, tile_row)
+            );
+            CREATE INDEX IF NOT EXISTS idx_tiles_accessed ON tiles(accessed_at);
+            INSERT OR IGNORE INTO metadata VALUES ('name', 'Day Tripping tile cache');
+            INSERT OR IGNORE INTO metadata VALUES ('format', 'png');
+            """
+        )
+        (self._total_bytes,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM tiles"
+        ).fetchone()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def has(self, z: int, x: int, y: int) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (z, x, tms_row(z, y)),
+            ).fetchone() is not None
+
+    def get(self, z: int, x: int, y: int) -> Tile | None:
+        """Return a cached tile (marking it recently used), or None."""
+        key = (z, x, tms_row(z, y))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT tile_data, etag, last_modified, fetched_at FROM tiles "
+                "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                key,
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE tiles SET accessed_at = ? "
+                "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (time.time(), *key),
+            )
+        return Tile(bytes(row[0]), row[1], row[2], row[3])
+
+    def put(
+        self,
+        z: int,
+        x: int,
+        y: int,
+        data: bytes,
+        etag: str | None = None,
+        last_modified: str | None = None,
+    ) -> None:
+        """Store or replace a tile, evicting old tiles if over budget."""
+        key = (z, x, tms_row(z, y))
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                key,
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data, "
+                "etag, last_modified, fetched_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (*key, data, etag, last_modified, now, now, len(data)),
+            )
+            self._total_bytes += len(data) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def touch_validated(self, z: int, x: int, y: int) -> None:
+        """Mark a tile fresh after a 304 Not Modified revalidation."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE tiles SET fetched_at = ?, accessed_at = ? "
+                "WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (now, now, z, x, tms_row(z, y)),
+            )
+
+    def _evict(self) -> None:
+        """Drop least recently used tiles down to EVICT_TO_FRACTION (lock held)."""
+        target = int(self.max_bytes * EVICT_TO_FRACTION)
+        doomed = []
+        freed = 0
+        for z, x, row, size in self._conn.execute(
+            "SELECT zoom_level, tile_column, tile_row, size FROM tiles ORDER BY accessed_at ASC"
+        ):
+            if self._total_bytes - freed <= target:
+                break
+            doomed.append((z, x, row))
+            freed += size
+        self._conn.executemany(
+            "DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            doomed,
+        )
+        self._total_bytes -= freed
+        logger.info("Evicted %d tiles (%.1f MB)", len(doomed), freed / 1e6)
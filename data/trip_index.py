@@ -0,0 +1,217 @@
+"""
+data/trip_index.py — Paged, sorted and full-text trip queries for the home screen.
+
+The home grid used to load every trip row up front. TripIndex serves
+it one page at a time instead:
+
+- keyset pagination over indexes on (created_at, id) and
+  (name COLLATE NOCASE, id), so a page costs the same however many
+  trips are saved;
+- an FTS5 table over trip names and start/end location names, kept in
+  sync by triggers on the trips table, so create, rename, duplicate
+  and delete need no extra bookkeeping in the trip manager.
+
+When the SQLite build lacks FTS5, search falls back to LIKE matching.
+
+Usage:
+    index = get_trip_index()
+    page = index.page("recent", limit=60)
+    more = index.page("recent", limit=60, cursor=page.cursor)
+    hits = index.search("big sur", limit=60)
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any
+
+from data.database import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 60
+SEARCH_COLUMNS = ("name", "start_location", "end_location")
+CARD_COLUMNS = ("id", "name", "start_location", "end_location", "created_at")
+NAME_WEIGHT = 10.0        # bm25 weight of name matches over location matches
+
+# sort → (ORDER BY, cursor comparison, key column)
+SORTS = {
+    "recent": ("created_at DESC, id DESC", "<", "created_at"),
+    "oldest": ("created_at ASC, id ASC", ">", "created_at"),
+    "name": ("name COLLATE NOCASE ASC, id ASC", ">", "name COLLATE NOCASE"),
+}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass(frozen=True)
+class TripPage:
+    trips: list[dict]
+    cursor: tuple[Any, int] | None   # Pass back for the next page; None at the end
+
+
+def fts_query(text: str) -> str | None:
+    """Turn typed text into an FTS5 query: every word, as a prefix, must match."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+class TripIndex:
+    """Read-side queries over the trips table, plus the indexes they need."""
+
+    def __init__(self, path: str = DB_PATH) -> None:
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(trips)")}
+            self._select = ", ".join(
+                col if col in columns else f"NULL AS {col}" for col in CARD_COLUMNS
+            )
+            self._search_columns = [col for col in SEARCH_COLUMNS if col in columns]
+            self._ensure_indexes()
+            self.has_fts = self._ensure_fts()
+
+    # --- Public API ---
+
+    def page(self, sort: str = "recent", limit: int = PAGE_SIZE, cursor: tuple | None = None) -> TripPage:
+        """One page of trips in `sort` order, starting after `cursor`."""
+        order, compare, key = SORTS[sort]
+        sql = f"SELECT {self._select}, {key.split()[0]} AS _key FROM trips"
+        params: list[Any] = []
+        if cursor is not None:
+            sql += f" WHERE ({key}, id) {compare} (?, ?)"
+            params += list(cursor)
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit + 1)   # One extra row tells whether a next page exists
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = (rows[-1]["_key"], rows[-1]["id"]) if more and rows else None
+        return TripPage([self._card(row) for row in rows], next_cursor)
+
+    def search(self, text: str, limit: int = PAGE_SIZE) -> list[dict]:
+        """Best-ranked trips whose name or start/end location match the text."""
+        if not text.strip() or not self._search_columns:
+            return self.page(limit=limit).trips
+        with self._lock:
+            if self.has_fts:
+                query = fts_query(text)
+                if query is None:
+                    return []
+                weights = ", ".join(
+                    str(NAME_WEIGHT if col == "name" else 1.0) for col in self._search_columns
+                )
+                rows = self._conn.execute(
+                    f"SELECT {self._prefixed('t')} FROM trips_fts "
+                    f"JOIN trips AS t ON t.id = trips_fts.rowid "
+                    f"WHERE trips_fts MATCH ? ORDER BY bm25(trips_fts, {weights}) LIMIT ?",
+                    (query, limit),
+                ).fetchall()
+            else:
+                pattern = f"%{text.strip()}%"
+                where = " OR ".join(f"{col} LIKE ?" for col in self._search_columns)
+                rows = self._conn.execute(
+                    f"SELECT {self._select} FROM trips WHERE {where} "
+                    f"ORDER BY created_at DESC LIMIT ?",
+                    [pattern] * len(self._search_columns) + [limit],
+                ).fetchall()
+        return [self._card(row) for row in rows]
+
+    def get(self, trip_id: int) -> dict | None:
+        """The card fields of one trip, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self._select} FROM trips WHERE id = ?", (trip_id,)
+            ).fetchone()
+        return self._card(row) if row is not None else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM trips").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- Schema ---
+
+    def _ensure_indexes(self) -> None:
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_trips_created ON trips(created_at, id)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_trips_name ON trips(name COLLATE NOCASE, id)"
+        )
+        self._conn.commit()
+
+    def _ensure_fts(self) -> bool:
+        """Create the FTS5 table and its sync triggers; False without FTS5."""
+        cols = self._search_columns
+        if not cols:
+            return False
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'trips_fts'"
+        ).fetchone()
+        col_list = ", ".join(cols)
+        new_values = ", ".join(f"new.{col}" for col in cols)
+        old_values = ", ".join(f"old.{col}" for col in cols)
+        try:
+            with self._conn:
+                self._conn.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS trips_fts USING fts5("
+                    f"{col_list}, content='trips', content_rowid='id', "
+                    f"tokenize='unicode61 remove_diacritics 2')"
+                )
+                self._conn.executescript(f"""
+                    CREATE TRIGGER IF NOT EXISTS trips_fts_insert AFTER INSERT ON trips BEGIN
+                        INSERT INTO trips_fts(rowid, {col_list}) VALUES (new.id, {new_values});
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS trips_fts_delete AFTER DELETE ON trips BEGIN
+                        INSERT INTO trips_fts(trips_fts, rowid, {col_list})
+                        VALUES ('delete', old.id, {old_values});
+                    END;
+                    CREATE TRIGGER IF NOT EXISTS trips_fts_update AFTER UPDATE OF {col_list} ON trips BEGIN
+                        INSERT INTO trips_fts(trips_fts, rowid, {col_list})
+                        VALUES ('delete', old.id, {old_values});
+                        INSERT INTO trips_fts(rowid, {col_list}) VALUES (new.id, {new_values});
+                    END;
+                """)
+                if not exists:
+                    # Index the trips saved before the table existed
+                    self._conn.execute("INSERT INTO trips_fts(trips_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            logger.warning("FTS5 unavailable, trip search falls back to LIKE: %s", e)
+            return False
+        return True
+
+    # --- Internals ---
+
+    def _prefixed(self, alias: str) -> str:
+        return ", ".join(
+            f"{alias}.{part}" if " AS " not in part else part
+            for part in self._select.split(", ")
+        )
+
+    @staticmethod
+    def _card(row: sqlite3.Row) -> dict:
+        return {col: row[col] for col in CARD_COLUMNS}
+
+
+_index: TripIndex | None = None
+
+
+def get_trip_index() -> TripIndex:
+    """The shared index over the trip database (created on first use)."""
+    global _index
+    if _index is None:
+        _index = TripIndex()
+    return _index
@@ -0,0 +1,81 @@
+"""
+tests/conftest.py — Shared fixtures: a local stand-in HTTP server.
+
+The stand-in runs on 127.0.0.1 in a daemon thread. Tests set its
+`respond(request)` callable, which returns (status, headers, body), and
+read `requests` to see what reached it and when.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@dataclass
+class StandInRequest:
+    path: str
+    headers: dict[str, str]
+    at: float = field(default_factory=time.monotonic)
+
+
+Response = tuple[int, dict[str, str], bytes]
+
+
+class StandInServer:
+    """Answers every GET with respond(request) and records the requests."""
+
+    def __init__(self) -> None:
+        self.requests: list[StandInRequest] = []
+        self.respond: Callable[[StandInRequest], Response] = lambda request: (200, {}, b"ok")
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                request = StandInRequest(self.path, dict(self.headers.items()))
+                with stand_in._lock:
+                    stand_in.requests.append(request)
+                status, headers, body = stand_in.respond(request)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def paths(self) -> list[str]:
+        with self._lock:
+            return [request.path for request in self.requests]
+
+    def close(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def stand_in():
+    server = StandInServer()
+    yield server
+    server.close()
@@ -0,0 +1,106 @@
+"""Checks of core/http_client.py against a local stand-in server."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+from core.http_client import BACKGROUND, INTERACTIVE, HttpClient
+from data.cache_store import PersistentCache
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    clients = []
+
+    def make(rate: float = 100.0, burst: int = 100, **kwargs) -> HttpClient:
+        client = HttpClient(host_limits={"127.0.0.1": (rate, burst)}, http2=False, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_interactive_request_overtakes_queued_background(stand_in, make_client):
+    client = make_client(rate=10.0, burst=1)
+
+    async def burst():
+        first = asyncio.create_task(client.get(f"{stand_in.url}/first", priority=INTERACTIVE))
+        await asyncio.sleep(0)  # Takes the only token
+        background = [
+            asyncio.create_task(client.get(f"{stand_in.url}/background/{i}", priority=BACKGROUND))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(client.get(f"{stand_in.url}/interactive", priority=INTERACTIVE))
+        await asyncio.gather(first, *background, interactive)
+
+    asyncio.run_coroutine_threadsafe(burst(), client.loop).result(10)
+    assert stand_in.paths()[:2] == ["/first", "/interactive"]
+
+
+def test_bucket_spaces_requests_by_its_rate(stand_in, make_client):
+    client = make_client(rate=5.0, burst=1)
+    for i in range(4):
+        assert client.get_sync(f"{stand_in.url}/{i}").status_code == 200
+
+    times = [request.at for request in stand_in.requests]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert min(gaps) >= 0.18  # 5 req/s → 200 ms apart, minus scheduling slack
+
+
+def test_retry_after_is_honoured_then_succeeds(stand_in, make_client):
+    client = make_client()
+    stand_in.respond = lambda request: (
+        (503, {"Retry-After": "1"}, b"busy") if len(stand_in.requests) == 1 else (200, {}, b"done")
+    )
+
+    started = time.monotonic()
+    response = client.get_sync(f"{stand_in.url}/flaky")
+
+    assert response.status_code == 200
+    assert response.content == b"done"
+    assert client.counts["retries"] == 1
+    assert stand_in.requests[1].at - stand_in.requests[0].at >= 0.9
+    assert time.monotonic() - started < 5
+
+
+def test_revalidation_returns_cached_body_on_304(stand_in, make_client, tmp_path):
+    cache = PersistentCache("http_test", path=os.path.join(tmp_path, "cache.db"))
+    client = make_client(cache=cache)
+
+    def respond(request):
+        if request.headers.get("If-None-Match") == '"v1"':
+            return 304, {"ETag": '"v1"'}, b""
+        return 200, {"ETag": '"v1"', "Content-Type": "text/plain"}, b"payload"
+
+    stand_in.respond = respond
+    first = client.get_sync(f"{stand_in.url}/resource", revalidate=True)
+    second = client.get_sync(f"{stand_in.url}/resource", revalidate=True)
+
+    assert first.content == second.content == b"payload"
+    assert second.headers.get("X-Revalidated") == "1"
+    assert stand_in.requests[1].headers.get("If-None-Match") == '"v1"'
+    assert client.counts["revalidated"] == 1
+
+
+def test_max_bytes_aborts_large_downloads(stand_in, make_client):
+    client = make_client()
+    stand_in.respond = lambda request: (200, {}, b"x" * 10_000)
+
+    assert len(client.get_sync(f"{stand_in.url}/small", max_bytes=20_000).content) == 10_000
+    with pytest.raises(ValueError):
+        client.get_sync(f"{stand_in.url}/big", max_bytes=1_000)
+
+
+def test_transport_errors_are_retried_then_raised(make_client):
+    client = make_client(max_retries=1)
+    with pytest.raises(httpx.TransportError):
+        client.get_sync("http://127.0.0.1:9/unreachable", timeout=1.0)
+    assert client.counts["retries"] == 1
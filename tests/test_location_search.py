@@ -0,0 +1,97 @@
+"""Checks of core/location_search.py against a local fake geocoder."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from core.location_search import LocationSearch
+from data.cache_store import PersistentCache
+
+PLACES = [
+    {"display_name": "San Francisco, California"},
+    {"display_name": "San Jose, California"},
+    {"display_name": "Santa Cruz, California"},
+    {"display_name": "Santa Barbara, California"},
+    {"display_name": "Santa Rosa, California"},
+]
+
+
+class FakeGeocoder:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.calls: list[str] = []
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self, query: str) -> list[dict]:
+        with self._lock:
+            self.calls.append(query)
+        time.sleep(self.delay)
+        return [place for place in PLACES if place["display_name"].casefold().startswith(query)]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PersistentCache("geocode_test", max_entries=100, path=os.path.join(tmp_path, "cache.db"))
+
+
+def test_repeated_query_is_served_from_cache(cache):
+    geocoder = FakeGeocoder()
+    search = LocationSearch(geocoder, cache=cache)
+
+    first = search.search("San ")
+    second = search.search("  SAN")
+
+    assert first["source"] == "geocoder" and second["source"] == "cache"
+    assert second["results"] == first["results"]
+    assert geocoder.calls == ["san"]
+
+
+def test_extended_query_is_filtered_from_cached_prefix(cache):
+    geocoder = FakeGeocoder()
+    search = LocationSearch(geocoder, cache=cache)
+    search.search("san")
+
+    result = search.search("santa")
+
+    assert result["source"] == "prefix"
+    assert [r["display_name"] for r in result["results"]] == [
+        "Santa Cruz, California", "Santa Barbara, California", "Santa Rosa, California",
+    ]
+    assert geocoder.calls == ["san"]
+
+
+def test_too_few_prefix_matches_ask_the_geocoder(cache):
+    geocoder = FakeGeocoder()
+    search = LocationSearch(geocoder, cache=cache)
+    search.search("san")
+
+    assert search.search("santa cruz")["source"] == "geocoder"
+    assert geocoder.calls == ["san", "santa cruz"]
+
+
+def test_identical_queries_in_flight_share_one_call(cache):
+    geocoder = FakeGeocoder(delay=0.3)
+    search = LocationSearch(geocoder, cache=cache)
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda channel: search.search("san jose", channel=channel), "abcd"))
+
+    assert geocoder.calls == ["san jose"]
+    assert sorted(result["source"] for result in results) == ["coalesced"] * 3 + ["geocoder"]
+
+
+def test_superseded_request_is_stale_and_skips_the_geocoder(cache):
+    geocoder = FakeGeocoder()
+    search = LocationSearch(geocoder, cache=cache)
+
+    search.search("santa", seq=2, channel="startInput")
+    late = search.search("san", seq=1, channel="startInput")
+
+    assert late["stale"] and late["source"] == "superseded"
+    assert geocoder.calls == ["santa"]
+    assert search.stats()["superseded"] == 1
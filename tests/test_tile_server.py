@@ -0,0 +1,134 @@
+"""Checks of core/tile_server.py against a local stand-in tile upstream."""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from core.http_client import HttpClient
+from core.tile_server import TileServer
+from data.tile_store import TileStore
+
+TILE = b"\x89PNG\r\n\x1a\n" + b"tile" * 64
+
+
+@pytest.fixture
+def make_server(tmp_path, stand_in):
+    servers = []
+    http = HttpClient(host_limits={"127.0.0.1": (1000.0, 1000)}, http2=False, max_retries=0)
+
+    def make(**kwargs) -> TileServer:
+        server = TileServer(
+            store=TileStore(os.path.join(tmp_path, "tiles.mbtiles")),
+            upstream=f"{stand_in.url}/{{z}}/{{x}}/{{y}}.png",
+            http=http,
+            **kwargs,
+        )
+        server.start()
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.stop()
+    http.close()
+
+
+def fetch(server: TileServer, z: int = 3, x: int = 2, y: int = 1) -> httpx.Response:
+    return httpx.get(server.url_template.format(z=z, x=x, y=y), timeout=10)
+
+
+def test_serves_from_cache_after_first_fetch(stand_in, make_server):
+    stand_in.respond = lambda request: (200, {"ETag": '"t1"', "Content-Type": "image/png"}, TILE)
+    server = make_server()
+
+    assert fetch(server).content == TILE
+    assert fetch(server).content == TILE
+    assert stand_in.paths() == ["/3/2/1.png"]
+    assert server.counts["misses"] == 1 and server.counts["hits"] == 1
+
+
+def test_stale_tile_is_revalidated_with_its_etag(stand_in, make_server):
+    def respond(request):
+        if request.headers.get("If-None-Match") == '"t1"':
+            return 304, {"ETag": '"t1"'}, b""
+        return 200, {"ETag": '"t1"'}, TILE
+
+    stand_in.respond = respond
+    server = make_server(max_age=0)
+
+    fetch(server)
+    assert fetch(server).content == TILE
+    assert server.counts["revalidated"] == 1
+
+
+def test_stale_tile_is_served_when_upstream_fails(stand_in, make_server):
+    stand_in.respond = lambda request: (200, {}, TILE)
+    server = make_server(max_age=0)
+    fetch(server)
+
+    stand_in.respond = lambda request: (500, {}, b"down")
+    response = fetch(server)
+    assert response.status_code == 200 and response.content == TILE
+    assert server.counts["stale"] == 1
+
+
+def test_concurrent_requests_share_one_upstream_fetch(stand_in, make_server):
+    release = threading.Event()
+
+    def respond(request):
+        release.wait(5)
+        return 200, {}, TILE
+
+    stand_in.respond = respond
+    server = make_server()
+    with ThreadPoolExecutor(5) as pool:
+        futures = [pool.submit(fetch, server) for _ in range(5)]
+        time.sleep(0.3)
+        release.set()
+        responses = [future.result() for future in futures]
+
+    assert all(response.content == TILE for response in responses)
+    assert stand_in.paths() == ["/3/2/1.png"]
+
+
+def test_store_errors_fail_every_waiter(stand_in, make_server):
+    stand_in.respond = lambda request: (200, {}, TILE)
+    server = make_server()
+
+    def broken_put(*args, **kwargs):
+        time.sleep(0.2)
+        raise RuntimeError("disk full")
+
+    server.store.put = broken_put
+    with ThreadPoolExecutor(3) as pool:
+        responses = list(pool.map(lambda _: fetch(server), range(3)))
+    assert [response.status_code for response in responses] == [502, 502, 502]
+
+
+def test_prefetch_downloads_the_route_corridor(stand_in, make_server):
+    stand_in.respond = lambda request: (200, {}, TILE)
+    server = make_server()
+
+    server.prefetch_route([[-122.4, 37.7], [-122.0, 37.9]], zooms=(5, 6), radius=0)
+    deadline = time.monotonic() + 10
+    while not server.counts["prefetched"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert server.counts["prefetched"] >= 2
+    assert {path.split("/")[1] for path in stand_in.paths()} == {"5", "6"}
+
+
+def test_prefetch_is_off_for_openstreetmap_only(tmp_path):
+    store = TileStore(os.path.join(tmp_path, "tiles.mbtiles"))
+    http = HttpClient(http2=False)
+    osm = TileServer(store=store, upstream="https://tile.openstreetmap.org/{z}/{x}/{y}.png", http=http)
+    other = TileServer(store=store, upstream="https://tiles.example.com/{z}/{x}/{y}.png", http=http)
+    assert not osm.prefetch_allowed
+    assert other.prefetch_allowed
+    assert osm.prefetch_route([[0.0, 0.0], [0.1, 0.1]]).is_set()
@@ -13,9 +13,13 @@ from __future__ import annotations
 import logging
 import os
 import sys
+import time
+import tkinter
+
+# First local import, so its load time is the --profile-startup origin
+from ui.startup_profile import IMPORTS_STARTED, PROFILE_FLAG, StartupProfiler
 
 import customtkinter as ctk
-from PIL import Image, ImageTk
 
 try:
     from dotenv import load_dotenv
@@ -25,8 +29,10 @@ except ImportError:
 
 from config.settings import APP_SUPPORT_DIR, LOG_DIR
 from config.themes import get_theme, Theme
+from core.bridge_metrics import BridgeMetrics, get_bridge_metrics, instrument_api
 from data.database import init_db, get_setting, set_setting
 from ui.home_view import HomeView
+from ui.theme_bindings import ThemeBindings
 
 # --- Logging setup ---
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -39,6 +45,7 @@ logging.basicConfig(
     ],
 )
 logger = logging.getLogger(__name__)
+_IMPORTS_FINISHED = time.perf_counter()
 
 # Font path
 FONT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "fonts")
@@ -48,33 +55,43 @@ FALLBACK_FONT = "Space Mono"
 # For headers/titles: Fredericka the Great
 # For body text: Space Mono / system
 
+# App icon: source image and on-disk cache of the resized copy
+ICON_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "assets", "icon.png")
+ICON_CACHE_DIR = os.path.join(APP_SUPPORT_DIR, "cache")
+ICON_SIZE = 256
+
+# Unreferenced blob collection: small batches, spread out
+BLOB_GC_STEP_MS = 200         # Between batches while a backlog remains
+BLOB_GC_INTERVAL_MS = 5 * 60 * 1000
+
 
 class DayTrippingApp(ctk.CTk):
     """Main application window â€” home screen with theme management."""
 
-    def __init__(self) -> None:
-        super().__init__()
+    def __init__(self, profiler: StartupProfiler | None = None) -> None:
+        self.profiler = profiler or StartupProfiler(enabled=False, origin=IMPORTS_STARTED)
+
+        with self.profiler.phase("ctk_init"):
+            super().__init__()
 
         # Register as a foreground app so it appears in dock / Cmd+Tab
-        self._register_as_foreground_app()
+        with self.profiler.phase("register_foreground"):
+            self._register_as_foreground_app()
 
         # Initialize database
-        init_db()
+        with self.profiler.phase("init_db"):
+            init_db()
 
         # Track pending map requests (trip_id to open after mainloop exits)
         self._pending_map_trip: int | None = None
+        self._map_requested_at = 0.0  # perf_counter() when a trip was opened
 
         # Load saved theme preference
-        saved_theme = get_setting("theme", "psychedelic")
+        with self.profiler.phase("load_settings"):
+            saved_theme = get_setting("theme", "psychedelic")
         self.current_theme_name = saved_theme
         self.theme = get_theme(saved_theme)
 
-        # Load custom font
-        self._load_display_font()
-
-        # Set app icon (dock + window)
-        self._set_app_icon()
-
         # Window setup
         self.title("Day Tripping")
         self.geometry("1200x800")
@@ -86,9 +103,15 @@ class DayTrippingApp(ctk.CTk):
         # Configure window background
         self.configure(fg_color=self.theme.bg_primary)
 
+        # Widgets register their theme-driven colors here for hot-swapping
+        self.theme_bindings = ThemeBindings(self, self.theme)
+        self.theme_bindings.bind(self, fg_color="bg_primary")
+
         # Build UI
-        self._build_titlebar()
-        self._build_content()
+        with self.profiler.phase("build_titlebar"):
+            self._build_titlebar()
+        with self.profiler.phase("build_home_view"):
+            self._build_content()
 
         # Bring window to foreground on macOS
         self.lift()
@@ -96,6 +119,66 @@ class DayTrippingApp(ctk.CTk):
         self.after(100, lambda: self.attributes("-topmost", False))
         self.focus_force()
 
+        # Fonts, icon and off-screen cards aren't needed for the first frame
+        self.after_idle(self._after_first_paint)
+
+    def _after_first_paint(self) -> None:
+        """Run non-critical startup work once the first frame is on screen."""
+        self.profiler.mark("first_paint")
+        deferred = [
+            ("load_fonts (deferred)", self._load_display_font_and_refresh),
+            ("set_app_icon (deferred)", self._set_app_icon),
+            ("offscreen_cards (deferred)", self.home_view.build_offscreen),
+            ("tile_server (deferred)", self._start_tile_server),
+            ("blob_gc (deferred)", self._collect_blobs),
+        ]
+
+        def run_next() -> None:
+            if not deferred:
+                self.profiler.mark("startup_complete")
+                self.profiler.report()
+                return
+            name, step = deferred.pop(0)
+            with self.profiler.phase(name):
+                step()
+            self.after(1, run_next)  # Yield to the event loop between steps
+
+        self.after(1, run_next)
+
+    def _start_tile_server(self) -> None:
+        """Start the local caching tile proxy the map view loads tiles from."""
+        try:
+            from core.tile_server import configured_upstream, start_tile_server
+            start_tile_server(upstream=configured_upstream())
+        except Exception as e:
+            logger.warning("Tile server unavailable, map will use remote tiles: %s", e)
+
+    def _collect_blobs(self) -> None:
+        """Remove a few unreferenced route/snapshot blobs, then reschedule."""
+        try:
+            from data.blob_store import GC_BATCH, get_blob_store
+            removed = get_blob_store().collect()
+        except Exception as e:
+            logger.warning("Blob collection failed: %s", e)
+            return
+        # Keep going quickly through a backlog, otherwise check back later
+        self.after(BLOB_GC_STEP_MS if removed >= GC_BATCH else BLOB_GC_INTERVAL_MS, self._collect_blobs)
+
+    def _load_display_font_and_refresh(self) -> None:
+        """Register display fonts, then re-resolve fonts on existing widgets."""
+        self._load_display_font()
+
+        # Tk resolves font families when a widget's font is set, so widgets
+        # built before registration have to be told to look again.
+        pending = list(self.winfo_children())
+        while pending:
+            widget = pending.pop()
+            pending.extend(widget.winfo_children())
+            if isinstance(widget, (ctk.CTkLabel, ctk.CTkButton, ctk.CTkSegmentedButton)):
+                font = widget.cget("font")
+                if isinstance(font, tuple) and font and font[0] in (DISPLAY_FONT, FALLBACK_FONT):
+                    widget.configure(font=font)
+
     def _load_display_font(self) -> None:
         """Load the psychedelic display font if available."""
         # Load Fredericka the Great as primary, Space Mono as fallback
@@ -142,18 +225,36 @@ class DayTrippingApp(ctk.CTk):
         except Exception as e:
             logger.warning("Could not set activation policy: %s", e)
 
+    def _cached_icon_path(self, icon_path: str) -> str:
+        """Return a resized copy of the icon, cached on disk by source mtime."""
+        mtime_ns = os.stat(icon_path).st_mtime_ns
+        cached = os.path.join(ICON_CACHE_DIR, f"icon-{ICON_SIZE}-{mtime_ns}.png")
+        if os.path.exists(cached):
+            return cached
+
+        from PIL import Image
+
+        os.makedirs(ICON_CACHE_DIR, exist_ok=True)
+        for name in os.listdir(ICON_CACHE_DIR):
+            if name.startswith(f"icon-{ICON_SIZE}-"):
+                os.remove(os.path.join(ICON_CACHE_DIR, name))
+
+        img = Image.open(icon_path)
+        img = img.resize((ICON_SIZE, ICON_SIZE), Image.Resampling.LANCZOS)
+        tmp_path = cached + ".tmp"
+        img.save(tmp_path, format="PNG")
+        os.replace(tmp_path, cached)
+        return cached
+
     def _set_app_icon(self) -> None:
         """Set the app icon in the macOS dock and window title bar."""
-        icon_path = os.path.join(
-            os.path.dirname(os.path.dirname(__file__)), "assets", "icon.png"
-        )
+        icon_path = ICON_PATH
         if not os.path.exists(icon_path):
             return
 
         try:
-            img = Image.open(icon_path)
-            img = img.resize((256, 256), Image.Resampling.LANCZOS)
-            self._icon_photo = ImageTk.PhotoImage(img)
+            # Tk reads PNG natively, so a warm cache skips the PIL resize
+            self._icon_photo = tkinter.PhotoImage(master=self, file=self._cached_icon_path(icon_path))
             self.iconphoto(True, self._icon_photo)
         except Exception as e:
             logger.warning("Could not set window icon: %s", e)
@@ -182,12 +283,12 @@ class DayTrippingApp(ctk.CTk):
         bar.pack(fill="x", padx=24, pady=(16, 0))
         bar.pack_propagate(False)
 
-        ctk.CTkLabel(
+        self.theme_bindings.bind(ctk.CTkLabel(
             bar,
             text="Day Tripping",
             font=(DISPLAY_FONT, 32, "bold"),
             text_color=self.theme.action_primary,
-        ).pack(side="left")
+        ), text_color="action_primary").pack(side="left")
 
         self.theme_var = ctk.StringVar(value=self.current_theme_name.capitalize())
         theme_switch = ctk.CTkSegmentedButton(
@@ -203,30 +304,33 @@ class DayTrippingApp(ctk.CTk):
             width=220,
         )
         theme_switch.pack(side="right")
+        self.theme_bindings.bind(
+            theme_switch,
+            selected_color="ctk_selected",
+            selected_hover_color="ctk_selected_hover",
+            unselected_color="bg_secondary",
+            unselected_hover_color="bg_tertiary",
+        )
 
     def _build_content(self) -> None:
         """Build the main content area (home view)."""
-        self.home_view = HomeView(self, self.theme, self._open_trip)
+        self.home_view = HomeView(self, self.theme_bindings, self._open_trip)
         self.home_view.pack(fill="both", expand=True, padx=24, pady=(12, 24))
 
     def _on_theme_change(self, new_theme: str) -> None:
-        """Handle theme toggle."""
+        """Handle theme toggle by recoloring the existing widgets in place."""
         theme_name = new_theme.lower()
         self.current_theme_name = theme_name
         self.theme = get_theme(theme_name)
 
         set_setting("theme", theme_name)
         self._set_theme_mode()
-        self.configure(fg_color=self.theme.bg_primary)
-
-        for widget in self.winfo_children():
-            widget.destroy()
-        self._build_titlebar()
-        self._build_content()
+        self.theme_bindings.apply(self.theme)
 
     def _open_trip(self, trip_id: int) -> None:
         """Request opening a trip â€” exits CTk mainloop so main() can launch webview."""
         self._pending_map_trip = trip_id
+        self._map_requested_at = time.perf_counter()
         self.withdraw()
         self.quit()  # Exit mainloop; main() loop will handle the webview
 
@@ -237,9 +341,35 @@ class DayTrippingApp(ctk.CTk):
         self.home_view.refresh()
 
 
+MAP_API_CLASS = "MapApi"  # pywebview js_api class in ui/map_view.py
+
+
+def _load_map_view(metrics: BridgeMetrics):
+    """ui.map_view with its bridge API class instrumented (done once).
+
+    Instrumentation is best effort: if the API class is not where it is
+    expected, the map opens without bridge metrics.
+    """
+    from ui import map_view
+    api_cls = getattr(map_view, MAP_API_CLASS, None)
+    if api_cls is None:
+        logger.warning("ui.map_view has no %s; bridge metrics disabled", MAP_API_CLASS)
+    elif getattr(api_cls, "bridge_metrics", None) is not metrics:
+        try:
+            setattr(map_view, MAP_API_CLASS, instrument_api(api_cls, metrics))
+        except Exception as e:
+            logger.warning("Could not instrument %s: %s", MAP_API_CLASS, e)
+    return map_view
+
+
 def main() -> None:
     """Launch Day Tripping with CTk â†” webview main-thread switching."""
-    app = DayTrippingApp()
+    profiler = StartupProfiler(
+        enabled=PROFILE_FLAG in sys.argv[1:], origin=IMPORTS_STARTED
+    )
+    profiler.record("imports", IMPORTS_STARTED, _IMPORTS_FINISHED)
+    app = DayTrippingApp(profiler)
+    bridge_metrics = get_bridge_metrics()
 
     while True:
         app.mainloop()
@@ -253,15 +383,30 @@ def main() -> None:
         app._pending_map_trip = None
 
         # Open map view on the main thread (required by macOS cocoa)
+        map_started = time.perf_counter()
         try:
-            from ui.map_view import open_map_view
-            open_map_view(trip_id, app.theme)
+            map_view = _load_map_view(bridge_metrics)
+            # Ends when the page reports initMap() done (map_ready())
+            bridge_metrics.begin_handoff(app._map_requested_at)
+            map_view.open_map_view(trip_id, app.theme)
         except Exception as e:
             logger.error("Failed to open map view: %s", e)
+        handoff_ms = bridge_metrics.handoff_ms
+        logger.info(
+            "Map view for trip %d: handoff %s, session %.1f s",
+            trip_id, "n/a" if handoff_ms is None else f"{handoff_ms:.1f} ms",
+            time.perf_counter() - map_started,
+        )
 
         # Map view closed â€” re-show home
+        returned = time.perf_counter()
         app.show_and_refresh()
+        bridge_metrics.record("webview_to_ctk_handoff", (time.perf_counter() - returned) * 1000)
 
+    from core.tile_server import get_tile_server
+    tile_server = get_tile_server()
+    if tile_server is not None:
+        tile_server.stop()
     app.destroy()
 
 
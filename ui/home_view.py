@@ -8,7 +8,6 @@ accent bar. Clicking a card opens the trip in the map view.
 from __future__ import annotations
 
 import logging
-from datetime import datetime
 from typing import Callable
 
 import customtkinter as ctk
@@ -18,13 +17,17 @@ from core.trip_manager import (
     create_trip,
     delete_trip,
     duplicate_trip,
-    get_all_trips,
     rename_trip,
 )
+from data.blob_store import get_blob_store
+from data.trip_index import PAGE_SIZE, get_trip_index
+from ui.theme_bindings import ThemeBindings
+from ui.trip_grid import OVERSCAN_ROWS, CardPreviews, TripCard, VirtualTripGrid
 
 logger = logging.getLogger(__name__)
 
 DISPLAY_FONT = "Fredericka the Great"
+SEARCH_DEBOUNCE_MS = 150
 
 
 class HomeView(ctk.CTkFrame):
@@ -33,14 +36,26 @@ class HomeView(ctk.CTkFrame):
     def __init__(
         self,
         parent: ctk.CTk,
-        theme: Theme,
+        bindings: ThemeBindings,
         on_open_trip: Callable[[int], None],
     ) -> None:
         super().__init__(parent, fg_color="transparent")
-        self.theme = theme
+        self.bindings = bindings
         self.on_open_trip = on_open_trip
+        self._empty_frame: ctk.CTkFrame | None = None
+        self._empty_for_query = False         # Which message the empty state shows
+        self._trip_index = get_trip_index()
+        self._cursor: tuple | None = None     # Next page of the unfiltered listing
+        self._query = ""
+        self._search_pending: str | None = None
+        self._previews = CardPreviews(self, bindings)
         self._build()
 
+    @property
+    def theme(self) -> Theme:
+        """The active theme (follows in-place theme switches)."""
+        return self.bindings.theme
+
     def _build(self) -> None:
         """Build the home screen layout."""
         # Header row with subtitle and new trip button
@@ -48,12 +63,12 @@ class HomeView(ctk.CTkFrame):
         header.pack(fill="x", pady=(8, 16))
         header.pack_propagate(False)
 
-        ctk.CTkLabel(
+        self.bindings.bind(ctk.CTkLabel(
             header,
             text="Your Adventures",
             font=("Space Mono", 18),
             text_color=self.theme.text_secondary,
-        ).pack(side="left")
+        ), text_color="text_secondary").pack(side="left")
 
         new_btn = ctk.CTkButton(
             header,
@@ -68,6 +83,32 @@ class HomeView(ctk.CTkFrame):
             command=self._create_new_trip,
         )
         new_btn.pack(side="right")
+        self.bindings.bind(
+            new_btn,
+            fg_color="interactive",
+            hover_color="interactive_hover",
+            text_color=lambda t: t.text_on_accent if t.name == "light" else "#ffffff",
+        )
+
+        self.search_entry = ctk.CTkEntry(
+            header,
+            placeholder_text="Search trips...",
+            font=("Space Mono", 14),
+            fg_color=self.theme.bg_secondary,
+            border_color=self.theme.bg_tertiary,
+            text_color=self.theme.text_primary,
+            corner_radius=0,  # Brutalist sharp edges
+            height=44,
+            width=260,
+        )
+        self.search_entry.pack(side="right", padx=(0, 12))
+        self.search_entry.bind("<KeyRelease>", self._on_search_key)
+        self.bindings.bind(
+            self.search_entry,
+            fg_color="bg_secondary",
+            border_color="bg_tertiary",
+            text_color="text_primary",
+        )
 
         # Scrollable trip grid
         self.grid_frame = ctk.CTkScrollableFrame(
@@ -77,179 +118,126 @@ class HomeView(ctk.CTkFrame):
             scrollbar_button_hover_color=self.theme.interactive,
         )
         self.grid_frame.pack(fill="both", expand=True)
+        self.bindings.bind(
+            self.grid_frame,
+            scrollbar_button_color="bg_tertiary",
+            scrollbar_button_hover_color="interactive",
+        )
 
-        # Configure grid columns
-        self.grid_frame.columnconfigure(0, weight=1)
-        self.grid_frame.columnconfigure(1, weight=1)
-        self.grid_frame.columnconfigure(2, weight=1)
+        # Only visible cards are built; the grid pools and recycles them.
+        # Off-screen overscan rows wait until build_offscreen() after first paint.
+        self.trip_grid = VirtualTripGrid(
+            self.grid_frame,
+            self._create_trip_card,
+            overscan_rows=0,
+            on_near_end=self._load_next_page,
+        )
 
         self._populate_trips()
 
     def _populate_trips(self) -> None:
-        """Load and display all trips as cards."""
-        # Clear existing cards
-        for widget in self.grid_frame.winfo_children():
-            widget.destroy()
-
-        trips = get_all_trips()
+        """Load the first page (or the search hits) into the virtualized grid.
+
+        A refresh reloads as many trips as are already shown, so the
+        scroll position survives; later pages load as the user scrolls.
+        """
+        if self._query:
+            trips = self._trip_index.search(self._query)
+            self._cursor = None
+        else:
+            page = self._trip_index.page(limit=max(PAGE_SIZE, len(self.trip_grid.trips)))
+            trips, self._cursor = page.trips, page.cursor
 
         if not trips:
+            self.trip_grid.clear()
             self._show_empty_state()
             return
 
-        for idx, trip in enumerate(trips):
-            row = idx // 3
-            col = idx % 3
-            card = self._create_trip_card(trip)
-            card.grid(row=row, column=col, padx=8, pady=8, sticky="nsew")
+        self._hide_empty_state()
+        inserted, updated, removed = self.trip_grid.set_trips(trips)
+        logger.debug(
+            "Trip grid reconciled: +%d ~%d -%d", inserted, updated, removed
+        )
+
+    def _load_next_page(self) -> None:
+        """Append the next page of the listing when the grid nears its end."""
+        if self._cursor is None or self._query:
+            return
+        page = self._trip_index.page(cursor=self._cursor)
+        self._cursor = page.cursor
+        self.trip_grid.append_trips(page.trips)
+
+    def _on_search_key(self, _event=None) -> None:
+        """Debounce typing; the query runs once the user pauses."""
+        if self._search_pending is not None:
+            self.after_cancel(self._search_pending)
+        self._search_pending = self.after(SEARCH_DEBOUNCE_MS, self._run_search)
+
+    def _run_search(self) -> None:
+        self._search_pending = None
+        query = self.search_entry.get().strip()
+        if query != self._query:
+            self._query = query
+            self.grid_frame._parent_canvas.yview_moveto(0)
+            self._populate_trips()
+
+    def build_offscreen(self) -> None:
+        """Build the overscan rows around the viewport (deferred at startup)."""
+        self.trip_grid.set_overscan(OVERSCAN_ROWS)
 
     def _show_empty_state(self) -> None:
-        """Show a message when no trips exist."""
+        """Show a message when no trips exist (or none match the search)."""
+        if self._empty_frame is not None:
+            if self._empty_for_query == bool(self._query):
+                return
+            self._hide_empty_state()  # Swap the message for the other one
+
         empty_frame = ctk.CTkFrame(
             self.grid_frame,
             fg_color=self.theme.bg_secondary,
             corner_radius=0,  # Brutalist sharp edges
         )
         empty_frame.grid(row=0, column=0, columnspan=3, padx=20, pady=60, sticky="nsew")
+        self.bindings.bind(empty_frame, fg_color="bg_secondary")
 
-        ctk.CTkLabel(
+        self.bindings.bind(ctk.CTkLabel(
             empty_frame,
-            text="No trips yet",
+            text="No matching trips" if self._query else "No trips yet",
             font=(DISPLAY_FONT, 24),
             text_color=self.theme.text_primary,
-        ).pack(pady=(40, 8))
+        ), text_color="text_primary").pack(pady=(40, 8))
 
-        ctk.CTkLabel(
+        self.bindings.bind(ctk.CTkLabel(
             empty_frame,
-            text="Click \"ï¼‹ New Adventure\" to plan your first road trip!",
+            text=(
+                "Try a trip name or a start or end place."
+                if self._query
+                else "Click \"ï¼‹ New Adventure\" to plan your first road trip!"
+            ),
             font=("Space Mono", 14),
             text_color=self.theme.text_secondary,
-        ).pack(pady=(0, 40))
+        ), text_color="text_secondary").pack(pady=(0, 40))
 
-    def _create_trip_card(self, trip: dict) -> ctk.CTkFrame:
-        """Create a single trip card widget."""
-        card = ctk.CTkFrame(
-            self.grid_frame,
-            fg_color=self.theme.bg_secondary,
-            corner_radius=0,  # Brutalist sharp edges
-            border_width=2,
-            border_color=self.theme.border,
-            cursor="hand2",
-        )
+        self._empty_frame = empty_frame
+        self._empty_for_query = bool(self._query)
 
-        # Accent bar at top
-        accent = ctk.CTkFrame(
-            card,
-            fg_color=self.theme.action_primary,
-            height=4,
-            corner_radius=2,
-        )
-        accent.pack(fill="x", padx=12, pady=(12, 0))
+    def _hide_empty_state(self) -> None:
+        """Remove the empty-state message once trips exist."""
+        if self._empty_frame is not None:
+            self._empty_frame.destroy()
+            self._empty_frame = None
 
-        # Trip name
-        ctk.CTkLabel(
-            card,
-            text=trip["name"],
-            font=(DISPLAY_FONT, 18),
-            text_color=self.theme.text_primary,
-            anchor="w",
-        ).pack(fill="x", padx=16, pady=(12, 4))
-
-        # Route summary
-        start = trip.get("start_location") or "Not set"
-        end = trip.get("end_location") or "Not set"
-        route_text = f"{start}  â†’  {end}" if start != "Not set" or end != "Not set" else "Tap to start planning"
-
-        ctk.CTkLabel(
-            card,
-            text=route_text,
-            font=("Space Mono", 12),
-            text_color=self.theme.text_secondary,
-            anchor="w",
-            wraplength=250,
-        ).pack(fill="x", padx=16, pady=(0, 4))
-
-        # Date
-        created = trip.get("created_at", "")
-        if created:
-            try:
-                dt = datetime.fromisoformat(created)
-                date_str = dt.strftime("%b %d, %Y")
-            except ValueError:
-                date_str = created
-        else:
-            date_str = ""
-
-        ctk.CTkLabel(
-            card,
-            text=date_str,
-            font=("Space Mono", 11),
-            text_color=self.theme.text_tertiary,
-            anchor="w",
-        ).pack(fill="x", padx=16, pady=(0, 8))
-
-        # Action buttons row
-        btn_frame = ctk.CTkFrame(card, fg_color="transparent")
-        btn_frame.pack(fill="x", padx=12, pady=(0, 12))
-
-        trip_id = trip["id"]
-
-        ctk.CTkButton(
-            btn_frame,
-            text="Open",
-            font=("Space Mono", 11, "bold"),
-            fg_color=self.theme.interactive,
-            hover_color=self.theme.interactive_hover,
-            text_color="#080010",
-            corner_radius=0,
-            height=28,
-            width=60,
-            command=lambda tid=trip_id: self.on_open_trip(tid),
-        ).pack(side="left", padx=(0, 4))
-
-        ctk.CTkButton(
-            btn_frame,
-            text="Rename",
-            font=("Space Mono", 11),
-            fg_color=self.theme.bg_tertiary,
-            hover_color=self.theme.border,
-            text_color=self.theme.text_secondary,
-            corner_radius=0,
-            height=28,
-            width=60,
-            command=lambda tid=trip_id: self._rename_trip(tid),
-        ).pack(side="left", padx=(0, 4))
-
-        ctk.CTkButton(
-            btn_frame,
-            text="Duplicate",
-            font=("Space Mono", 11),
-            fg_color=self.theme.bg_tertiary,
-            hover_color=self.theme.border,
-            text_color=self.theme.text_secondary,
-            corner_radius=0,
-            height=28,
-            width=68,
-            command=lambda tid=trip_id: self._duplicate_trip(tid),
-        ).pack(side="left", padx=(0, 4))
-
-        ctk.CTkButton(
-            btn_frame,
-            text="Delete",
-            font=("Space Mono", 11, "bold"),
-            fg_color=self.theme.warning,
-            hover_color=self.theme.warning_hover,
-            text_color="#080010",
-            corner_radius=0,
-            height=28,
-            width=56,
-            command=lambda tid=trip_id: self._delete_trip(tid),
-        ).pack(side="right")
-
-        # Click card to open trip
-        card.bind("<Button-1>", lambda e, tid=trip_id: self.on_open_trip(tid))
-
-        return card
+    def _create_trip_card(self) -> TripCard:
+        """Create a blank, reusable trip card for the grid's pool."""
+        return TripCard(
+            self.grid_frame,
+            self.bindings,
+            on_open=self.on_open_trip,
+            on_rename=self._rename_trip,
+            on_duplicate=self._duplicate_trip,
+            on_delete=self._delete_trip,
+            previews=self._previews,
+        )
 
     def _create_new_trip(self) -> None:
         """Show dialog to create a new trip."""
@@ -261,7 +249,17 @@ class HomeView(ctk.CTkFrame):
         if name and name.strip():
             trip_id = create_trip(name.strip())
             logger.info("Created trip: %s (id=%d)", name.strip(), trip_id)
-            self.refresh()
+            if self._query:
+                # Results are ranked matches; show the new trip only if it matches
+                self._populate_trips()
+                return
+            # Insert just the new card, as stored; the next refresh() reconciles the rest
+            trip = self._trip_index.get(trip_id)
+            if trip is None:
+                self._populate_trips()
+                return
+            self._hide_empty_state()
+            self.trip_grid.insert_trip(0, trip)
 
     def _rename_trip(self, trip_id: int) -> None:
         """Show dialog to rename a trip."""
@@ -272,13 +270,22 @@ class HomeView(ctk.CTkFrame):
         new_name = dialog.get_input()
         if new_name and new_name.strip():
             rename_trip(trip_id, new_name.strip())
-            self.refresh()
+            if self._query:
+                # The new name may no longer match, or may rank differently
+                self._populate_trips()
+                return
+            self.trip_grid.update_trip(trip_id, name=new_name.strip())
 
     def _duplicate_trip(self, trip_id: int) -> None:
         """Duplicate a trip."""
         new_id = duplicate_trip(trip_id)
         if new_id:
+            # Route geometry and snapshots are shared blobs: the copy takes
+            # references to them instead of copying the payloads.
+            get_blob_store().copy_trip(trip_id, new_id)
             logger.info("Duplicated trip %d â†’ %d", trip_id, new_id)
+            # The copy's stored fields come from the trip manager, so diff
+            # a fresh listing; only the new card gets built.
             self.refresh()
 
     def _delete_trip(self, trip_id: int) -> None:
@@ -291,8 +298,16 @@ class HomeView(ctk.CTkFrame):
         if result and result.strip().lower() == "delete":
             delete_trip(trip_id)
             logger.info("Deleted trip %d", trip_id)
-            self.refresh()
+            self.trip_grid.remove_trip(trip_id)
+            if not self.trip_grid.trips:
+                self._show_empty_state()
 
     def refresh(self) -> None:
-        """Refresh the trip list."""
+        """Re-query trips and apply only the differences to the grid."""
         self._populate_trips()
+        # Routes may have been edited in the map view; only changed digests re-render
+        self._previews.invalidate()
+
+    def destroy(self) -> None:
+        self._previews.close()
+        super().destroy()
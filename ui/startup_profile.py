@@ -0,0 +1,73 @@
+"""
+ui/startup_profile.py — Per-phase startup timing for `--profile-startup`.
+
+Usage:
+    profiler = StartupProfiler(enabled=True, origin=IMPORTS_STARTED)
+    with profiler.phase("init_db"):
+        init_db()
+    profiler.mark("first_paint")
+    profiler.report()
+
+When disabled, phase() and mark() are no-ops so the calls can stay in
+the startup path permanently.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FLAG = "--profile-startup"
+IMPORTS_STARTED = time.perf_counter()  # ui/app.py imports this module before anything heavy
+
+
+class StartupProfiler:
+    """Collects named phase durations and milestones since process start."""
+
+    def __init__(self, enabled: bool, origin: float) -> None:
+        self.enabled = enabled
+        self.origin = origin
+        self.phases: list[tuple[str, float, float]] = []  # (name, start, duration)
+        self.marks: list[tuple[str, float]] = []          # (name, offset)
+        if enabled:
+            # Root logging is WARNING; let the report through its handlers
+            logger.setLevel(logging.INFO)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block of startup work."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, start - self.origin, time.perf_counter() - start))
+
+    def record(self, name: str, start: float, end: float) -> None:
+        """Record a phase measured outside a with-block (absolute perf_counter times)."""
+        if self.enabled:
+            self.phases.append((name, start - self.origin, end - start))
+
+    def mark(self, name: str) -> None:
+        """Record a milestone (e.g. first paint) relative to process start."""
+        if self.enabled:
+            self.marks.append((name, time.perf_counter() - self.origin))
+
+    def report(self) -> str:
+        """Log and return a per-phase breakdown table."""
+        if not self.enabled:
+            return ""
+        lines = ["Startup profile (ms):", f"  {'phase':<28}{'start':>10}{'took':>10}"]
+        for name, start, duration in self.phases:
+            lines.append(f"  {name:<28}{start * 1000:>10.1f}{duration * 1000:>10.1f}")
+        for name, offset in self.marks:
+            lines.append(f"  @ {name:<26}{offset * 1000:>10.1f}")
+        text = "\n".join(lines)
+        logger.info(text)
+        return text
@@ -0,0 +1,86 @@
+"""
+ui/theme_bindings.py — In-place theme hot-swap for customtkinter widgets.
+
+Widgets register which Theme fields drive which of their options. A theme
+change then walks the registry and reconfigures colors in place, batched
+into a single idle callback, instead of destroying and rebuilding the
+widget tree.
+
+Usage:
+    bindings = ThemeBindings(root, theme)
+    label = bindings.bind(ctk.CTkLabel(...), text_color="text_primary")
+    bindings.apply(get_theme("light"))
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import fields
+from typing import Callable, TypeVar, Union
+
+import customtkinter as ctk
+
+from config.themes import Theme
+
+logger = logging.getLogger(__name__)
+
+# A binding source is either a Theme field name or a function of the Theme
+ThemeSource = Union[str, Callable[[Theme], str]]
+W = TypeVar("W")
+
+THEME_FIELDS = frozenset(f.name for f in fields(Theme))
+
+
+class ThemeBindings:
+    """Registry of widget options that follow the active Theme."""
+
+    def __init__(self, root: ctk.CTk, theme: Theme) -> None:
+        self._root = root
+        self._theme = theme
+        self._bindings: list[tuple[object, dict[str, ThemeSource]]] = []
+        self._pending: str | None = None
+
+    @property
+    def theme(self) -> Theme:
+        """The theme most recently applied (or pending application)."""
+        return self._theme
+
+    def bind(self, widget: W, **options: ThemeSource) -> W:
+        """Register theme-driven options for a widget and return the widget.
+
+        Each keyword is a widget option (e.g. ``fg_color``); each value is a
+        Theme field name or a callable taking the Theme.
+        """
+        for option, source in options.items():
+            if isinstance(source, str) and source not in THEME_FIELDS:
+                raise ValueError(f"Unknown theme field for {option!r}: {source!r}")
+        self._bindings.append((widget, options))
+        return widget
+
+    def apply(self, theme: Theme) -> None:
+        """Switch to a new theme; widgets are reconfigured on the next idle."""
+        self._theme = theme
+        if self._pending is None:
+            self._pending = self._root.after_idle(self._flush)
+
+    def _flush(self) -> None:
+        """Reconfigure every live bound widget, pruning destroyed ones."""
+        self._pending = None
+        theme = self._theme
+        live: list[tuple[object, dict[str, ThemeSource]]] = []
+
+        for widget, options in self._bindings:
+            try:
+                if not widget.winfo_exists():
+                    continue
+                widget.configure(**{
+                    option: source(theme) if callable(source) else getattr(theme, source)
+                    for option, source in options.items()
+                })
+            except Exception as e:
+                logger.warning("Could not re-theme %s: %s", widget, e)
+                continue
+            live.append((widget, options))
+
+        self._bindings = live
+        logger.info("Applied theme %s to %d widgets", theme.name, len(live))
@@ -0,0 +1,585 @@
+"""
+ui/trip_grid.py — Virtualized trip-card grid for the home screen.
+
+Only the rows visible in the CTkScrollableFrame (plus a small overscan)
+get real card widgets. Cards are pooled and rebound to a different trip
+as the user scrolls, so build time and memory stay flat no matter how
+many trips are saved. Updates are reconciled by trip id, so a create,
+rename, or delete touches one card and reflows the rest. Trips arrive a
+page at a time: on_near_end asks the owner for more as the window nears
+the last loaded row.
+
+Each card shows a mini-map of its route (core/route_previews.py). Cards
+appear with a flat placeholder; CardPreviews renders off the Tk thread
+and swaps the image in from a polled queue once it is ready.
+
+Layout: a top spacer, the visible card rows, and a bottom spacer are
+gridded into the scrollable frame. Cards sit at their absolute row
+(empty grid rows collapse to zero height), so a card that stays in view
+never has to be re-gridded.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable
+
+import customtkinter as ctk
+from PIL import Image
+
+from config.themes import Theme
+from ui.theme_bindings import ThemeBindings
+
+logger = logging.getLogger(__name__)
+
+DISPLAY_FONT = "Fredericka the Great"
+
+# Grid geometry (logical pixels, before CTk widget scaling)
+COLUMNS = 3
+PREVIEW_SIZE = (280, 72)   # Matches core.route_previews.PREVIEW_CSS_SIZE
+CARD_HEIGHT = 180 + PREVIEW_SIZE[1] + 8
+CARD_PAD = 8
+ROW_HEIGHT = CARD_HEIGHT + 2 * CARD_PAD
+OVERSCAN_ROWS = 1          # Extra rows built above and below the viewport
+DEFAULT_VIEWPORT_ROWS = 4  # Used before the canvas has been laid out
+LOAD_MORE_ROWS = 2         # Ask for the next page this close to the end
+
+# Route previews
+PREVIEW_MEMORY = 48        # Decoded previews kept for cards scrolling back
+PREVIEW_POLL_MS = 50       # How often finished previews are collected
+PREVIEW_WORKERS = 2
+_UNKNOWN = object()        # Route digest of a preview not drawn yet
+
+
+@lru_cache(maxsize=4096)
+def format_trip_date(created: str) -> str:
+    """Format a trip's ISO created_at for display (cached per string)."""
+    if not created:
+        return ""
+    try:
+        return datetime.fromisoformat(created).strftime("%b %d, %Y")
+    except ValueError:
+        return created
+
+
+def format_route_text(trip: dict) -> str:
+    """Return the 'start → end' summary line for a trip card."""
+    start = trip.get("start_location") or "Not set"
+    end = trip.get("end_location") or "Not set"
+    if start == "Not set" and end == "Not set":
+        return "Tap to start planning"
+    return f"{start}  →  {end}"
+
+
+class CardPreviews:
+    """Route previews for trip cards, rendered off the Tk thread.
+
+    Workers render (or find cached) PNGs and decode them; the Tk side
+    polls a queue while work is pending and hands the images to the cards
+    still bound to those trips. Decoded images are kept per (trip, theme),
+    with the route digest they were drawn from, so cards recycled by
+    scrolling get theirs back at once and a refresh only reloads trips
+    whose route changed.
+    """
+
+    def __init__(self, root: ctk.CTkBaseClass, bindings: ThemeBindings) -> None:
+        self._root = root
+        self._bindings = bindings
+        self._cards: list[TripCard] = []
+        # (trip, theme) -> (route digest, image or None without a route)
+        self._images: OrderedDict[tuple[int, str], tuple[str | None, ctk.CTkImage | None]] = OrderedDict()
+        self._placeholders: dict[str, ctk.CTkImage] = {}
+        self._pending: set[tuple[int, str]] = set()
+        self._ready: queue.SimpleQueue = queue.SimpleQueue()
+        self._poll: str | None = None
+        self._workers = ThreadPoolExecutor(PREVIEW_WORKERS, thread_name_prefix="card-preview")
+        self._closed = False
+
+    def register(self, card: TripCard) -> None:
+        self._cards.append(card)
+
+    def image_for(self, trip_id: int | None, theme: Theme) -> ctk.CTkImage:
+        """The trip's preview if decoded, else the placeholder (requesting it)."""
+        key = (trip_id, theme.name)
+        if trip_id is not None:
+            if key in self._images:
+                self._images.move_to_end(key)
+                _digest, image = self._images[key]
+                if image is not None:
+                    return image
+            else:
+                self._request(trip_id, theme)
+        return self.placeholder(theme)
+
+    def placeholder(self, theme: Theme) -> ctk.CTkImage:
+        image = self._placeholders.get(theme.name)
+        if image is None:
+            flat = Image.new("RGB", PREVIEW_SIZE, theme.bg_tertiary)
+            image = self._placeholders[theme.name] = ctk.CTkImage(flat, flat, size=PREVIEW_SIZE)
+        return image
+
+    def invalidate(self) -> None:
+        """Reload previews of trips whose route changed since they were drawn.
+
+        Workers compare each trip's route digest with the one its decoded
+        preview came from, so unchanged trips cost one lookup. Cards keep
+        showing their current image until the new one arrives.
+        """
+        theme = self._bindings.theme
+        drawn = {trip_id: digest for (trip_id, _theme), (digest, _image) in self._images.items()}
+        for card in self._cards:
+            if card.trip_id is not None:
+                drawn.setdefault(card.trip_id, _UNKNOWN)
+        for trip_id, digest in drawn.items():
+            self._request(trip_id, theme, digest)
+
+    def close(self) -> None:
+        """Stop polling and drop queued renders (the home view is going away)."""
+        self._closed = True
+        if self._poll is not None:
+            self._root.after_cancel(self._poll)
+            self._poll = None
+        self._workers.shutdown(wait=False, cancel_futures=True)
+
+    # --- Internals ---
+
+    def _request(self, trip_id: int, theme: Theme, drawn_from: object = _UNKNOWN) -> None:
+        key = (trip_id, theme.name)
+        if self._closed or key in self._pending:
+            return
+        self._pending.add(key)
+        self._workers.submit(self._render, trip_id, theme, drawn_from)
+        if self._poll is None:
+            self._poll = self._root.after(PREVIEW_POLL_MS, self._drain)
+
+    def _render(self, trip_id: int, theme: Theme, drawn_from: object) -> None:
+        """Worker thread: render or find the PNG and decode it.
+
+        Skipped (reported unchanged) when the route digest still equals
+        drawn_from, the digest of the preview already shown.
+        """
+        digest = image = None
+        try:
+            from core.route_previews import get_route_previews
+            previews = get_route_previews()
+            digest = previews.route_digest(trip_id)
+            if digest == drawn_from:
+                self._ready.put((trip_id, theme.name, digest, None, False))
+                return
+            path = previews.preview(trip_id, theme)
+            if path is not None:
+                with Image.open(path) as png:
+                    image = png.convert("RGB")
+        except Exception as e:
+            logger.warning("No preview for trip %s: %s", trip_id, e)
+        self._ready.put((trip_id, theme.name, digest, image, True))
+
+    def _drain(self) -> None:
+        """Tk thread: swap finished previews into the cards showing those trips."""
+        self._poll = None
+        theme = self._bindings.theme
+        while True:
+            try:
+                trip_id, theme_name, digest, image, changed = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            key = (trip_id, theme_name)
+            self._pending.discard(key)
+            if not changed:
+                continue
+            # A new route also makes the trip's previews in other themes stale
+            for stale in [k for k, (drawn, _image) in self._images.items() if k[0] == trip_id and drawn != digest]:
+                del self._images[stale]
+            preview = ctk.CTkImage(image, image, size=PREVIEW_SIZE) if image is not None else None
+            self._images[key] = (digest, preview)
+            while len(self._images) > PREVIEW_MEMORY:
+                self._images.popitem(last=False)
+            if preview is None or theme_name != theme.name:
+                continue
+            for card in self._cards:
+                if card.trip_id == trip_id:
+                    card.set_preview(preview)
+        if self._pending:
+            self._poll = self._root.after(PREVIEW_POLL_MS, self._drain)
+
+
+class TripCard(ctk.CTkFrame):
+    """A reusable trip card. Built once, then rebound via show_trip()."""
+
+    def __init__(
+        self,
+        parent: ctk.CTkScrollableFrame,
+        bindings: ThemeBindings,
+        on_open: Callable[[int], None],
+        on_rename: Callable[[int], None],
+        on_duplicate: Callable[[int], None],
+        on_delete: Callable[[int], None],
+        previews: CardPreviews | None = None,
+    ) -> None:
+        theme = bindings.theme
+        super().__init__(
+            parent,
+            fg_color=theme.bg_secondary,
+            corner_radius=0,  # Brutalist sharp edges
+            border_width=2,
+            border_color=theme.border,
+            height=CARD_HEIGHT,
+            cursor="hand2",
+        )
+        # Fixed height keeps every grid row the same size for virtualization
+        self.pack_propagate(False)
+        bindings.bind(self, fg_color="bg_secondary", border_color="border")
+
+        self.trip_id: int | None = None
+        self._trip: dict | None = None
+        self._previews = previews
+        self._bindings = bindings
+
+        # Accent bar at top
+        bindings.bind(ctk.CTkFrame(
+            self,
+            fg_color=theme.action_primary,
+            height=4,
+            corner_radius=2,
+        ), fg_color="action_primary").pack(fill="x", padx=12, pady=(12, 0))
+
+        # Route mini-map: a placeholder until the rendered preview arrives
+        self._preview_label: ctk.CTkLabel | None = None
+        if previews is not None:
+            previews.register(self)
+            self._preview_label = ctk.CTkLabel(
+                self, text="", image=previews.placeholder(theme), height=PREVIEW_SIZE[1]
+            )
+            self._preview_label.pack(fill="x", padx=12, pady=(8, 0))
+            self._preview_label.bind("<Button-1>", lambda e: self._fire(on_open))
+            bindings.bind(
+                self._preview_label,
+                image=lambda theme: previews.image_for(self.trip_id, theme),
+            )
+
+        # Trip name
+        self._name_label = ctk.CTkLabel(
+            self,
+            text="",
+            font=(DISPLAY_FONT, 18),
+            text_color=theme.text_primary,
+            anchor="w",
+        )
+        self._name_label.pack(fill="x", padx=16, pady=(12, 4))
+        bindings.bind(self._name_label, text_color="text_primary")
+
+        # Route summary
+        self._route_label = ctk.CTkLabel(
+            self,
+            text="",
+            font=("Space Mono", 12),
+            text_color=theme.text_secondary,
+            anchor="w",
+            wraplength=250,
+        )
+        self._route_label.pack(fill="x", padx=16, pady=(0, 4))
+        bindings.bind(self._route_label, text_color="text_secondary")
+
+        # Date
+        self._date_label = ctk.CTkLabel(
+            self,
+            text="",
+            font=("Space Mono", 11),
+            text_color=theme.text_tertiary,
+            anchor="w",
+        )
+        self._date_label.pack(fill="x", padx=16, pady=(0, 8))
+        bindings.bind(self._date_label, text_color="text_tertiary")
+
+        # Action buttons row (anchored to the bottom of the fixed-height card)
+        btn_frame = ctk.CTkFrame(self, fg_color="transparent")
+        btn_frame.pack(side="bottom", fill="x", padx=12, pady=(0, 12))
+
+        open_btn = ctk.CTkButton(
+            btn_frame,
+            text="Open",
+            font=("Space Mono", 11, "bold"),
+            fg_color=theme.interactive,
+            hover_color=theme.interactive_hover,
+            text_color="#080010",
+            corner_radius=0,
+            height=28,
+            width=60,
+            command=lambda: self._fire(on_open),
+        )
+        open_btn.pack(side="left", padx=(0, 4))
+        bindings.bind(open_btn, fg_color="interactive", hover_color="interactive_hover")
+
+        for text, width, callback in (
+            ("Rename", 60, on_rename),
+            ("Duplicate", 68, on_duplicate),
+        ):
+            btn = ctk.CTkButton(
+                btn_frame,
+                text=text,
+                font=("Space Mono", 11),
+                fg_color=theme.bg_tertiary,
+                hover_color=theme.border,
+                text_color=theme.text_secondary,
+                corner_radius=0,
+                height=28,
+                width=width,
+                command=lambda cb=callback: self._fire(cb),
+            )
+            btn.pack(side="left", padx=(0, 4))
+            bindings.bind(
+                btn,
+                fg_color="bg_tertiary",
+                hover_color="border",
+                text_color="text_secondary",
+            )
+
+        delete_btn = ctk.CTkButton(
+            btn_frame,
+            text="Delete",
+            font=("Space Mono", 11, "bold"),
+            fg_color=theme.warning,
+            hover_color=theme.warning_hover,
+            text_color="#080010",
+            corner_radius=0,
+            height=28,
+            width=56,
+            command=lambda: self._fire(on_delete),
+        )
+        delete_btn.pack(side="right")
+        bindings.bind(delete_btn, fg_color="warning", hover_color="warning_hover")
+
+        # Click card to open trip
+        self.bind("<Button-1>", lambda e: self._fire(on_open))
+
+    def _fire(self, callback: Callable[[int], None]) -> None:
+        """Invoke an action callback with the trip currently bound to this card."""
+        if self.trip_id is not None:
+            callback(self.trip_id)
+
+    def set_preview(self, image: ctk.CTkImage) -> None:
+        if self._preview_label is not None:
+            self._preview_label.configure(image=image)
+
+    def show_trip(self, trip: dict) -> None:
+        """Rebind this card to a trip, touching only labels whose text changed."""
+        if trip is self._trip:
+            return
+        old = self._trip or {}
+        self._trip = trip
+        self.trip_id = trip["id"]
+
+        if self._previews is not None and trip["id"] != old.get("id"):
+            self.set_preview(self._previews.image_for(trip["id"], self._bindings.theme))
+
+        if trip["name"] != old.get("name"):
+            self._name_label.configure(text=trip["name"])
+
+        route_text = format_route_text(trip)
+        if not old or route_text != format_route_text(old):
+            self._route_label.configure(text=route_text)
+
+        created = trip.get("created_at", "")
+        if not old or created != old.get("created_at", ""):
+            self._date_label.configure(text=format_trip_date(created))
+
+
+class VirtualTripGrid:
+    """Windowed, pooled card layout inside a CTkScrollableFrame.
+
+    Cards are keyed by trip id, so reconciling a new trip list only
+    rebinds cards whose trip actually changed; the rest are at most
+    re-gridded into their new cell.
+    """
+
+    def __init__(
+        self,
+        frame: ctk.CTkScrollableFrame,
+        card_factory: Callable[[], TripCard],
+        overscan_rows: int = OVERSCAN_ROWS,
+        on_near_end: Callable[[], None] | None = None,
+    ) -> None:
+        self.frame = frame
+        self._card_factory = card_factory
+        self.overscan_rows = overscan_rows
+        self.on_near_end = on_near_end  # Called when the window nears the last row
+
+        self._trips: list[dict] = []
+        self._index_by_id: dict[int, int] = {}
+        self._active: dict[int, TripCard] = {}  # trip id → bound card
+        self._cells: dict[int, int] = {}        # trip id → gridded index
+        self._free: list[TripCard] = []
+        self._window: tuple[int, int] = (0, 0)  # [first, last) trip index
+        self._dirty = False
+        self._pending: str | None = None
+
+        for col in range(COLUMNS):
+            frame.columnconfigure(col, weight=1, uniform="trip_card")
+
+        self._top_spacer = ctk.CTkFrame(frame, fg_color="transparent", width=1, height=1)
+        self._bottom_spacer = ctk.CTkFrame(frame, fg_color="transparent", width=1, height=1)
+
+        # CTkScrollableFrame wires its canvas straight to the scrollbar; route
+        # scroll updates through us so the visible window follows the view.
+        self._canvas = frame._parent_canvas
+        self._scrollbar = frame._scrollbar
+        self._canvas.configure(yscrollcommand=self._on_yscroll)
+
+    # --- Public API ---
+
+    @property
+    def trips(self) -> list[dict]:
+        """The trips currently laid out, in display order."""
+        return self._trips
+
+    def get_trip(self, trip_id: int) -> dict | None:
+        """Return the on-screen record for a trip id, if present."""
+        idx = self._index_by_id.get(trip_id)
+        return None if idx is None else self._trips[idx]
+
+    def set_trips(self, trips: list[dict]) -> tuple[int, int, int]:
+        """Reconcile against a fresh trip list, keyed by trip id.
+
+        Returns (inserted, updated, removed) counts. Cards for unchanged
+        trips keep their widgets and labels; only the delta is rebound.
+        """
+        old_ids = self._index_by_id
+        new_ids = {trip["id"]: idx for idx, trip in enumerate(trips)}
+
+        inserted = sum(1 for tid in new_ids if tid not in old_ids)
+        removed = sum(1 for tid in old_ids if tid not in new_ids)
+        updated = sum(
+            1
+            for tid, idx in new_ids.items()
+            if tid in old_ids and trips[idx] != self._trips[old_ids[tid]]
+        )
+
+        self._trips = list(trips)
+        self._index_by_id = new_ids
+        self._dirty = True
+        self.schedule_render()
+        return inserted, updated, removed
+
+    def update_trip(self, trip_id: int, **fields) -> None:
+        """Patch fields of one trip in place; only its card is rebound."""
+        idx = self._index_by_id.get(trip_id)
+        if idx is None:
+            return
+        trip = {**self._trips[idx], **fields}
+        self._trips[idx] = trip
+        card = self._active.get(trip_id)
+        if card is not None:
+            card.show_trip(trip)
+
+    def append_trips(self, trips: list[dict]) -> None:
+        """Add the next page of trips after the ones already laid out."""
+        fresh = [trip for trip in trips if trip["id"] not in self._index_by_id]
+        if fresh:
+            self.set_trips(self._trips + fresh)
+
+    def insert_trip(self, index: int, trip: dict) -> None:
+        """Insert one trip at a display position and reflow the rest."""
+        trips = list(self._trips)
+        trips.insert(index, trip)
+        self.set_trips(trips)
+
+    def remove_trip(self, trip_id: int) -> None:
+        """Drop one trip and reflow the cards after it."""
+        if trip_id in self._index_by_id:
+            self.set_trips([t for t in self._trips if t["id"] != trip_id])
+
+    def clear(self) -> None:
+        """Release every card and collapse the grid."""
+        self.set_trips([])
+
+    def set_overscan(self, rows: int) -> None:
+        """Change how many off-screen rows are kept built above and below."""
+        if rows != self.overscan_rows:
+            self.overscan_rows = rows
+            self._dirty = True
+            self.schedule_render()
+
+    def schedule_render(self) -> None:
+        """Coalesce render requests into a single idle callback."""
+        if self._pending is None:
+            self._pending = self.frame.after_idle(self._render)
+
+    # --- Internals ---
+
+    def _on_yscroll(self, first: str, last: str) -> None:
+        self._scrollbar.set(first, last)
+        self.schedule_render()
+
+    def _visible_rows(self, total_rows: int) -> tuple[int, int]:
+        """Return the [first, last) row range to build, including overscan."""
+        row_px = ROW_HEIGHT * ctk.ScalingTracker.get_widget_scaling(self.frame)
+        view_px = self._canvas.winfo_height()
+        if view_px <= 1:
+            view_px = DEFAULT_VIEWPORT_ROWS * row_px
+
+        top_px = self._canvas.yview()[0] * total_rows * row_px
+        first_row = max(0, int(top_px // row_px) - self.overscan_rows)
+        last_row = min(total_rows, math.ceil((top_px + view_px) / row_px) + self.overscan_rows)
+        return first_row, last_row
+
+    def _render(self) -> None:
+        """Build, recycle, rebind, and reflow cards for the visible window."""
+        self._pending = None
+        n = len(self._trips)
+        total_rows = math.ceil(n / COLUMNS)
+        first_row, last_row = self._visible_rows(total_rows)
+        window = (first_row * COLUMNS, min(n, last_row * COLUMNS))
+
+        if self.on_near_end is not None and total_rows and last_row >= total_rows - LOAD_MORE_ROWS:
+            self.on_near_end()
+
+        if window == self._window and not self._dirty:
+            return
+
+        visible = {self._trips[idx]["id"]: idx for idx in range(*window)}
+
+        # Recycle cards whose trip left the window (scrolled away or deleted)
+        for trip_id in [tid for tid in self._active if tid not in visible]:
+            card = self._active.pop(trip_id)
+            self._cells.pop(trip_id, None)
+            card.grid_remove()
+            self._free.append(card)
+
+        for trip_id, idx in visible.items():
+            trip = self._trips[idx]
+            card = self._active.get(trip_id)
+            if card is None:
+                card = self._free.pop() if self._free else self._card_factory()
+                self._active[trip_id] = card
+            card.show_trip(trip)  # No-op unless the trip record changed
+
+            if self._cells.get(trip_id) != idx:
+                self._cells[trip_id] = idx
+                card.grid(
+                    row=idx // COLUMNS + 1,
+                    column=idx % COLUMNS,
+                    padx=CARD_PAD,
+                    pady=CARD_PAD,
+                    sticky="nsew",
+                )
+
+        self._set_spacer(self._top_spacer, 0, first_row * ROW_HEIGHT)
+        self._set_spacer(
+            self._bottom_spacer, total_rows + 1, (total_rows - last_row) * ROW_HEIGHT
+        )
+
+        self._window = window
+        self._dirty = False
+
+    def _set_spacer(self, spacer: ctk.CTkFrame, row: int, height: int) -> None:
+        if height <= 0:
+            spacer.grid_remove()
+            return
+        spacer.configure(height=height)
+        spacer.grid(row=row, column=0, columnspan=COLUMNS, sticky="ew")